@@ -0,0 +1,42 @@
+"""Headless entry point for Balance Check.
+
+Reconcile two workbooks from Python without the Streamlit UI::
+
+    from balance_check import reconcile_workbooks
+
+    report = reconcile_workbooks("left.xlsx", "right.xlsx")
+    print(report.report)
+
+or from the shell with ``python -m balance_check left.xlsx right.xlsx``.
+Names are resolved on first access, so importing the package costs nothing
+until something is used.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any
+
+_EXPORTS = {
+    "reconcile_workbooks": "balance_check.api",
+    "ReconcileOptions": "src.core.reconcile",
+    "PairJob": "src.pipeline",
+    "PairReport": "src.pipeline",
+    "read_manifest": "src.pipeline",
+    "run_batch": "src.pipeline",
+    "summarize": "src.pipeline",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted([*globals(), *_EXPORTS])
@@ -0,0 +1,119 @@
+"""Command line interface: ``python -m balance_check left.xlsx right.xlsx``."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from typing import List, Optional
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="balance_check",
+        description="Reconcile debit and credit amounts between two workbooks.",
+    )
+    parser.add_argument("left", nargs="?", help="left workbook")
+    parser.add_argument("right", nargs="?", help="right workbook")
+    parser.add_argument("--manifest", help="CSV of pairs to reconcile in batch instead of LEFT RIGHT")
+    parser.add_argument("--sheet", default="0", help="sheet name, or position when no sheet has that name (default: 0)")
+    parser.add_argument("--right-sheet", help="sheet of the right workbook (default: --sheet)")
+    parser.add_argument("--output-dir", help="folder for highlighted copies (default: next to the inputs)")
+    parser.add_argument("--api-key", help="OpenAI key for column detection (default: $OPENAI_API_KEY)")
+    parser.add_argument("--tolerance", type=int, default=0, help="accepted difference in cents")
+    parser.add_argument("--date-window", type=int, help="accepted posting date difference in days")
+    parser.add_argument(
+        "--net-groups", action="store_true", help="resolve groups whose totals and row counts agree without row matching"
+    )
+    parser.add_argument("--workers", type=int, help="worker processes for --manifest (default: CPU count)")
+    parser.add_argument("--summary", help="write the --manifest summary to this CSV file")
+    parser.add_argument("--metrics", help="write stage timings and counters as JSON to this file")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc"], help="also capture a profile")
+    parser.add_argument("--audit", action="store_true", help="write an audit trail of amounts next to the outputs")
+    parser.add_argument(
+        "--memory-budget", type=int, metavar="MB", help="reconcile out of core within this many megabytes"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the CLI and return the exit status.
+
+    The status is ``0`` when every pair reconciles, ``1`` when differences
+    were found and ``2`` on usage or processing errors.
+    """
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not args.manifest and not (args.left and args.right):
+        parser.error("give LEFT and RIGHT workbooks or --manifest")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    from src.core.reconcile import ReconcileOptions
+
+    options = ReconcileOptions(tolerance=args.tolerance, date_window=args.date_window, net_groups=args.net_groups)
+
+    if args.manifest:
+        import os
+
+        from src.pipeline import read_manifest, run_batch, summarize
+        from src.utils.metrics import collect
+
+        # Detection runs per chunk of pairs and reports into the batch metrics.
+        with collect() as batch:
+            reports = run_batch(
+                read_manifest(args.manifest),
+                args.api_key if args.api_key is not None else os.environ.get("OPENAI_API_KEY", ""),
+                options,
+                workers=args.workers,
+                output_dir=args.output_dir,
+                profile=args.profile,
+                audit=args.audit,
+            )
+        if args.metrics:
+            metrics = {"(batch)": batch.to_dict(), **{r.name: r.metrics.to_dict() for r in reports}}
+            with open(args.metrics, "w", encoding="utf-8") as f:
+                json.dump(metrics, f, ensure_ascii=False, indent=1)
+        summary = summarize(reports)
+        if args.summary:
+            summary.to_csv(args.summary, index=False)
+        print(summary[["name", "success", "matches", "partials", "unmatched", "error"]].to_string(index=False))
+        if any(r.error for r in reports):
+            return 2
+        return 0 if all(r.success for r in reports) else 1
+
+    from .api import reconcile_workbooks
+
+    try:
+        report = reconcile_workbooks(
+            args.left,
+            args.right,
+            args.api_key,
+            options,
+            sheet=args.sheet,
+            right_sheet=args.right_sheet,
+            output_dir=args.output_dir,
+            profile=args.profile,
+            audit=args.audit,
+            memory_budget=args.memory_budget << 20 if args.memory_budget else None,
+        )
+    except (OSError, RuntimeError, ValueError) as exc:
+        print(f"balance_check: {exc}", file=sys.stderr)
+        return 2
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(report.metrics.to_json(indent=1))
+    if report.metrics.profile:
+        print(report.metrics.profile, file=sys.stderr)
+    print(report.report)
+    print(f"Left result: {report.out_left}")
+    print(f"Right result: {report.out_right}")
+    if report.audit:
+        print(f"Audit trail: {report.audit}")
+    return 0 if report.success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Reconcile two workbooks given as paths or bytes."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from src.core.reconcile import ReconcileOptions
+from src.io.cache import ParsedCache
+from src.io.loader import Sheet, resolve_sheet
+from src.llm import detector
+from src.pipeline import PairReport, file_hash, load_table, reconcile_large, reconcile_tables
+from src.utils.metrics import Profile, collect, stage
+
+Workbook = Union[str, Path, bytes]
+
+
+def _materialise(workbook: Workbook, name: str, output_dir: Optional[Path]) -> Path:
+    """Return a path for ``workbook``, saving bytes into ``output_dir``."""
+    if not isinstance(workbook, bytes):
+        return Path(workbook)
+    if output_dir is None:
+        raise ValueError("output_dir is required when a workbook is given as bytes")
+    if workbook[:2] == b"PK":
+        suffix = ".xlsx"
+    elif workbook[:4] == b"PAR1":
+        suffix = ".parquet"
+    elif workbook[:4] == b"\xd0\xcf\x11\xe0":
+        suffix = ".xls"
+    else:
+        suffix = ".csv"
+    path = output_dir / f"{name}{suffix}"
+    path.write_bytes(workbook)
+    return path
+
+
+def reconcile_workbooks(
+    left: Workbook,
+    right: Workbook,
+    api_key: Optional[str] = None,
+    options: Optional[ReconcileOptions] = None,
+    *,
+    sheet: Sheet = 0,
+    right_sheet: Optional[Sheet] = None,
+    output_dir: Optional[Union[str, Path]] = None,
+    cache_dir: Optional[Path] = None,
+    profile: Optional[Profile] = None,
+    audit: Union[bool, str, Path] = False,
+    memory_budget: Optional[int] = None,
+    **detect_kwargs: Any,
+) -> PairReport:
+    """Detect, reconcile and highlight one pair of workbooks.
+
+    Parameters
+    ----------
+    left, right:
+        Paths or contents of xlsx, xls, CSV or Parquet files. Contents are
+        saved into ``output_dir`` as ``left``/``right`` with the suffix of
+        their format.
+    api_key:
+        OpenAI key for column detection, ``OPENAI_API_KEY`` by default. The
+        heuristic detector is used without a key.
+    options:
+        Reconciliation settings, see :class:`ReconcileOptions`.
+    sheet, right_sheet:
+        Sheets to compare; ``right_sheet`` defaults to ``sheet``. Digit
+        strings name a sheet when one has that name and are positions
+        otherwise.
+    output_dir:
+        Folder receiving the highlighted copies, next to the sources by
+        default. Copies are named ``<stem>_vs_<counterpart stem>_checked``.
+    cache_dir:
+        Folder of the parsed workbook cache.
+    profile:
+        Optional profile mode, see :func:`src.utils.metrics.collect`. Stage
+        timings and counters are always collected into ``report.metrics``.
+    audit:
+        Path of an audit trail of the amounts and the result, see
+        :mod:`src.io.audit`. ``True`` writes it next to the left output with
+        the suffix ``.audit.npz``.
+    memory_budget:
+        Bytes the reconciliation may use. When given the sheets are not
+        loaded but reconciled out of core, see
+        :func:`src.pipeline.reconcile_large`; audit trails are not
+        available then.
+    detect_kwargs:
+        Passed to :func:`src.llm.detector.detect_batch`.
+    """
+
+    if memory_budget is not None and audit:
+        raise ValueError("audit trails are not written by out-of-core reconciliation")
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+    if right_sheet is None:
+        right_sheet = sheet
+    if api_key is None:
+        api_key = os.environ.get("OPENAI_API_KEY", "")
+
+    path_left = _materialise(left, "left", output_dir)
+    path_right = _materialise(right, "right", output_dir)
+    sheet, right_sheet = resolve_sheet(path_left, sheet), resolve_sheet(path_right, right_sheet)
+    hash_left, hash_right = file_hash(path_left), file_hash(path_right)
+    cache = ParsedCache(cache_dir)
+
+    def _out(path: Path, counterpart: Path) -> str:
+        return str((output_dir or path.parent) / f"{path.stem}_vs_{counterpart.stem}_checked{path.suffix}")
+
+    if audit is True:
+        audit = Path(_out(path_left, path_right)).with_suffix(".audit.npz")
+
+    with collect(profile) as metrics:
+        with stage("detect"):
+            samples = [
+                cache.sample(hash_left, path_left, sheet=sheet),
+                cache.sample(hash_right, path_right, sheet=right_sheet),
+            ]
+            det_left, det_right = detector.detect_batch(samples, api_key=api_key, **detect_kwargs)
+        if memory_budget is not None:
+            report = reconcile_large(
+                path_left,
+                path_right,
+                det_left,
+                det_right,
+                options,
+                memory_budget=memory_budget,
+                sheet_left=sheet,
+                sheet_right=right_sheet,
+                out_left=_out(path_left, path_right),
+                out_right=_out(path_right, path_left),
+            )
+        else:
+            df_left, local_left = load_table(path_left, det_left, hash_left, cache, sheet)
+            df_right, local_right = load_table(path_right, det_right, hash_right, cache, right_sheet)
+            report = reconcile_tables(
+                df_left,
+                df_right,
+                local_left,
+                local_right,
+                det_left,
+                det_right,
+                path_left,
+                path_right,
+                options,
+                sheet_left=sheet,
+                sheet_right=right_sheet,
+                out_left=_out(path_left, path_right),
+                out_right=_out(path_right, path_left),
+                audit_path=audit or None,
+            )
+    report.name = f"{path_left.stem}~{path_right.stem}[{sheet}]"
+    report.metrics = metrics
+    return report
@@ -0,0 +1,108 @@
+"""Seeded synthetic ledgers for benchmarking."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+_FORMATS = (
+    lambda c: f"{c // 100:,}.{c % 100:02d}".replace(",", " ").replace(".", ","),
+    lambda c: f"${c // 100:,}.{c % 100:02d}",
+    lambda c: f"{c // 100:,}.{c % 100:02d} RUB".replace(",", "'"),
+    lambda c: f"{c / 100:.2f}",
+)
+
+
+def _dirty(cents: np.ndarray, share: float, rng: np.random.Generator) -> np.ndarray:
+    """Return ``cents`` as floats with ``share`` of them as formatted strings."""
+    values = (cents / 100).astype(object)
+    picked = np.flatnonzero(rng.random(len(cents)) < share)
+    styles = rng.integers(len(_FORMATS), size=len(picked))
+    for i, style in zip(picked.tolist(), styles.tolist()):
+        values[i] = _FORMATS[style](int(cents[i]))
+    return values
+
+
+def make_ledgers(
+    rows: int,
+    groups: int = 1,
+    duplicate_skew: float = 0.0,
+    split_ratio: float = 0.0,
+    dirty: float = 0.0,
+    seed: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Return a left and right ledger that reconcile with each other.
+
+    Parameters
+    ----------
+    rows:
+        Number of left rows.
+    groups:
+        Number of distinct counterparties in the ``who`` column.
+    duplicate_skew:
+        Share of rows whose amount is drawn from a pool of 20 common
+        amounts, which makes many rows share the same amount.
+    split_ratio:
+        Share of left rows paid in two to four parts on the right.
+    dirty:
+        Share of amount cells written as text with thousands separators,
+        currency marks or comma decimals.
+    seed:
+        Seed of the random generator; equal arguments give equal ledgers.
+
+    Both frames have ``date``, ``who``, ``debit`` and ``credit`` columns.
+    Every left row has right rows of the same counterparty summing to its
+    amount, in shuffled order.
+    """
+
+    rng = np.random.default_rng(seed)
+    cents = rng.integers(100, 10_000_000, size=rows)
+    common = rng.integers(100, 100_000, size=20)
+    skewed = rng.random(rows) < duplicate_skew
+    cents[skewed] = common[rng.zipf(1.5, size=int(skewed.sum())) % len(common)]
+    who = rng.integers(groups, size=rows)
+    dates = np.datetime64("2024-01-01") + rng.integers(365, size=rows).astype("timedelta64[D]")
+
+    parts = np.where(rng.random(rows) < split_ratio, rng.integers(2, 5, size=rows), 1)
+    owner = np.repeat(np.arange(rows), parts)
+    weights = rng.random(len(owner)) + 0.1
+    share = weights / np.bincount(owner, weights)[owner]
+    right_cents = np.floor(cents[owner] * share).astype(np.int64)
+    # Put the rounding remainder on the last part of every split.
+    last = np.cumsum(parts) - 1
+    right_cents[last] += cents - np.bincount(owner, right_cents, minlength=rows).astype(np.int64)
+    order = rng.permutation(len(owner))
+
+    def _frame(c: np.ndarray, w: np.ndarray, d: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame({
+            "date": d,
+            "who": [f"counterparty {k}" for k in w.tolist()],
+            "debit": _dirty(c, dirty, rng),
+            "credit": np.zeros(len(c), dtype=np.int64),
+        })
+
+    left = _frame(cents, who, dates)
+    right = _frame(right_cents[order], who[owner][order], dates[owner][order])
+    return left, right
+
+
+def with_turnover(df: pd.DataFrame, label: str = "Оборот за период") -> pd.DataFrame:
+    """Return ``df`` with a closing turnover row labelled in the ``who`` column."""
+    total = pd.DataFrame({"who": [label], "debit": [len(df)]})
+    return pd.concat([df, total], ignore_index=True)
+
+
+def write_ledger(df: pd.DataFrame, path: Union[str, Path]) -> Path:
+    """Write ``df`` as a single-sheet xlsx file with a header row."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Ledger")
+    ws.append([str(c) for c in df.columns])
+    for row in df.itertuples(index=False):
+        ws.append([None if pd.isna(v) else v for v in row])
+    wb.save(path)
+    return Path(path)
@@ -0,0 +1,167 @@
+"""Scaling benchmarks of the load, reconcile and write paths.
+
+Run ``python -m benchmarks.run --sizes 1000 10000 100000`` to print the time
+and peak traced memory of every stage per ledger size. ``--save`` stores the
+results as a baseline and ``--baseline`` compares against one, exiting with
+status 1 when a stage got slower than the threshold allows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from benchmarks.ledger import make_ledgers, with_turnover, write_ledger
+from src.core.highlight import cells_to_highlight
+from src.core.reconcile import reconcile
+from src.core.subset import match_subsets
+from src.io.loader import find_turnover_values, read_excel
+from src.io.writer import write_coloured
+from src.llm.schema import Detection
+from src.utils.numeric import parse_cents
+
+STAGES = ("read_excel", "parse", "reconcile", "subset", "turnover", "write")
+
+# Split payments of the subset case, few enough for the search to finish
+# within its budget, and one in _MISMATCH right rows dropped for the write
+# case.
+_SPLITS = 8
+_MISMATCH = 100
+
+_DETECTION = Detection(
+    debit_column=2, credit_column=3, header_row=0, start_row=1, end_row=0, group_keys=["who"]
+)
+
+
+def _measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Return the best wall time of ``repeat`` runs and the traced peak of one more."""
+    seconds = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        seconds.append(perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_mb": peak / 2**20}
+
+
+def run(
+    sizes: Sequence[int],
+    groups: int = 10,
+    duplicate_skew: float = 0.2,
+    split_ratio: float = 0.05,
+    dirty: float = 0.1,
+    seed: int = 0,
+    repeat: int = 3,
+    stages: Sequence[str] = STAGES,
+) -> List[Dict[str, object]]:
+    """Benchmark ``stages`` on generated ledgers of every size in ``sizes``."""
+
+    results = []
+    with TemporaryDirectory() as tmp:
+        for rows in sizes:
+            left, right = make_ledgers(rows, groups, duplicate_skew, split_ratio, dirty, seed)
+            path = write_ledger(left, Path(tmp) / f"left_{rows}.xlsx")
+            rng = np.random.default_rng(seed)
+            debit = left["debit"]
+            amounts_left = parse_cents(debit)[0]
+            split = amounts_left[: min(rows, _SPLITS)]
+            halves = split // 2
+            parts = rng.permutation(np.concatenate([halves, split - halves]))
+            turnover = with_turnover(left)
+            # The ledgers reconcile fully; dropped right rows leave left rows
+            # unmatched so the writer has cells to colour.
+            dropped = rng.choice(len(right), size=max(1, len(right) // _MISMATCH), replace=False)
+            result = reconcile(left, right.drop(index=dropped), _DETECTION, _DETECTION)
+            highlights = cells_to_highlight(*result, _DETECTION, "left")
+
+            cases: Dict[str, Callable[[], object]] = {
+                "read_excel": lambda: read_excel(path, columns=[1, 2, 3], streaming=True),
+                "parse": lambda: parse_cents(debit),
+                "reconcile": lambda: reconcile(left, right, _DETECTION, _DETECTION),
+                "subset": lambda: match_subsets(split.tolist(), parts.tolist()),
+                "turnover": lambda: find_turnover_values(turnover),
+                "write": lambda: write_coloured(left, highlights, str(path)),
+            }
+            for stage in stages:
+                measured = _measure(cases[stage], repeat)
+                results.append({"stage": stage, "rows": rows, **measured})
+                print(
+                    f"{stage:>10} {rows:>9} rows {measured['seconds'] * 1000:10.1f} ms "
+                    f"{measured['peak_mb']:9.1f} MiB",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def compare(
+    results: Sequence[Dict[str, object]], baseline: Sequence[Dict[str, object]], threshold: float
+) -> List[str]:
+    """Return a message for every stage slower than ``baseline`` by more than ``threshold``.
+
+    ``threshold`` is relative, ``0.25`` allows 25 % slowdown. Stages missing
+    from the baseline are not compared.
+    """
+
+    base = {(b["stage"], b["rows"]): b for b in baseline}
+    failures = []
+    for r in results:
+        b = base.get((r["stage"], r["rows"]))
+        if b is None:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            if r[metric] > b[metric] * (1 + threshold):
+                failures.append(
+                    f"{r['stage']} at {r['rows']} rows: {metric} {r[metric]:.4g} > baseline {b[metric]:.4g}"
+                )
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--skew", type=float, default=0.2, help="share of rows with common amounts")
+    parser.add_argument("--split", type=float, default=0.05, help="share of split payments")
+    parser.add_argument("--dirty", type=float, default=0.1, help="share of text formatted amounts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--save", help="write results as a new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args(argv)
+    if args.baseline and not Path(args.baseline).exists():
+        # A missing baseline must not let the regression gate pass.
+        print(f"Baseline {args.baseline} not found; record one with `make bench-baseline`", file=sys.stderr)
+        return 2
+
+    results = run(
+        args.sizes, args.groups, args.skew, args.split, args.dirty, args.seed, args.repeat, args.stages
+    )
+    for target in (args.output, args.save):
+        if target:
+            Path(target).write_text(json.dumps(results, indent=1))
+    if args.baseline:
+        failures = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Group index shared by both tables of a reconciliation.
+
+Group keys of the left and right table are factorized together into one
+set of integer codes, and the rows of every table are stored in CSR form:
+row positions sorted by group code plus the offset at which every group
+starts. Later stages slice these arrays instead of building per-group
+Python lists.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class GroupRows:
+    """Row positions of one table bucketed by group.
+
+    Attributes
+    ----------
+    codes:
+        Group code of every row, ``-1`` for rows without a complete key.
+    order:
+        Positions of the grouped rows sorted by code, in row order inside a
+        group.
+    offsets:
+        Start of every group in ``order`` followed by ``len(order)``.
+    """
+
+    codes: np.ndarray
+    order: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, n_groups: int) -> "GroupRows":
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]
+        return cls(codes, order, _offsets(codes[order], n_groups))
+
+    def __getitem__(self, code: int) -> np.ndarray:
+        return self.order[self.offsets[code] : self.offsets[code + 1]]
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Number of rows of every group."""
+        return np.diff(self.offsets)
+
+    def totals(self, values: np.ndarray) -> np.ndarray:
+        """Return the exact integer sum of ``values`` over every group."""
+        running = np.zeros(len(self.order) + 1, dtype=np.int64)
+        np.cumsum(values[self.order], out=running[1:])
+        return running[self.offsets[1:]] - running[self.offsets[:-1]]
+
+    def select(self, mask: np.ndarray) -> "GroupRows":
+        """Return the index restricted to the rows where ``mask`` is set."""
+        order = self.order[mask[self.order]]
+        return GroupRows(self.codes, order, _offsets(self.codes[order], len(self.offsets) - 1))
+
+
+@dataclass
+class GroupIndex:
+    """Group keys and the rows of both tables by shared group code."""
+
+    keys: List[Tuple]
+    left: GroupRows
+    right: GroupRows
+
+
+def _offsets(sorted_codes: np.ndarray, n_groups: int) -> np.ndarray:
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sorted_codes, minlength=n_groups), out=offsets[1:])
+    return offsets
+
+
+def _factorize(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Return sorted codes and uniques, in order of appearance if unsortable."""
+    try:
+        return pd.factorize(values, sort=True)
+    except TypeError:
+        return pd.factorize(values, sort=False)
+
+
+def _codes(columns: Sequence[pd.Series]) -> Tuple[np.ndarray, List[Tuple]]:
+    """Factorize rows of ``columns`` into codes ordered like their key tuples.
+
+    Rows with a missing value in any column get ``-1``, like ``groupby``
+    dropping them.
+    """
+
+    per_column = [_factorize(values) for values in columns]
+    if len(per_column) == 1:
+        codes, uniques = per_column[0]
+        return codes.astype(np.int64), [(k,) for k in pd.Index(uniques).tolist()]
+    codes = np.stack([c for c, _ in per_column]).astype(np.int64)
+    sizes = [max(len(u), 1) for _, u in per_column]
+    valid = (codes >= 0).all(axis=0)
+    if np.prod(np.asarray(sizes, dtype=float)) < 2**62:
+        combined = np.ravel_multi_index(np.where(valid, codes, 0), sizes)
+        present, inverse = np.unique(combined[valid], return_inverse=True)
+        parts = np.unravel_index(present, sizes)
+    else:
+        rows, inverse = np.unique(codes[:, valid].T, axis=0, return_inverse=True)
+        parts = tuple(rows.T)
+    row_codes = np.full(len(valid), -1, dtype=np.int64)
+    row_codes[valid] = inverse.ravel()
+    uniques = [pd.Index(u).tolist() for _, u in per_column]
+    keys = list(zip(*(np.asarray(u, dtype=object)[p] for u, p in zip(uniques, parts))))
+    return row_codes, [tuple(k) for k in keys]
+
+
+def build_group_index(
+    df_left: pd.DataFrame, keys_left: Sequence[str], df_right: pd.DataFrame, keys_right: Sequence[str]
+) -> GroupIndex:
+    """Factorize the group keys of both tables jointly.
+
+    Codes follow the sorted order of the key tuples. Without group keys
+    every row of a table belongs to the single group ``()``.
+    """
+
+    n_left, n_right = len(df_left), len(df_right)
+    if not keys_left and not keys_right:
+        keys = [()]
+        codes_left = np.zeros(n_left, dtype=np.int64)
+        codes_right = np.zeros(n_right, dtype=np.int64)
+    elif len(keys_left) == len(keys_right):
+        columns = [
+            pd.concat([df_left[a], df_right[b]], ignore_index=True) for a, b in zip(keys_left, keys_right)
+        ]
+        codes, keys = _codes(columns)
+        codes_left, codes_right = codes[:n_left], codes[n_left:]
+    else:
+        # Keys of different width never coincide: number both sides apart.
+        codes_left, left_keys = _side_codes(df_left, keys_left)
+        codes_right, right_keys = _side_codes(df_right, keys_right)
+        codes_right = np.where(codes_right >= 0, codes_right + len(left_keys), -1)
+        keys = left_keys + right_keys
+    return GroupIndex(keys, GroupRows.from_codes(codes_left, len(keys)), GroupRows.from_codes(codes_right, len(keys)))
+
+
+def _side_codes(df: pd.DataFrame, keys: Sequence[str]) -> Tuple[np.ndarray, List[Tuple]]:
+    if not keys:
+        return np.zeros(len(df), dtype=np.int64), [()]
+    return _codes([df[k] for k in keys])
@@ -6,7 +6,7 @@ from typing import Iterable, List, Set, Tuple
 
 import pandas as pd
 
-from .reconcile import Match, Partial, Unmatched
+from .result import Match, Partial, ReconcileResult, Unmatched
 from src.llm.schema import Detection
 
 
@@ -22,7 +22,9 @@ def cells_to_highlight(
     Parameters
     ----------
     matches, partials, unmatched:
-        Results returned by :func:`reconcile`.
+        Results returned by :func:`reconcile`. When they are the views of
+        one :class:`ReconcileResult`, rows are selected on its arrays
+        instead of walking the result objects.
     detection:
         Column detection metadata for the respective table.
     side:
@@ -33,6 +35,15 @@ def cells_to_highlight(
     credit_col = detection.credit_column
     cells: Set[Tuple[int, int]] = set()
 
+    result = getattr(matches, "result", None)
+    if isinstance(result, ReconcileResult) and all(
+        getattr(view, "result", None) is result for view in (partials, unmatched)
+    ):
+        rows = pd.unique(result.rows_to_highlight(side)).tolist()
+        cells.update((row, debit_col) for row in rows)
+        cells.update((row, credit_col) for row in rows)
+        return cells
+
     def _add_row(row: int) -> None:
         cells.add((row, debit_col))
         cells.add((row, credit_col))
@@ -47,7 +58,7 @@ def cells_to_highlight(
             _add_row(r)
 
     for m in matches:
-        if m.diff != 0:
+        if m.diff_cents != 0:
             rows = m.left_rows if side == "left" else m.right_rows
             for r in rows:
                 _add_row(r)
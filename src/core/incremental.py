@@ -0,0 +1,335 @@
+"""Incremental re-reconciliation after one workbook was edited.
+
+Matching never crosses group boundaries, so the outcome of a group only
+depends on the ordered amounts (and posting days, with a date window) of
+its rows. :func:`reconcile_incremental` fingerprints every group, reuses
+the previous outcome of groups whose fingerprint did not change and runs
+:func:`~src.core.reconcile.reconcile` on the rows of the other groups only.
+Reused entries are stored by their rank inside the group, so rows inserted
+or deleted elsewhere in the sheet do not invalidate them.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.llm.schema import Detection
+from src.utils.metrics import StageClock, count
+from .groups import GroupRows, build_group_index
+from .reconcile import ReconcileOptions, _amounts, _days, reconcile
+from .result import LEFT, RIGHT, ReconcileResult
+
+logger = logging.getLogger(__name__)
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+@dataclass(eq=False)
+class ReconcileState:
+    """Outcome of a previous run kept for :func:`reconcile_incremental`.
+
+    Attributes
+    ----------
+    settings:
+        Options and detection fields the outcome depends on. A state is
+        only reused under equal settings.
+    keys:
+        Group key tuples by group code of ``result``.
+    fingerprints:
+        Left hash, right hash, left row count and right row count of every
+        group, shape ``(len(keys), 4)``.
+    result:
+        The previous result.
+    rank:
+        Rank of every ``result`` entry among the rows of its group and side.
+    """
+
+    settings: Tuple
+    keys: List[Tuple]
+    fingerprints: np.ndarray
+    result: ReconcileResult
+    rank: np.ndarray
+
+
+@dataclass
+class _Side:
+    """Group layout of one table and the rank of every row inside its group."""
+
+    rows: GroupRows
+    rank: np.ndarray
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser; uint64 arithmetic wraps around."""
+    x = x + _GOLDEN
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _layout(rows: GroupRows, cents: np.ndarray, days: np.ndarray) -> Tuple[_Side, np.ndarray, np.ndarray]:
+    """Return the group layout, the hash and the row count of every group.
+
+    The hash depends on the amounts and days of the group's rows in row
+    order and on nothing else.
+    """
+
+    order, offsets = rows.order, rows.offsets
+    sorted_codes = rows.codes[order]
+    ranks = np.arange(len(order), dtype=np.int64) - offsets[sorted_codes]
+    rank = np.full(len(rows.codes), -1, dtype=np.int64)
+    rank[order] = ranks
+
+    row_hash = _mix(cents[order].view(np.uint64) ^ _mix(days[order].view(np.uint64)))
+    row_hash = _mix(row_hash + ranks.view(np.uint64) * _GOLDEN)
+    hashes = np.zeros(len(offsets) - 1, dtype=np.uint64)
+    np.add.at(hashes, sorted_codes, row_hash)
+    return _Side(rows, rank), hashes, rows.sizes
+
+
+def _settings(opts: ReconcileOptions, det_left: Detection, det_right: Detection, window: Optional[int]) -> Tuple:
+    return (
+        opts.max_subset_size,
+        opts.subset_budget,
+        opts.subset_timeout,
+        opts.tolerance,
+        opts.net_groups,
+        window,
+        tuple(det_left.group_keys),
+        tuple(det_right.group_keys),
+    )
+
+
+def _positions(result: ReconcileResult, df_left: pd.DataFrame, df_right: pd.DataFrame) -> np.ndarray:
+    """Return the row position of every entry of ``result``."""
+    pos = np.empty(len(result.side), dtype=np.int64)
+    for flag, df in ((LEFT, df_left), (RIGHT, df_right)):
+        on_side = result.side == flag
+        pos[on_side] = df.index.get_indexer(result.row[on_side])
+    return pos
+
+
+def _ranks(side: np.ndarray, pos: np.ndarray, left: _Side, right: _Side) -> np.ndarray:
+    """Return the rank inside its group of every entry at ``pos``."""
+    rank = np.empty(len(side), dtype=np.int64)
+    for flag, layout in ((LEFT, left), (RIGHT, right)):
+        on_side = side == flag
+        rank[on_side] = layout.rank[pos[on_side]]
+    return rank
+
+
+def _assemble(
+    side: np.ndarray,
+    pos: np.ndarray,
+    cents: np.ndarray,
+    code: np.ndarray,
+    match: np.ndarray,
+    is_pair: np.ndarray,
+    labels: Tuple[np.ndarray, np.ndarray],
+    keys: List[Tuple],
+    truncated: np.ndarray,
+    netted: np.ndarray,
+) -> Tuple[ReconcileResult, np.ndarray]:
+    """Order entries the way :func:`reconcile` does and renumber matches.
+
+    ``match`` ids must be unique across sources; ``is_pair`` flags the
+    entries of 1-to-1 matches. Also returns the order applied to the input.
+    """
+
+    matched = match >= 0
+    ids, inverse = np.unique(match[matched], return_inverse=True)
+    n = len(ids)
+    match_code = np.zeros(n, dtype=np.int64)
+    match_pair = np.zeros(n, dtype=bool)
+    # Pairs are ordered by their left row, subset matches by their old id,
+    # which keeps the search order inside a group.
+    tiebreak = ids.astype(np.int64)
+    match_code[inverse] = code[matched]
+    match_pair[inverse] = is_pair[matched]
+    left_pair = (side[matched] == LEFT) & is_pair[matched]
+    tiebreak[inverse[left_pair]] = pos[matched][left_pair]
+    # Pairs first, then subset matches, then netted groups.
+    kind = np.where(match_pair, 0, np.where(netted[match_code], 2, 1))
+    renumber = np.empty(n, dtype=np.int64)
+    renumber[np.lexsort((tiebreak, match_code, kind))] = np.arange(n)
+
+    new_match = np.full(len(match), -1, dtype=np.int64)
+    new_match[matched] = renumber[inverse]
+    head = np.flatnonzero(matched)
+    head = head[np.lexsort((side[head], new_match[head]))]
+    tail = np.flatnonzero(~matched)
+    tail = tail[np.lexsort((pos[tail], side[tail], code[tail]))]
+    order = np.concatenate([head, tail])
+
+    side, pos, cents, code, new_match = side[order], pos[order], cents[order], code[order], new_match[order]
+    row = np.empty(len(order), dtype=np.result_type(*labels))
+    for flag in (LEFT, RIGHT):
+        on_side = side == flag
+        row[on_side] = labels[flag][pos[on_side]]
+    in_match = new_match >= 0
+    totals = np.zeros((n, 2), dtype=np.int64)
+    np.add.at(totals, (new_match[in_match], side[in_match]), cents[in_match])
+    return ReconcileResult(
+        side=side,
+        row=row,
+        cents=cents,
+        group=code,
+        match=new_match,
+        match_diff=totals[:, LEFT] - totals[:, RIGHT],
+        keys=keys,
+        truncated=truncated,
+        pairs=int(match_pair.sum()),
+        netted=netted,
+    ), order
+
+
+def reconcile_incremental(
+    df_left: pd.DataFrame,
+    df_right: pd.DataFrame,
+    detection_left: Detection,
+    detection_right: Detection,
+    options: Optional[ReconcileOptions] = None,
+    state: Optional[ReconcileState] = None,
+    *,
+    amounts_left: Optional[np.ndarray] = None,
+    amounts_right: Optional[np.ndarray] = None,
+) -> Tuple[ReconcileResult, ReconcileState]:
+    """Reconcile like :func:`~src.core.reconcile.reconcile`, reusing ``state``.
+
+    Groups whose rows carry the same amounts (and days, with a date window)
+    in the same order as in the run that produced ``state`` keep their
+    previous matches; only the other groups are reconciled again. Without a
+    state, or when options or group keys changed, everything is reconciled.
+    Subset searches cut short by ``subset_timeout`` are reused as they are.
+
+    Returns
+    -------
+    tuple
+        The result, equal to what :func:`reconcile` returns for the same
+        input, and the state to pass to the next call.
+    """
+
+    opts = options or ReconcileOptions()
+    clock = StageClock()
+    cents_left = amounts_left if amounts_left is not None else _amounts(df_left, detection_left)
+    cents_right = amounts_right if amounts_right is not None else _amounts(df_right, detection_right)
+    cents_left = np.asarray(cents_left, dtype=np.int64)
+    cents_right = np.asarray(cents_right, dtype=np.int64)
+
+    index = build_group_index(df_left, detection_left.group_keys, df_right, detection_right.group_keys)
+    keys = index.keys
+    codes_left, codes_right = index.left.codes, index.right.codes
+
+    window = opts.date_window
+    if window is not None and (detection_left.date_column is None or detection_right.date_column is None):
+        window = None
+    if window is None:
+        days_left = np.zeros(len(df_left), dtype=np.int64)
+        days_right = np.zeros(len(df_right), dtype=np.int64)
+    else:
+        days_left = _days(df_left, detection_left)[0]
+        days_right = _days(df_right, detection_right)[0]
+    left, hash_left, n_left = _layout(index.left, cents_left, days_left)
+    right, hash_right, n_right = _layout(index.right, cents_right, days_right)
+    fingerprints = np.stack([hash_left, hash_right, n_left.astype(np.uint64), n_right.astype(np.uint64)], axis=1)
+    settings = _settings(opts, detection_left, detection_right, window)
+    clock.lap("incremental.fingerprint")
+
+    if state is not None and state.settings == settings:
+        lookup = {key: code for code, key in enumerate(state.keys)}
+        old_code = np.array([lookup.get(key, -1) for key in keys], dtype=np.int64)
+        known = old_code >= 0
+        clean = known.copy()
+        clean[known] = (state.fingerprints[old_code[known]] == fingerprints[known]).all(axis=1)
+    else:
+        old_code = np.full(len(keys), -1, dtype=np.int64)
+        clean = np.zeros(len(keys), dtype=bool)
+    count("incremental.reused_groups", int(clean.sum()))
+    count("incremental.dirty_groups", int((~clean).sum()))
+
+    if not clean.any():
+        result = reconcile(
+            df_left,
+            df_right,
+            detection_left,
+            detection_right,
+            opts,
+            amounts_left=cents_left,
+            amounts_right=cents_right,
+        )
+        pos = _positions(result, df_left, df_right)
+        clock.lap("incremental.reconcile")
+        return result, ReconcileState(settings, keys, fingerprints, result, _ranks(result.side, pos, left, right))
+
+    # Entries of unchanged groups, moved to the rows they occupy now.
+    old = state.result
+    new_code_of_old = np.full(len(state.keys), -1, dtype=np.int64)
+    new_code_of_old[old_code[clean]] = np.flatnonzero(clean)
+    keep = new_code_of_old[old.group] >= 0
+    kept_side = old.side[keep]
+    kept_code = new_code_of_old[old.group[keep]]
+    kept_rank = state.rank[keep]
+    kept_pos = np.empty(len(kept_side), dtype=np.int64)
+    for flag, layout in ((LEFT, left), (RIGHT, right)):
+        on_side = kept_side == flag
+        kept_pos[on_side] = layout.rows.order[layout.rows.offsets[kept_code[on_side]] + kept_rank[on_side]]
+    kept_match = old.match[keep]
+    kept_pair = (kept_match >= 0) & (kept_match < old.pairs)
+
+    truncated = np.zeros(len(keys), dtype=bool)
+    truncated[clean] = old.truncated[old_code[clean]]
+    netted = np.zeros(len(keys), dtype=bool)
+    netted[clean] = old.netted[old_code[clean]]
+
+    dirty_left = np.flatnonzero((codes_left >= 0) & ~clean[np.maximum(codes_left, 0)])
+    dirty_right = np.flatnonzero((codes_right >= 0) & ~clean[np.maximum(codes_right, 0)])
+    clock.lap("incremental.reuse")
+    if len(dirty_left) or len(dirty_right):
+        sub = reconcile(
+            df_left.iloc[dirty_left],
+            df_right.iloc[dirty_right],
+            detection_left,
+            detection_right,
+            opts,
+            amounts_left=cents_left[dirty_left],
+            amounts_right=cents_right[dirty_right],
+        )
+        lookup = {key: code for code, key in enumerate(keys)}
+        sub_codes = np.array([lookup[key] for key in sub.keys], dtype=np.int64)
+        sub_pos = _positions(sub, df_left, df_right)
+        new_side, new_pos, new_cents, new_code = sub.side, sub_pos, sub.cents, sub_codes[sub.group]
+        offset = int(old.match.max(initial=-1)) + 1
+        new_match = np.where(sub.match >= 0, sub.match + offset, -1)
+        new_pair = (sub.match >= 0) & (sub.match < sub.pairs)
+        truncated[sub_codes] = sub.truncated
+        netted[sub_codes] = sub.netted
+    else:
+        empty = np.empty(0, dtype=np.int64)
+        new_side, new_pos, new_cents, new_code, new_match = empty.astype(np.int8), empty, empty, empty, empty
+        new_pair = np.empty(0, dtype=bool)
+    clock.lap("incremental.reconcile")
+
+    result, order = _assemble(
+        np.concatenate([kept_side, new_side]),
+        np.concatenate([kept_pos, new_pos]),
+        np.concatenate([old.cents[keep], new_cents]),
+        np.concatenate([kept_code, new_code]),
+        np.concatenate([kept_match, new_match]),
+        np.concatenate([kept_pair, new_pair]),
+        (df_left.index.to_numpy(), df_right.index.to_numpy()),
+        keys,
+        truncated,
+        netted,
+    )
+    pos = np.concatenate([kept_pos, new_pos])[order]
+    rank = _ranks(result.side, pos, left, right)
+    clock.lap("incremental.assemble")
+    logger.info(
+        "Incremental reconciliation: %d of %d groups reused", int(clean.sum()), len(keys)
+    )
+    return result, ReconcileState(settings, keys, fingerprints, result, rank)
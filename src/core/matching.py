@@ -0,0 +1,188 @@
+"""Columnar matching primitives operating on integer-cent amount arrays."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def match_exact(
+    left_groups: np.ndarray,
+    left_cents: np.ndarray,
+    right_groups: np.ndarray,
+    right_cents: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair rows with equal amounts inside each group.
+
+    Rows are paired by occurrence rank: the ``k``-th left row carrying a given
+    ``(group, amount)`` key is matched with the ``k``-th right row carrying the
+    same key, both in row order. This is what a greedy first-come matching
+    produces, computed with a single sort instead of per-row lookups.
+
+    Parameters
+    ----------
+    left_groups, right_groups:
+        Integer group codes per row. Rows with a negative code are ignored.
+    left_cents, right_cents:
+        Amounts per row in cents.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Positions of matched left rows and of their right counterparts,
+        ordered by group code and left position.
+    """
+
+    left_groups = np.asarray(left_groups, dtype=np.int64)
+    right_groups = np.asarray(right_groups, dtype=np.int64)
+    n_left = len(left_groups)
+
+    groups = np.concatenate([left_groups, right_groups])
+    cents = np.concatenate([np.asarray(left_cents, dtype=np.int64), np.asarray(right_cents, dtype=np.int64)])
+    side = np.concatenate([np.zeros(n_left, dtype=np.int8), np.ones(len(right_groups), dtype=np.int8)])
+    pos = np.concatenate([np.arange(n_left), np.arange(len(right_groups))])
+
+    valid = groups >= 0
+    groups, cents, side, pos = groups[valid], cents[valid], side[valid], pos[valid]
+    n = len(groups)
+    empty = np.empty(0, dtype=np.int64)
+    if n == 0:
+        return empty, empty
+
+    # Sort by group, amount, side (left first) and row position.
+    order = np.lexsort((pos, side, cents, groups))
+    s_groups = groups[order]
+    s_cents = cents[order]
+
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (s_groups[1:] != s_groups[:-1]) | (s_cents[1:] != s_cents[:-1])
+    starts = np.flatnonzero(boundary)
+    run_len = np.diff(np.append(starts, n))
+    run_left = np.add.reduceat((side[order] == 0).astype(np.int64), starts)
+    run_pairs = np.minimum(run_left, run_len - run_left)
+
+    total = int(run_pairs.sum())
+    if total == 0:
+        return empty, empty
+
+    run_of = np.repeat(np.arange(len(starts)), run_pairs)
+    rank = np.arange(total) - np.repeat(np.cumsum(run_pairs) - run_pairs, run_pairs)
+    left_sorted = order[starts[run_of] + rank]
+    right_sorted = order[starts[run_of] + run_left[run_of] + rank]
+
+    left_pos = pos[left_sorted]
+    right_pos = pos[right_sorted]
+    out = np.lexsort((left_pos, groups[left_sorted]))
+    return left_pos[out], right_pos[out]
+
+
+def _nearest(bucket: List[Tuple[int, int]], day: int, window: Optional[int]) -> Optional[int]:
+    """Return the index in ``bucket`` of the waiting row dated closest to ``day``.
+
+    ``bucket`` holds ``(day, row)`` sorted pairs. Of equally distant rows the
+    earlier dated one wins, and of rows sharing a date the first row.
+    """
+    at = bisect_left(bucket, (day, -1))
+    best = None
+    if at < len(bucket) and (window is None or bucket[at][0] - day <= window):
+        best = at
+    if at > 0:
+        before = bucket[at - 1][0]
+        if (window is None or day - before <= window) and (best is None or day - before <= bucket[best][0] - day):
+            best = bisect_left(bucket, (before, -1))
+    return best
+
+
+def match_within(
+    left_groups: np.ndarray,
+    left_cents: np.ndarray,
+    right_groups: np.ndarray,
+    right_cents: np.ndarray,
+    tolerance: int = 0,
+    left_days: Optional[np.ndarray] = None,
+    right_days: Optional[np.ndarray] = None,
+    window: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair rows whose amounts differ by at most ``tolerance`` cents.
+
+    Both sides are merged into one list sorted by group and amount and
+    swept once. Waiting rows are kept per amount, each amount as a list
+    sorted by date. Every row is paired with a waiting row of the other side
+    from the smallest amount still within ``tolerance``, choosing the one
+    dated closest by bisection; amounts that fall out of reach are dropped.
+    Each row thus costs a logarithmic search per amount within tolerance.
+
+    Parameters
+    ----------
+    left_groups, right_groups:
+        Integer group codes per row. Rows with a negative code are ignored.
+    left_cents, right_cents:
+        Amounts per row in cents.
+    tolerance:
+        Largest accepted absolute difference in cents.
+    left_days, right_days, window:
+        Optional posting dates as integer day numbers. When ``window`` is
+        given, paired rows must be at most ``window`` days apart. Rows
+        without a date should be given a negative group code.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Positions of matched left rows and of their right counterparts,
+        ordered by group code and left position.
+    """
+
+    n_left = len(left_groups)
+    groups = np.concatenate([np.asarray(left_groups, dtype=np.int64), np.asarray(right_groups, dtype=np.int64)])
+    cents = np.concatenate([np.asarray(left_cents, dtype=np.int64), np.asarray(right_cents, dtype=np.int64)])
+    side = np.concatenate([np.zeros(n_left, dtype=np.int8), np.ones(len(right_groups), dtype=np.int8)])
+    pos = np.concatenate([np.arange(n_left), np.arange(len(right_groups))])
+    if window is not None:
+        days = np.concatenate([np.asarray(left_days, dtype=np.int64), np.asarray(right_days, dtype=np.int64)])
+    else:
+        days = np.zeros(len(groups), dtype=np.int64)
+
+    valid = groups >= 0
+    groups, cents, side, pos, days = groups[valid], cents[valid], side[valid], pos[valid], days[valid]
+    order = np.lexsort((pos, side, cents, groups))
+
+    pairs: List[Tuple[int, int, int]] = []
+    current = None
+    # Per side: the waiting amounts in ascending order, the index of the
+    # first one still in reach and the date-sorted rows of every amount.
+    amounts: Tuple[List[int], List[int]] = ([], [])
+    reach = [0, 0]
+    buckets: Tuple[Dict[int, List[Tuple[int, int]]], Dict[int, List[Tuple[int, int]]]] = ({}, {})
+    group_of, cents_of, side_of, pos_of, days_of = (
+        column[order].tolist() for column in (groups, cents, side, pos, days)
+    )
+    for i, (group, amount, s, day) in enumerate(zip(group_of, cents_of, side_of, days_of)):
+        if group != current:
+            current = group
+            amounts, reach, buckets = ([], []), [0, 0], ({}, {})
+        o = 1 - s
+        while reach[o] < len(amounts[o]) and amounts[o][reach[o]] < amount - tolerance:
+            reach[o] += 1
+        for waiting in amounts[o][reach[o]:]:
+            bucket = buckets[o][waiting]
+            k = _nearest(bucket, day, window) if bucket else None
+            if k is not None:
+                j = bucket.pop(k)[1]
+                left, right = (pos_of[i], pos_of[j]) if s == 0 else (pos_of[j], pos_of[i])
+                pairs.append((group, left, right))
+                break
+        else:
+            if amount not in buckets[s]:
+                amounts[s].append(amount)
+                buckets[s][amount] = []
+            insort(buckets[s][amount], (day, i))
+
+    if not pairs:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    pairs.sort()
+    _, left_pos, right_pos = (np.array(column, dtype=np.int64) for column in zip(*pairs))
+    return left_pos, right_pos
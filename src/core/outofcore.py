@@ -0,0 +1,272 @@
+"""Out-of-core reconciliation of ledgers larger than memory.
+
+Both workbooks are streamed in chunks and every row is written to one of
+several on-disk partitions chosen by a hash of its group key, so all rows
+of a group end up in the same partition. Partitions are reconciled one at
+a time and their results merged into the result :func:`reconcile` returns
+for the whole tables. Only the merged result, one partition and one chunk
+are held in memory at once.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import pickle
+from datetime import datetime
+from numbers import Real
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, BinaryIO, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.io.loader import (
+    Sheet,
+    detection_columns,
+    detection_rows,
+    footer_columns,
+    iter_chunks,
+    project_detection,
+    read_sample,
+)
+from src.llm.schema import Detection
+from src.utils.metrics import count, stage
+from .groups import _codes
+from .incremental import _assemble
+from .reconcile import ReconcileOptions, reconcile
+from .result import ReconcileResult
+
+logger = logging.getLogger(__name__)
+
+# In-memory size of a partition relative to its loaded columns: parsed
+# amounts, group codes, matching buffers and result entries.
+_OVERHEAD = 4
+_SAMPLE_ROWS = 1_000
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Real) and not isinstance(value, bool):
+        return repr(float(value))
+    return str(value)
+
+
+def _canonical(values: np.ndarray) -> np.ndarray:
+    """Return key values as text that is equal for equal keys of any cell type.
+
+    Chunks type their columns independently, so the same key can arrive as
+    an integer in one chunk and as a float or object in another.
+    """
+    if values.dtype.kind == "M":
+        values = pd.DatetimeIndex(values).to_pydatetime()
+    out = np.empty(len(values), dtype=object)
+    out[:] = [_text(v) for v in values.tolist()]
+    return out
+
+
+def _partitions(chunk: pd.DataFrame, keys: Sequence[str], n: int) -> np.ndarray:
+    """Return the partition of every row of ``chunk``."""
+    hashed = np.zeros(len(chunk), dtype=np.uint64)
+    for key in keys:
+        hashed = hashed * np.uint64(1_000_003) + pd.util.hash_array(_canonical(chunk[key].to_numpy()))
+    return (hashed % np.uint64(n)).astype(np.int64)
+
+
+def _plan(path: Union[str, Path], detection: Detection, sheet: Sheet) -> Tuple[List[int], Detection, float]:
+    """Return the columns to load, the projected detection and the estimated bytes.
+
+    Sheets that do not declare their size are estimated by the file size.
+    """
+    sample = read_sample(path, rows=_SAMPLE_ROWS, sheet=sheet, **detection_rows(detection))
+    columns = detection_columns(detection, sample.columns)
+    loaded = sample.iloc[:, columns]
+    per_row = loaded.memory_usage(deep=True, index=False).sum() / max(len(loaded), 1)
+    estimate = per_row * max(sample.attrs["n_rows"], len(sample))
+    if sample.attrs["n_rows"] <= len(sample):
+        estimate = max(estimate, Path(path).stat().st_size)
+    return columns, project_detection(detection, [c + 1 for c in columns]), estimate
+
+
+def _spill(
+    path: Union[str, Path],
+    columns: List[int],
+    detection: Detection,
+    local: Detection,
+    sheet: Sheet,
+    chunk_rows: int,
+    files: List[BinaryIO],
+) -> Tuple[int, List[str]]:
+    """Write the chunks of one workbook into partition ``files``.
+
+    ``detection`` refers to sheet columns and bounds the rows read; rows are
+    partitioned by the group keys of the projected ``local`` detection.
+    Returns the number of data rows and the loaded column names.
+    """
+    rows, names = 0, []
+    keys = local.group_keys
+    chunks = iter_chunks(
+        path, columns, chunk_rows, sheet=sheet, footer_columns=footer_columns(detection), **detection_rows(detection)
+    )
+    for chunk in chunks:
+        names = list(chunk.columns)
+        rows = chunk.index.stop
+        part = _partitions(chunk, keys, len(files)) if keys else np.zeros(len(chunk), dtype=np.int64)
+        for k in np.unique(part).tolist():
+            pickle.dump(chunk[part == k], files[k], protocol=pickle.HIGHEST_PROTOCOL)
+    return rows, names
+
+
+def _read_spill(path: Path, names: List[str]) -> pd.DataFrame:
+    chunks = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                chunks.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(chunks) if chunks else pd.DataFrame(columns=names)
+
+
+def _order(keys: List[Tuple], width_left: int, width_right: int) -> Tuple[np.ndarray, List[Tuple]]:
+    """Return the merged code of every partition key and the merged keys.
+
+    Codes are ordered the way :func:`src.core.groups.build_group_index`
+    orders the keys of the whole tables: sorted, and with keys of different
+    width the left keys first.
+    """
+    order = np.zeros(len(keys), dtype=np.int64)
+    merged: List[Tuple] = []
+    for width in dict.fromkeys([width_left, width_right]):
+        picked = [i for i, key in enumerate(keys) if len(key) == width]
+        if not picked:
+            continue
+        if width:
+            codes, block = _codes([pd.Series([keys[i][j] for i in picked]) for j in range(width)])
+        else:
+            codes, block = np.zeros(len(picked), dtype=np.int64), [()]
+        order[picked] = codes + len(merged)
+        merged.extend(block)
+    return order, merged
+
+
+def reconcile_out_of_core(
+    path_left: Union[str, Path],
+    path_right: Union[str, Path],
+    detection_left: Detection,
+    detection_right: Detection,
+    options: Optional[ReconcileOptions] = None,
+    *,
+    sheet_left: Sheet = 0,
+    sheet_right: Sheet = 0,
+    memory_budget: int = 1 << 30,
+    chunk_rows: int = 100_000,
+    spill_dir: Optional[Union[str, Path]] = None,
+) -> ReconcileResult:
+    """Reconcile two workbooks without loading either of them whole.
+
+    Parameters
+    ----------
+    path_left, path_right:
+        Workbooks to reconcile.
+    detection_left, detection_right:
+        Column detections referring to sheet columns.
+    options:
+        Reconciliation settings, see :class:`ReconcileOptions`.
+    sheet_left, sheet_right:
+        Sheets to read.
+    memory_budget:
+        Bytes a partition may take while it is reconciled. The number of
+        partitions is estimated from a sample of both sheets; groups are
+        never split, so one very large group can exceed the budget.
+    chunk_rows:
+        Rows streamed from a workbook at a time.
+    spill_dir:
+        Folder for the temporary partition files, the system temporary
+        folder by default.
+
+    Returns
+    -------
+    ReconcileResult
+        The result :func:`reconcile` returns for the whole sheets as loaded
+        by :func:`src.io.loader.read_excel` within the detected row range.
+        Row labels are data row positions.
+    """
+
+    opts = options or ReconcileOptions()
+    columns_left, local_left, bytes_left = _plan(path_left, detection_left, sheet_left)
+    columns_right, local_right, bytes_right = _plan(path_right, detection_right, sheet_right)
+    n_parts = max(1, math.ceil((bytes_left + bytes_right) * _OVERHEAD / memory_budget))
+    if n_parts > 1 and not (local_left.group_keys and local_right.group_keys):
+        logger.warning("Without group keys the ledgers form one partition and may exceed the memory budget")
+        n_parts = 1
+    count("outofcore.partitions", n_parts)
+
+    keys: List[Tuple] = []
+    sides, positions, amounts, codes, match_ids, pairs, truncated, netted = ([] for _ in range(8))
+    next_id = 0
+    with TemporaryDirectory(prefix="balance_check-spill-", dir=spill_dir) as tmp:
+        spills = []
+        with stage("outofcore.spill"):
+            for name, path, columns, det, local, sheet in (
+                ("left", path_left, columns_left, detection_left, local_left, sheet_left),
+                ("right", path_right, columns_right, detection_right, local_right, sheet_right),
+            ):
+                paths = [Path(tmp) / f"{name}-{k}.pkl" for k in range(n_parts)]
+                files = [open(p, "wb") for p in paths]
+                try:
+                    rows, names = _spill(path, columns, det, local, sheet, chunk_rows, files)
+                finally:
+                    for f in files:
+                        f.close()
+                spills.append((paths, names, rows))
+        (paths_left, names_left, n_left), (paths_right, names_right, n_right) = spills
+
+        for k in range(n_parts):
+            with stage("outofcore.reconcile"):
+                df_left = _read_spill(paths_left[k], names_left)
+                df_right = _read_spill(paths_right[k], names_right)
+                if df_left.empty and df_right.empty:
+                    continue
+                logger.debug("Partition %d: %d left and %d right rows", k, len(df_left), len(df_right))
+                part = reconcile(df_left, df_right, local_left, local_right, opts)
+                del df_left, df_right
+            # Partition results keep their own group codes and match ids;
+            # both are shifted to stay unique until the merge renumbers them.
+            sides.append(part.side)
+            positions.append(part.row.astype(np.int64))
+            amounts.append(part.cents)
+            codes.append(part.group + len(keys))
+            match_ids.append(np.where(part.match >= 0, part.match + next_id, -1))
+            pairs.append((part.match >= 0) & (part.match < part.pairs))
+            truncated.append(part.truncated)
+            netted.append(part.netted)
+            keys.extend(part.keys)
+            next_id += len(part.match_diff)
+
+    with stage("outofcore.merge"):
+        if not keys:
+            # Let reconcile lay out the result of two empty tables.
+            empty_left = pd.DataFrame(columns=names_left)
+            empty_right = pd.DataFrame(columns=names_right)
+            return reconcile(empty_left, empty_right, local_left, local_right, opts)
+        order, sorted_keys = _order(keys, len(local_left.group_keys), len(local_right.group_keys))
+        truncated_all = np.zeros(len(sorted_keys), dtype=bool)
+        netted_all = np.zeros(len(sorted_keys), dtype=bool)
+        truncated_all[order] = np.concatenate(truncated)
+        netted_all[order] = np.concatenate(netted)
+        result, _ = _assemble(
+            np.concatenate(sides),
+            np.concatenate(positions),
+            np.concatenate(amounts),
+            order[np.concatenate(codes)],
+            np.concatenate(match_ids),
+            np.concatenate(pairs),
+            (np.arange(n_left, dtype=np.int64), np.arange(n_right, dtype=np.int64)),
+            sorted_keys,
+            truncated_all,
+            netted_all,
+        )
+    return result
@@ -2,89 +2,100 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Tuple, Dict, Iterable, Optional
+from time import perf_counter
+from typing import List, Tuple, Dict, Optional, Union
 
 import logging
+import numpy as np
 import pandas as pd
 
 from src.llm.schema import Detection
+from src.utils.metrics import StageClock, count, group_time
+from src.utils.numeric import parse_cents
+from .groups import build_group_index
+from .matching import match_exact, match_within
+from .result import LEFT, RIGHT, Match, Partial, ReconcileResult, Unmatched  # noqa: F401 - re-exported
+from .subset import match_subsets
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
-class Match:
-    """Fully matched row groups."""
-
-    left_rows: List[int]
-    right_rows: List[int]
-    amount_left: float
-    amount_right: float
-    diff: float
-
-
-@dataclass
-class Partial:
-    """Rows with the same key that do not net to zero."""
-
-    left_rows: List[int]
-    right_rows: List[int]
-    amount_left: float
-    amount_right: float
-    diff: float
-
-
-@dataclass
-class Unmatched:
-    """Individual rows left without a counterpart."""
-
-    side: str
-    row: int
-    amount: float
-
-
-def _to_numeric(series: pd.Series) -> pd.Series:
-    """Parse a column of potential numeric strings robustly."""
-    numeric = pd.to_numeric(series, errors="coerce")
-    if numeric.isna().any():
-        alt = pd.to_numeric(series.astype(str).str.replace(",", "."), errors="coerce")
-        numeric = numeric.fillna(alt)
-    return numeric.fillna(0)
-
+class ReconcileOptions:
+    """Tuning knobs for :func:`reconcile`.
+
+    ``tolerance`` is the largest difference in cents accepted for a 1-to-1
+    match after the exact pass. ``date_window`` limits 1-to-1 matches to
+    rows posted at most that many days apart and needs a ``date_column``
+    in both detections. With ``net_groups`` every group whose left and
+    right totals and row counts are equal is resolved as a single match of
+    all its rows without row-level matching, so only imbalanced groups cost
+    time.
+    """
 
-def _amounts(df: pd.DataFrame, det: Detection) -> pd.Series:
-    debit = _to_numeric(df.iloc[:, det.debit_column])
-    credit = _to_numeric(df.iloc[:, det.credit_column])
+    max_subset_size: int = 10
+    subset_budget: int = 1_000_000
+    subset_timeout: Optional[float] = None
+    workers: Optional[int] = None
+    tolerance: int = 0
+    date_window: Optional[int] = None
+    net_groups: bool = False
+
+
+def _amounts(df: pd.DataFrame, det: Detection) -> np.ndarray:
+    """Return debit minus credit of every row in cents."""
+    debit, debit_failed = parse_cents(df.iloc[:, det.debit_column])
+    credit, credit_failed = parse_cents(df.iloc[:, det.credit_column])
+    failed = int(debit_failed.sum() + credit_failed.sum())
+    if failed:
+        logger.warning("%d amount cells could not be parsed and count as zero", failed)
     return debit - credit
 
 
-def _group_indices(df: pd.DataFrame, det: Detection) -> Dict[Tuple, List[int]]:
-    if det.group_keys:
-        groups = df.groupby(det.group_keys).groups
-        return {k if isinstance(k, tuple) else (k,): list(v) for k, v in groups.items()}
-    return {(): list(df.index)}
+def _days(df: pd.DataFrame, det: Detection) -> Tuple[np.ndarray, np.ndarray]:
+    """Return posting dates as day numbers and a mask of rows having one."""
+    dates = pd.to_datetime(df.iloc[:, det.date_column], errors="coerce")
+    dated = dates.notna().to_numpy(dtype=bool)
+    days = dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    if not dated.all():
+        logger.warning("%d rows have no readable date and are not matched 1-to-1", int((~dated).sum()))
+    return days, dated
+
+
+def _search_group(
+    left: np.ndarray, right: np.ndarray, opts: ReconcileOptions
+) -> Tuple[List[Tuple[List[int], List[int]]], bool, float]:
+    start = perf_counter()
+    found, complete = match_subsets(
+        left.tolist(),
+        right.tolist(),
+        max_size=opts.max_subset_size,
+        budget=opts.subset_budget,
+        timeout=opts.subset_timeout,
+    )
+    return found, complete, perf_counter() - start
 
 
-def _subset_dp(rows: List[Tuple[int, float]], limit: int = 50) -> Dict[float, List[int]]:
-    dp: Dict[float, List[int]] = {0.0: []}
-    for idx, amt in rows[:limit]:
-        new: Dict[float, List[int]] = dict(dp)
-        for s, subset in dp.items():
-            key = round(s + amt, 2)
-            if key not in new:
-                new[key] = subset + [idx]
-        dp = new
-    return dp
+def _search_groups(
+    tasks: Dict[int, Tuple[np.ndarray, np.ndarray]], opts: ReconcileOptions
+) -> Dict[int, Tuple[List[Tuple[List[int], List[int]]], bool, float]]:
+    """Run the subset search for every group, optionally in a process pool.
 
+    Tasks only carry the cent arrays of each group. Large groups are
+    submitted first so they do not end up as stragglers, and results are
+    keyed by group code so merging does not depend on completion order.
+    Each result carries the search time of its group.
+    """
 
-def _match_subsets(left: List[Tuple[int, float]], right: List[Tuple[int, float]]) -> Optional[Tuple[List[int], List[int], float]]:
-    left_dp = _subset_dp(left)
-    right_dp = _subset_dp(right)
-    for total in left_dp:
-        if total != 0 and total in right_dp:
-            return left_dp[total], right_dp[total], total
-    return None
+    if not opts.workers or opts.workers < 2 or len(tasks) < 2:
+        return {code: _search_group(left, right, opts) for code, (left, right) in tasks.items()}
+
+    order = sorted(tasks, key=lambda code: -(len(tasks[code][0]) + len(tasks[code][1])))
+    with ProcessPoolExecutor(max_workers=opts.workers) as pool:
+        futures = {code: pool.submit(_search_group, *tasks[code], opts) for code in order}
+        return {code: futures[code].result() for code in futures}
 
 
 def reconcile(
@@ -92,19 +103,32 @@ def reconcile(
     df_right: pd.DataFrame,
     detection_left: Detection,
     detection_right: Detection,
-) -> Tuple[List[Match], List[Partial], List[Unmatched]]:
+    options: Optional[ReconcileOptions] = None,
+    *,
+    amounts_left: Optional[np.ndarray] = None,
+    amounts_right: Optional[np.ndarray] = None,
+) -> ReconcileResult:
     """Return matched, partially matched and unmatched rows.
 
     Parameters
     ----------
     df_left, df_right: DataFrames to compare
     detection_left, detection_right: column detection results
+    options: subset search limits and number of worker processes, defaults
+        to :class:`ReconcileOptions`
+    amounts_left, amounts_right: debit minus credit per row in cents, as
+        returned by :func:`src.utils.numeric.parse_cents`. Parsed from the
+        detected columns when omitted.
 
     Returns
     -------
-    tuple of (matches, partials, unmatched)
+    ReconcileResult
+        Column-wise result. It unpacks as ``matches, partials, unmatched``
+        sequences of :class:`Match`, :class:`Partial` and :class:`Unmatched`
+        built lazily on access.
     """
 
+    opts = options or ReconcileOptions()
     logger.info(
         "Starting reconciliation: left rows=%d, right rows=%d",
         len(df_left),
@@ -113,115 +137,253 @@ def reconcile(
     logger.debug("Left detection: %s", detection_left.model_dump())
     logger.debug("Right detection: %s", detection_right.model_dump())
 
-    amount_left = _amounts(df_left, detection_left)
-    amount_right = _amounts(df_right, detection_right)
-    logger.debug(
-        "Computed amounts - left head: %s", amount_left.head().to_dict()
-    )
+    clock = StageClock()
+    count("rows_left", len(df_left))
+    count("rows_right", len(df_right))
+    cents_left = amounts_left if amounts_left is not None else _amounts(df_left, detection_left)
+    cents_right = amounts_right if amounts_right is not None else _amounts(df_right, detection_right)
+    logger.debug("Computed amounts - left head: %s", cents_left[:5].tolist())
+    logger.debug("Computed amounts - right head: %s", cents_right[:5].tolist())
+
+    index = build_group_index(df_left, detection_left.group_keys, df_right, detection_right.group_keys)
+    all_keys = index.keys
+    codes_left, codes_right = index.left.codes, index.right.codes
     logger.debug(
-        "Computed amounts - right head: %s", amount_right.head().to_dict()
+        "Groups: %d, with left rows: %d, with right rows: %d",
+        len(all_keys),
+        int((index.left.sizes > 0).sum()),
+        int((index.right.sizes > 0).sum()),
     )
 
-    groups_left = _group_indices(df_left, detection_left)
-    groups_right = _group_indices(df_right, detection_right)
-    logger.debug(
-        "Left groups: %s", {k: len(v) for k, v in groups_left.items()}
-    )
-    logger.debug(
-        "Right groups: %s", {k: len(v) for k, v in groups_right.items()}
-    )
-
-    all_keys = set(groups_left) | set(groups_right)
-
-    matches: List[Match] = []
-    partials: List[Partial] = []
-    unmatched: List[Unmatched] = []
-
-    for key in all_keys:
-        logger.debug("Processing group %s", key)
-        left_idxs = groups_left.get(key, [])
-        right_idxs = groups_right.get(key, [])
-
-        left_rows = [(i, amount_left[i]) for i in left_idxs]
-        right_rows = [(i, amount_right[i]) for i in right_idxs]
-
-        # 1-to-1 greedy matching
-        right_map: Dict[float, List[int]] = {}
-        for idx, amt in right_rows:
-            right_map.setdefault(round(amt, 2), []).append(idx)
-
-        remaining_left: List[Tuple[int, float]] = []
-        remaining_right: List[Tuple[int, float]] = []
-
-        for l_idx, l_amt in left_rows:
-            bucket = right_map.get(round(l_amt, 2))
-            if bucket:
-                r_idx = bucket.pop(0)
+    labels_left = df_left.index.to_numpy()
+    labels_right = df_right.index.to_numpy()
+    count("groups", len(all_keys))
+
+    # Groups netting to zero with as many rows on both sides are resolved
+    # whole; their rows get code -1 in the row-level passes below. Groups
+    # with split payments differ in row count and are matched row by row.
+    netted = np.zeros(len(all_keys), dtype=bool)
+    if opts.net_groups:
+        netted = (
+            (index.left.totals(cents_left) == index.right.totals(cents_right))
+            & (index.left.sizes == index.right.sizes)
+            & (index.left.sizes > 0)
+        )
+        count("netted_groups", int(netted.sum()))
+    open_left = np.where(netted[codes_left], -1, codes_left) if netted.any() else codes_left
+    open_right = np.where(netted[codes_right], -1, codes_right) if netted.any() else codes_right
+    clock.lap("reconcile.prepare")
+
+    # Entry columns are collected as chunks: matched entries first, ordered
+    # by match id with left before right, then leftovers ordered by group.
+    sides: List[np.ndarray] = []
+    rows: List[np.ndarray] = []
+    cents: List[np.ndarray] = []
+    groups: List[np.ndarray] = []
+    match_ids: List[np.ndarray] = []
+
+    def _add(side: int, positions: np.ndarray, match_id: Union[int, np.ndarray], code: Union[int, np.ndarray]) -> None:
+        n = len(positions)
+        labels, amounts = (labels_left, cents_left) if side == LEFT else (labels_right, cents_right)
+        sides.append(np.full(n, side, dtype=np.int8))
+        rows.append(labels[positions])
+        cents.append(np.asarray(amounts[positions], dtype=np.int64))
+        groups.append(np.broadcast_to(np.asarray(code, dtype=np.int64), n))
+        match_ids.append(np.broadcast_to(np.asarray(match_id, dtype=np.int64), n))
+
+    window = opts.date_window
+    if window is not None and (detection_left.date_column is None or detection_right.date_column is None):
+        logger.warning("Date window ignored: a date column is missing in the detection")
+        window = None
+
+    # 1-to-1 matching across all groups at once, exact amounts first
+    if window is None:
+        days_left = days_right = None
+        pair_left, pair_right = match_exact(open_left, cents_left, open_right, cents_right)
+        pairable_left, pairable_right = open_left >= 0, open_right >= 0
+    else:
+        days_left, pairable_left = _days(df_left, detection_left)
+        days_right, pairable_right = _days(df_right, detection_right)
+        pairable_left &= open_left >= 0
+        pairable_right &= open_right >= 0
+        # Equal-amount candidates come from the vectorised pass; only the
+        # rows it paired outside the window go through the date search.
+        pair_left, pair_right = match_exact(
+            np.where(pairable_left, open_left, -1), cents_left, np.where(pairable_right, open_right, -1), cents_right
+        )
+        close = np.abs(days_left[pair_left] - days_right[pair_right]) <= window
+        pair_left, pair_right = pair_left[close], pair_right[close]
+        pairable_left[pair_left] = False
+        pairable_right[pair_right] = False
+        dated_left, dated_right = match_within(
+            np.where(pairable_left, open_left, -1),
+            cents_left,
+            np.where(pairable_right, open_right, -1),
+            cents_right,
+            0,
+            days_left,
+            days_right,
+            window,
+        )
+        pair_left = np.concatenate([pair_left, dated_left])
+        pair_right = np.concatenate([pair_right, dated_right])
+        order = np.lexsort((pair_left, codes_left[pair_left]))
+        pair_left, pair_right = pair_left[order], pair_right[order]
+    logger.debug("Exact 1-to-1 matches: %d", len(pair_left))
+    count("exact_pairs", len(pair_left))
+
+    if opts.tolerance > 0:
+        pairable_left[pair_left] = False
+        pairable_right[pair_right] = False
+        near_left, near_right = match_within(
+            np.where(pairable_left, open_left, -1),
+            cents_left,
+            np.where(pairable_right, open_right, -1),
+            cents_right,
+            opts.tolerance,
+            days_left,
+            days_right,
+            window,
+        )
+        logger.debug("1-to-1 matches within tolerance: %d", len(near_left))
+        count("tolerance_pairs", len(near_left))
+        pair_left = np.concatenate([pair_left, near_left])
+        pair_right = np.concatenate([pair_right, near_right])
+        # Keep 1-to-1 matches ordered by group and left row across both passes.
+        order = np.lexsort((pair_left, codes_left[pair_left]))
+        pair_left, pair_right = pair_left[order], pair_right[order]
+
+    n_pairs = len(pair_left)
+    pair_rows = np.empty(2 * n_pairs, dtype=np.result_type(labels_left, labels_right))
+    pair_rows[LEFT::2] = labels_left[pair_left]
+    pair_rows[RIGHT::2] = labels_right[pair_right]
+    pair_cents = np.empty(2 * n_pairs, dtype=np.int64)
+    pair_cents[LEFT::2] = cents_left[pair_left]
+    pair_cents[RIGHT::2] = cents_right[pair_right]
+    sides.append(np.tile(np.array([LEFT, RIGHT], dtype=np.int8), n_pairs))
+    rows.append(pair_rows)
+    cents.append(pair_cents)
+    groups.append(codes_left[pair_left].repeat(2))
+    match_ids.append(np.arange(n_pairs, dtype=np.int64).repeat(2))
+
+    left_free = open_left >= 0
+    left_free[pair_left] = False
+    right_free = open_right >= 0
+    right_free[pair_right] = False
+    rest_left = index.left.select(left_free)
+    rest_right = index.right.select(right_free)
+    has_left, has_right = rest_left.sizes > 0, rest_right.sizes > 0
+    codes = np.flatnonzero(has_left | has_right).tolist()
+
+    # m-to-n subset search on groups with leftovers on both sides
+    tasks = {
+        code: (cents_left[rest_left[code]], cents_right[rest_right[code]])
+        for code in np.flatnonzero(has_left & has_right).tolist()
+    }
+    clock.lap("reconcile.one_to_one")
+    searched = _search_groups(tasks, opts)
+    count("subset_groups", len(tasks))
+    clock.lap("reconcile.subset")
+
+    truncated = np.zeros(len(all_keys), dtype=bool)
+    next_id = n_pairs
+    leftovers: List[Tuple[int, np.ndarray, np.ndarray]] = []
+    # Per-group messages build label lists, so skip them unless they are shown.
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for code in codes:
+        key = all_keys[code]
+        pos_left = rest_left[code]
+        pos_right = rest_right[code]
+
+        found, complete, seconds = searched.get(code, ([], True, 0.0))
+        if code in searched:
+            group_time(key, seconds)
+        used_left = np.zeros(len(pos_left), dtype=bool)
+        used_right = np.zeros(len(pos_right), dtype=bool)
+        for l_items, r_items in found:
+            if debug:
                 logger.debug(
-                    "1-to-1 match: left %d -> right %d amount %.2f",
-                    l_idx,
-                    r_idx,
-                    l_amt,
-                )
-                matches.append(
-                    Match([l_idx], [r_idx], l_amt, amount_right[r_idx], 0.0)
+                    "Subset match in group %s: left %s -> right %s total %d",
+                    key,
+                    labels_left[pos_left[l_items]].tolist(),
+                    labels_right[pos_right[r_items]].tolist(),
+                    int(cents_left[pos_left[l_items]].sum()),
                 )
-            else:
-                remaining_left.append((l_idx, l_amt))
-
-        for amt_key, idxs in right_map.items():
-            remaining_right.extend([(r, amount_right[r]) for r in idxs])
-
-        # m-to-n subset search
-        while remaining_left and remaining_right:
-            res = _match_subsets(remaining_left, remaining_right)
-            if not res:
-                break
-            l_set, r_set, total = res
+            _add(LEFT, pos_left[l_items], next_id, code)
+            _add(RIGHT, pos_right[r_items], next_id, code)
+            next_id += 1
+            used_left[l_items] = True
+            used_right[r_items] = True
+        truncated[code] = not complete
+        leftovers.append((code, pos_left[~used_left], pos_right[~used_right]))
+
+    # Netted groups follow as one match each, in group order.
+    if netted.any():
+        net_left = index.left.select(open_left != codes_left).order
+        net_right = index.right.select(open_right != codes_right).order
+        net_side = np.concatenate([np.full(len(net_left), LEFT, dtype=np.int8), np.full(len(net_right), RIGHT, dtype=np.int8)])
+        net_pos = np.concatenate([net_left, net_right])
+        net_code = np.concatenate([codes_left[net_left], codes_right[net_right]])
+        order = np.lexsort((net_side, net_code))
+        net_side, net_pos, net_code = net_side[order], net_pos[order], net_code[order]
+        on_left = net_side == LEFT
+        net_rows = np.empty(len(net_pos), dtype=np.result_type(labels_left, labels_right))
+        net_rows[on_left] = labels_left[net_pos[on_left]]
+        net_rows[~on_left] = labels_right[net_pos[~on_left]]
+        net_cents = np.where(on_left, cents_left[np.where(on_left, net_pos, 0)], cents_right[np.where(on_left, 0, net_pos)])
+        sides.append(net_side)
+        rows.append(net_rows)
+        cents.append(net_cents.astype(np.int64))
+        groups.append(net_code)
+        match_ids.append(next_id + np.cumsum(netted)[net_code] - 1)
+        next_id += int(netted.sum())
+
+    for code, left, right in leftovers:
+        if debug and (len(left) or len(right)):
             logger.debug(
-                "Subset match: left %s -> right %s total %.2f",
-                l_set,
-                r_set,
-                total,
-            )
-            matches.append(
-                Match(l_set, r_set, total, total, 0.0)
+                "Partial group %s: %d left and %d right rows, diff %d",
+                all_keys[code],
+                len(left),
+                len(right),
+                int(cents_left[left].sum() - cents_right[right].sum()),
             )
-            remaining_left = [lr for lr in remaining_left if lr[0] not in l_set]
-            remaining_right = [rr for rr in remaining_right if rr[0] not in r_set]
-
-        if remaining_left or remaining_right:
-            partial = Partial(
-                [i for i, _ in remaining_left],
-                [i for i, _ in remaining_right],
-                sum(amt for _, amt in remaining_left),
-                sum(amt for _, amt in remaining_right),
-                sum(amt for _, amt in remaining_left)
-                - sum(amt for _, amt in remaining_right),
-            )
-            logger.debug(
-                "Partial group %s: left %s (%.2f) right %s (%.2f) diff %.2f",
-                key,
-                partial.left_rows,
-                partial.amount_left,
-                partial.right_rows,
-                partial.amount_right,
-                partial.diff,
-            )
-            partials.append(partial)
-
-        for idx, amt in remaining_left:
-            logger.debug("Unmatched left row %d amount %.2f", idx, amt)
-            unmatched.append(Unmatched("left", idx, amt))
-        for idx, amt in remaining_right:
-            logger.debug("Unmatched right row %d amount %.2f", idx, amt)
-            unmatched.append(Unmatched("right", idx, amt))
+        _add(LEFT, left, -1, code)
+        _add(RIGHT, right, -1, code)
+
+    match = np.concatenate(match_ids)
+    side = np.concatenate(sides)
+    entry_cents = np.concatenate(cents)
+    matched = match >= 0
+    match_totals = np.zeros((next_id, 2), dtype=np.int64)
+    np.add.at(match_totals, (match[matched], side[matched]), entry_cents[matched])
+    result = ReconcileResult(
+        side=side,
+        row=np.concatenate(rows),
+        cents=entry_cents,
+        group=np.concatenate(groups),
+        match=match,
+        match_diff=match_totals[:, LEFT] - match_totals[:, RIGHT],
+        keys=all_keys,
+        truncated=truncated,
+        pairs=n_pairs,
+        netted=netted,
+    )
 
+    count("truncated_groups", int(truncated.sum()))
+    count("matches", len(result.matches))
+    count("partials", len(result.partials))
+    count("unmatched", len(result.unmatched))
+    clock.lap("reconcile.assemble")
+    if truncated.any():
+        logger.warning(
+            "Subset search budget exhausted in %d group(s): %s",
+            int(truncated.sum()),
+            result.truncated_keys,
+        )
     logger.info(
         "Reconciliation finished: %d matches, %d partials, %d unmatched rows",
-        len(matches),
-        len(partials),
-        len(unmatched),
+        len(result.matches),
+        len(result.partials),
+        len(result.unmatched),
     )
-    return matches, partials, unmatched
-
+    return result
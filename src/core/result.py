@@ -0,0 +1,280 @@
+"""Reconciliation results stored column-wise with lazy row views."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Iterator, List, Tuple
+
+import numpy as np
+
+LEFT, RIGHT = 0, 1
+_SIDES = ("left", "right")
+
+
+@dataclass
+class Match:
+    """Fully matched row groups.
+
+    Amounts are kept in cents; the float ``amount_*`` and ``diff``
+    properties are meant for reports only.
+    """
+
+    left_rows: List[int]
+    right_rows: List[int]
+    left_cents: int
+    right_cents: int
+    diff_cents: int = 0
+
+    @property
+    def amount_left(self) -> float:
+        return self.left_cents / 100
+
+    @property
+    def amount_right(self) -> float:
+        return self.right_cents / 100
+
+    @property
+    def diff(self) -> float:
+        return self.diff_cents / 100
+
+
+@dataclass
+class Partial:
+    """Rows with the same key that do not net to zero, amounts in cents."""
+
+    left_rows: List[int]
+    right_rows: List[int]
+    left_cents: int
+    right_cents: int
+    diff_cents: int
+    group: Tuple = ()
+    truncated: bool = False
+
+    @property
+    def amount_left(self) -> float:
+        return self.left_cents / 100
+
+    @property
+    def amount_right(self) -> float:
+        return self.right_cents / 100
+
+    @property
+    def diff(self) -> float:
+        return self.diff_cents / 100
+
+
+@dataclass
+class Unmatched:
+    """Individual rows left without a counterpart, amount in cents."""
+
+    side: str
+    row: int
+    cents: int
+
+    @property
+    def amount(self) -> float:
+        return self.cents / 100
+
+
+def _runs(values: np.ndarray) -> np.ndarray:
+    """Return the start of every run of equal values plus the end offset."""
+    if not len(values):
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(np.diff(values)) + 1
+    return np.concatenate([[0], starts, [len(values)]]).astype(np.int64)
+
+
+class _View(Sequence):
+    """Read-only sequence building result objects on access."""
+
+    def __init__(self, result: "ReconcileResult") -> None:
+        self.result = result
+
+    def _build(self, i: int) -> Any:
+        raise NotImplementedError
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self._build(k) for k in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._build(i)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self._build(i) for i in range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Sequence, _View)) and not isinstance(other, (str, bytes)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} of {len(self)}>"
+
+
+class MatchView(_View):
+    """Matches of a :class:`ReconcileResult` as :class:`Match` objects."""
+
+    def __len__(self) -> int:
+        return len(self.result.match_diff)
+
+    def _build(self, i: int) -> Match:
+        r = self.result
+        lo, hi = r._match_bounds[i], r._match_bounds[i + 1]
+        side = r.side[lo:hi]
+        rows = r.row[lo:hi]
+        cents = r.cents[lo:hi]
+        left = side == LEFT
+        return Match(
+            rows[left].tolist(),
+            rows[~left].tolist(),
+            int(cents[left].sum()),
+            int(cents[~left].sum()),
+            int(r.match_diff[i]),
+        )
+
+
+class PartialView(_View):
+    """Leftover rows of each group as :class:`Partial` objects."""
+
+    def __len__(self) -> int:
+        return len(self.result._partial_bounds) - 1
+
+    def _build(self, i: int) -> Partial:
+        r = self.result
+        lo, hi = r._partial_bounds[i] + r.n_matched, r._partial_bounds[i + 1] + r.n_matched
+        side = r.side[lo:hi]
+        rows = r.row[lo:hi]
+        cents = r.cents[lo:hi]
+        left = side == LEFT
+        code = int(r.group[lo])
+        total_left, total_right = int(cents[left].sum()), int(cents[~left].sum())
+        return Partial(
+            rows[left].tolist(),
+            rows[~left].tolist(),
+            total_left,
+            total_right,
+            total_left - total_right,
+            group=r.keys[code],
+            truncated=bool(r.truncated[code]),
+        )
+
+
+class UnmatchedView(_View):
+    """Leftover rows as :class:`Unmatched` objects."""
+
+    def __len__(self) -> int:
+        return len(self.result.side) - self.result.n_matched
+
+    def _build(self, i: int) -> Unmatched:
+        r = self.result
+        k = r.n_matched + i
+        return Unmatched(_SIDES[r.side[k]], r.row[k : k + 1].tolist()[0], int(r.cents[k]))
+
+    def __iter__(self) -> Iterator[Unmatched]:
+        r = self.result
+        tail = slice(r.n_matched, None)
+        for side, row, cents in zip(r.side[tail].tolist(), r.row[tail].tolist(), r.cents[tail].tolist()):
+            yield Unmatched(_SIDES[side], row, cents)
+
+
+@dataclass(eq=False)
+class ReconcileResult:
+    """Structure-of-arrays outcome of :func:`~src.core.reconcile.reconcile`.
+
+    Every row taking part in the reconciliation is one entry of the
+    parallel arrays below. Matched entries come first, ordered by match id
+    with left rows before right rows; leftover entries follow, ordered by
+    group with left rows before right rows.
+
+    Attributes
+    ----------
+    side:
+        ``0`` for the left table and ``1`` for the right one.
+    row:
+        Row label in the respective table.
+    cents:
+        Debit minus credit of the row in cents.
+    group:
+        Position of the row's group key in ``keys``.
+    match:
+        Match id, or ``-1`` for leftover rows.
+    match_diff:
+        Left minus right total of each match in cents.
+    keys:
+        Group key tuples by group code.
+    truncated:
+        Whether the subset search of each group stopped early.
+    pairs:
+        Number of 1-to-1 matches. They hold the lowest match ids, ordered by
+        group and left row; subset matches follow by group.
+    netted:
+        Whether each group was resolved whole because its totals net to
+        zero over as many rows on both sides. Such a group is one match holding all its rows; these matches
+        come last, by group.
+    """
+
+    side: np.ndarray
+    row: np.ndarray
+    cents: np.ndarray
+    group: np.ndarray
+    match: np.ndarray
+    match_diff: np.ndarray
+    keys: List[Tuple] = field(default_factory=list)
+    truncated: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    pairs: int = 0
+    netted: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+
+    @cached_property
+    def n_matched(self) -> int:
+        """Number of entries belonging to a match."""
+        return int(np.searchsorted(self.match < 0, True))
+
+    @cached_property
+    def _match_bounds(self) -> np.ndarray:
+        return _runs(self.match[: self.n_matched])
+
+    @cached_property
+    def _partial_bounds(self) -> np.ndarray:
+        return _runs(self.group[self.n_matched :])
+
+    @property
+    def matches(self) -> MatchView:
+        return MatchView(self)
+
+    @property
+    def partials(self) -> PartialView:
+        return PartialView(self)
+
+    @property
+    def unmatched(self) -> UnmatchedView:
+        return UnmatchedView(self)
+
+    @property
+    def truncated_keys(self) -> List[Tuple]:
+        return [self.keys[code] for code in np.flatnonzero(self.truncated)]
+
+    def rows_to_highlight(self, side: str) -> np.ndarray:
+        """Return labels of ``side`` rows that are unmatched or in an unequal match."""
+        flag = _SIDES.index(side)
+        bad_match = np.zeros(len(self.side), dtype=bool)
+        matched = slice(None, self.n_matched)
+        bad_match[matched] = self.match_diff[self.match[matched]] != 0
+        bad_match[self.n_matched :] = True
+        return self.row[(self.side == flag) & bad_match]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ReconcileResult):
+            return NotImplemented
+        arrays = ("side", "row", "cents", "group", "match", "match_diff", "truncated", "netted")
+        return self.keys == other.keys and self.pairs == other.pairs and all(
+            np.array_equal(getattr(self, name), getattr(other, name)) for name in arrays
+        )
+
+    def __iter__(self) -> Iterator[_View]:
+        """Unpack as ``matches, partials, unmatched`` like a plain tuple."""
+        return iter((self.matches, self.partials, self.unmatched))
@@ -0,0 +1,146 @@
+"""Bounded m-to-n subset matching on integer-cent amounts."""
+
+from __future__ import annotations
+
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+class _Meter:
+    """Work and time budget shared by all searches of one group."""
+
+    def __init__(self, budget: int, timeout: Optional[float]) -> None:
+        self.left = budget
+        self.deadline = None if timeout is None else perf_counter() + timeout
+        self.exhausted = False
+
+    def spend(self, units: int) -> bool:
+        self.left -= units
+        if self.left < 0 or (self.deadline is not None and perf_counter() > self.deadline):
+            self.exhausted = True
+        return not self.exhausted
+
+
+class _Sums:
+    """Subset sums of one side with back-pointers to rebuild each subset.
+
+    A subset is represented by its state ``(sum, last row)``: two subsets with
+    the same sum and the same last row extend to exactly the same sums, so
+    keeping one of them loses no reachable sum. ``table`` maps a state to
+    ``(previous state, size)`` and ``sums`` lists the states reaching every
+    sum. Subsets are grown one row at a time, all subsets of size ``k``
+    before any of size ``k + 1``, and are only extended with rows after their
+    last row, so following the back-pointers never repeats a row and every
+    state keeps its smallest subset.
+    """
+
+    def __init__(self, amounts: Sequence[int], items: List[int], max_size: int) -> None:
+        self.amounts = amounts
+        self.items = items
+        self.max_size = max_size
+        self.size = 0
+        self.table: Dict[Tuple[int, int], Tuple[Tuple[int, int], int]] = {(0, -1): ((0, -1), 0)}
+        self.sums: Dict[int, List[Tuple[int, int]]] = {}
+        self.layer = [(0, -1)]
+
+    @property
+    def done(self) -> bool:
+        return not self.layer or self.size >= self.max_size
+
+    def grow(self, meter: _Meter) -> None:
+        """Add all subsets one row larger than the current largest ones."""
+        n = len(self.items)
+        self.size += 1
+        next_layer: List[Tuple[int, int]] = []
+        for state in self.layer:
+            s, last = state
+            if not meter.spend(n - last - 1):
+                break
+            for k in range(last + 1, n):
+                t = (s + self.amounts[self.items[k]], k)
+                if t not in self.table:
+                    self.table[t] = (state, self.size)
+                    self.sums.setdefault(t[0], []).append(t)
+                    next_layer.append(t)
+        self.layer = next_layer
+
+    def subset(self, state: Tuple[int, int]) -> List[int]:
+        rows: List[int] = []
+        while state[1] >= 0:
+            rows.append(self.items[state[1]])
+            state = self.table[state][0]
+        rows.reverse()
+        return rows
+
+    def free_subset(self, total: int, used: Set[int]) -> Optional[List[int]]:
+        """Return the first subset summing to ``total`` that avoids ``used``."""
+        for state in self.sums[total]:
+            rows = self.subset(state)
+            if not used.intersection(rows):
+                return rows
+        return None
+
+
+def match_subsets(
+    left: Sequence[int],
+    right: Sequence[int],
+    max_size: int = 10,
+    budget: int = 1_000_000,
+    timeout: Optional[float] = None,
+) -> Tuple[List[Tuple[List[int], List[int]]], bool]:
+    """Find disjoint left/right subsets with equal non-zero totals.
+
+    Parameters
+    ----------
+    left, right:
+        Amounts in cents of the rows still unmatched in one group.
+    max_size:
+        Largest number of rows taken from one side for a single match.
+    budget:
+        Maximum number of subset-sum extensions tried for the group.
+    timeout:
+        Optional wall-clock limit in seconds for the group.
+
+    Returns
+    -------
+    tuple
+        List of ``(left_positions, right_positions)`` matches and a flag that
+        is ``False`` when the budget ran out before the search completed.
+    """
+
+    meter = _Meter(budget, timeout)
+    found: List[Tuple[List[int], List[int]]] = []
+    left_free = [i for i, amt in enumerate(left) if amt != 0]
+    right_free = [i for i, amt in enumerate(right) if amt != 0]
+
+    while left_free and right_free and not meter.exhausted:
+        sides = [_Sums(left, left_free, max_size), _Sums(right, right_free, max_size)]
+        while not meter.exhausted:
+            pending = [side for side in sides if not side.done]
+            if not pending:
+                break
+            min(pending, key=lambda side: len(side.table)).grow(meter)
+        left_sums, right_sums = sides
+
+        # Take as many disjoint matches as the current tables allow before
+        # rebuilding them on the rows that are still free.
+        used_left: Set[int] = set()
+        used_right: Set[int] = set()
+        for total in left_sums.sums:
+            if total == 0 or total not in right_sums.sums:
+                continue
+            l_items = left_sums.free_subset(total, used_left)
+            r_items = right_sums.free_subset(total, used_right)
+            if l_items is None or r_items is None:
+                continue
+            used_left.update(l_items)
+            used_right.update(r_items)
+            found.append((l_items, r_items))
+
+        if not used_left:
+            break
+        left_free = [i for i in left_free if i not in used_left]
+        right_free = [i for i in right_free if i not in used_right]
+
+    complete = not meter.exhausted or not (left_free and right_free)
+    return found, complete
@@ -0,0 +1,158 @@
+"""Columnar audit trail of the amounts that went into a reconciliation.
+
+Instead of logging every amount cell, a run stores the parsed amount
+columns and the reconciliation result as arrays in one compressed ``.npz``
+file. :class:`AuditTrail` opens such a file lazily: the metadata and the
+column totals are read on open, the arrays of a column only when it is
+queried.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.core.result import ReconcileResult
+
+from .writer import _column_index, _column_letter
+
+_META = "meta"
+_RESULT = "result"
+_RESULT_FIELDS = ("side", "row", "cents", "group", "match", "match_diff", "truncated", "netted")
+# By default data row 0 is the first row below the header, i.e. sheet row 2.
+FIRST_ROW = 2
+
+
+@dataclass
+class AuditColumn:
+    """One parsed amount column.
+
+    Parameters
+    ----------
+    source:
+        Workbook the column was read from.
+    column:
+        0-based sheet column index.
+    cents:
+        Parsed amounts in cents.
+    rows:
+        0-based data row of every amount, ``0..len(cents)`` by default.
+    first_row:
+        1-based sheet row of data row 0.
+    """
+
+    source: str
+    column: int
+    cents: np.ndarray
+    rows: Optional[np.ndarray] = None
+    first_row: int = FIRST_ROW
+
+
+def write_audit(
+    path: Union[str, Path],
+    columns: Mapping[str, AuditColumn],
+    result: Optional[ReconcileResult] = None,
+    **meta: Any,
+) -> Path:
+    """Write ``columns`` and ``result`` as one compressed audit file.
+
+    ``columns`` maps names such as ``"left.debit"`` to their values. Extra
+    keyword arguments are stored as JSON metadata.
+    """
+
+    path = Path(path)
+    arrays: Dict[str, np.ndarray] = {}
+    described = {}
+    for name, col in columns.items():
+        cents = np.asarray(col.cents, dtype=np.int64)
+        rows = np.arange(len(cents), dtype=np.int64) if col.rows is None else np.asarray(col.rows, dtype=np.int64)
+        arrays[f"{name}.cents"] = cents
+        arrays[f"{name}.rows"] = rows
+        described[name] = {
+            "source": str(col.source),
+            "column": int(col.column),
+            "letter": _column_letter(int(col.column) + 1),
+            "rows": len(cents),
+            "first_row": int(col.first_row),
+            "total": int(cents.sum()),
+        }
+    info: Dict[str, Any] = {"columns": described, **meta}
+    if result is not None:
+        for attr in _RESULT_FIELDS:
+            values = np.asarray(getattr(result, attr))
+            # Text row labels are stored as strings to keep the file pickle free.
+            arrays[f"{_RESULT}.{attr}"] = values.astype(str) if values.dtype == object else values
+        info["keys"] = [list(k) for k in result.keys]
+        info["pairs"] = result.pairs
+    arrays[_META] = np.array(json.dumps(info, ensure_ascii=False, default=str))
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    return path
+
+
+class AuditTrail:
+    """Read-only view of an audit file.
+
+    Use it as a context manager or call :meth:`close` to release the file.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._npz = np.load(self.path, allow_pickle=False)
+        self.meta: Dict[str, Any] = json.loads(str(self._npz[_META]))
+
+    def __enter__(self) -> "AuditTrail":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._npz.close()
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of the stored amount columns."""
+        return list(self.meta["columns"])
+
+    def totals(self) -> Dict[str, float]:
+        """Return the total of every column without reading its arrays."""
+        return {name: c["total"] / 100 for name, c in self.meta["columns"].items()}
+
+    def cells(self, name: str) -> pd.DataFrame:
+        """Return the ``address`` and ``amount`` of every cell of column ``name``."""
+        info = self.meta["columns"][name]
+        rows = self._npz[f"{name}.rows"] + info.get("first_row", FIRST_ROW)
+        address = np.char.add(info["letter"], rows.astype(str))
+        return pd.DataFrame({"address": address, "amount": self._npz[f"{name}.cents"] / 100})
+
+    def cell(self, name: str, address: str) -> Optional[float]:
+        """Return the amount stored for sheet cell ``address`` of column ``name``.
+
+        ``None`` is returned when the address lies outside the column.
+        """
+        found = re.fullmatch(r"([A-Z]+)(\d+)", address.strip().upper())
+        if found is None:
+            raise ValueError(f"Not a cell address: {address!r}")
+        info = self.meta["columns"][name]
+        if _column_index(found.group(1)) != info["column"] + 1:
+            return None
+        rows = self._npz[f"{name}.rows"]
+        hit = np.flatnonzero(rows == int(found.group(2)) - info.get("first_row", FIRST_ROW))
+        if not len(hit):
+            return None
+        return int(self._npz[f"{name}.cents"][hit[0]]) / 100
+
+    def result(self) -> Optional[ReconcileResult]:
+        """Return the stored reconciliation result, if the run had one."""
+        if f"{_RESULT}.side" not in self._npz.files:
+            return None
+        arrays = {attr: self._npz[f"{_RESULT}.{attr}"] for attr in _RESULT_FIELDS}
+        keys = [tuple(k) for k in self.meta.get("keys", [])]
+        return ReconcileResult(keys=keys, pairs=self.meta.get("pairs", 0), **arrays)
@@ -0,0 +1,165 @@
+"""On-disk cache of parsed workbooks keyed by content hash."""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .loader import Source, read_excel, read_sample
+
+_META = "meta.json"
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory from ``BALANCE_CHECK_CACHE`` or the user cache."""
+    env = os.environ.get("BALANCE_CHECK_CACHE")
+    if env:
+        return Path(env)
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "balance_check"
+
+
+class ParsedCache:
+    """Store parsed columns as one ``.npy`` file per column.
+
+    Numeric and datetime columns are memory-mapped on load, so a warm read
+    costs a few file opens instead of a workbook parse. Text columns are
+    stored pickled and read eagerly. Entries are evicted least recently used
+    first once the cache grows beyond ``max_bytes``.
+
+    Parameters
+    ----------
+    directory:
+        Folder holding one sub-folder per cached entry.
+    max_bytes:
+        Upper bound on the total size of all entries.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = 2 << 30) -> None:
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(content_hash: str, **options: Any) -> str:
+        """Combine the file hash with the loader options into an entry name."""
+        blob = json.dumps([content_hash, options], sort_keys=True, default=str)
+        return hashlib.md5(blob.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """Return the cached frame and coordinates for ``key`` if present."""
+        entry = self.directory / key
+        try:
+            meta = json.loads((entry / _META).read_text())
+            data = {
+                name: np.load(entry / f"{i}.npy", mmap_mode=None if pickled else "r", allow_pickle=pickled)
+                for i, (name, pickled) in enumerate(zip(meta["columns"], meta["pickled"]))
+            }
+            os.utime(entry / _META)
+        except (OSError, ValueError, KeyError):
+            # Drop a damaged entry so the next put can store the key again.
+            shutil.rmtree(entry, ignore_errors=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        df = pd.DataFrame(data, columns=meta["columns"], copy=False)
+        df.attrs.update(meta["attrs"])
+        return df, meta["coordinates"]
+
+    def put(self, key: str, df: pd.DataFrame, coordinates: Dict[str, Any]) -> None:
+        """Store ``df`` and its coordinates under ``key`` and evict old entries."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = Path(mkdtemp(dir=self.directory, prefix=".tmp-"))
+        try:
+            pickled = []
+            for i, name in enumerate(df.columns):
+                values = df[name].to_numpy()
+                pickled.append(values.dtype == object)
+                np.save(tmp / f"{i}.npy", values, allow_pickle=values.dtype == object)
+            meta = {
+                "columns": [str(c) for c in df.columns],
+                "pickled": pickled,
+                "attrs": dict(df.attrs),
+                "coordinates": coordinates,
+            }
+            (tmp / _META).write_text(json.dumps(meta, default=str))
+            dest = self.directory / key
+            for _ in range(2):
+                try:
+                    os.replace(tmp, dest)
+                    break
+                except OSError as error:
+                    if error.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                        raise
+                    # Another worker stored the key first; entries of one
+                    # key hold the same table, so its copy is kept.
+                    if (dest / _META).exists():
+                        break
+                    # What is left of an entry being evicted.
+                    shutil.rmtree(dest, ignore_errors=True)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict(keep=key)
+
+    def load(
+        self,
+        content_hash: str,
+        path: Source,
+        columns: Optional[Sequence[int]] = None,
+        streaming: bool = True,
+        **options: Any,
+    ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Return :func:`read_excel` output for ``path``, parsing only on a miss."""
+        key = self.key(
+            content_hash,
+            columns=None if columns is None else sorted(columns),
+            streaming=streaming,
+            **options,
+        )
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        df, coordinates = read_excel(path, columns=columns, streaming=streaming, **options)
+        self.put(key, df, coordinates)
+        return df, coordinates
+
+    def sample(
+        self, content_hash: str, path: Source, rows: int = 7, **options: Any
+    ) -> pd.DataFrame:
+        """Return :func:`read_sample` output for ``path``, parsing only on a miss."""
+        key = self.key(content_hash, sample=rows, **options)
+        cached = self.get(key)
+        if cached is not None:
+            return cached[0]
+        df = read_sample(path, rows=rows, **options)
+        self.put(key, df, {})
+        return df
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for entry in self.directory.iterdir():
+            if entry.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append(((entry / _META).stat().st_mtime, entry, size))
+            except FileNotFoundError:
+                # Evicted by another worker or still being written.
+                continue
+        total = sum(size for _, _, size in entries)
+        for _, entry, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -1,47 +1,219 @@
-"""Excel file loading utilities."""
+"""Excel workbook, CSV and Parquet loading utilities."""
 
 from __future__ import annotations
 
-from typing import Literal, Tuple, Dict, Any, Optional, Pattern, List
+import codecs
+import csv
+import io
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Literal, Tuple, Dict, Any, Iterator, Optional, Pattern, List, Sequence, Union, BinaryIO
 
 import re
 
+import numpy as np
 import pandas as pd
 
+from src.llm.schema import Detection
+from src.utils.numeric import parse_cents
 
-def infer_engine(path: str) -> Literal["openpyxl", "xlrd"]:
-    """Infer the pandas engine based on file extension.
+Source = Union[str, Path, BinaryIO]
+Sheet = Union[int, str]
+Engine = Literal["openpyxl", "xlrd", "csv", "parquet"]
+
+_ENGINES: Dict[str, Engine] = {
+    ".xlsx": "openpyxl",
+    ".xls": "xlrd",
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".txt": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+# Engines reading a single table rather than a workbook of sheets.
+TABLE_ENGINES = ("csv", "parquet")
+
+
+def infer_engine(path: str) -> Engine:
+    """Infer the reader engine based on file extension.
 
     Parameters
     ----------
     path: str
-        Path to the Excel file.
+        Path to the workbook or table file.
 
     Returns
     -------
-    Literal["openpyxl", "xlrd"]
-        The engine name to use with ``pandas.read_excel``.
+    Literal["openpyxl", "xlrd", "csv", "parquet"]
+        ``openpyxl`` and ``xlrd`` are the ``pandas.read_excel`` engines of
+        xlsx and xls workbooks, ``csv`` and ``parquet`` read table files.
+    """
+
+    engine = _ENGINES.get(Path(path).suffix.lower())
+    if engine is None:
+        raise ValueError(f"Unsupported file extension in '{path}'.")
+    return engine
+
+
+def is_table(path: str) -> bool:
+    """Return whether ``path`` names a CSV or Parquet file rather than a workbook."""
+    return _ENGINES.get(Path(path).suffix.lower()) in TABLE_ENGINES
+
+
+Span = Tuple[int, int, Optional[int]]
+
+# Labels of the total and turnover rows that end the data of a statement.
+_FOOTER = re.compile(
+    r"\s*(?:(?:итого|всего)(?![а-яё])|обороты? за период|сальдо на конец|turnover.*period|closing balance"
+    r"|(?:grand )?totals?\s*:?\s*$)",
+    re.IGNORECASE,
+)
+
+
+def _span(header_row: int = 0, start_row: Optional[int] = None, end_row: Optional[int] = None) -> Span:
+    """Normalise a row range to ``(header, first data row, end or None)``.
+
+    Data starts right below the header unless ``start_row`` lies further
+    down. An ``end_row`` not past the first data row reads to the end of the
+    sheet.
     """
+    start = header_row + 1 if start_row is None else max(start_row, header_row + 1)
+    end = end_row if end_row is not None and end_row > start else None
+    return header_row, start, end
+
+
+def _stop(span: Span, limit: Optional[int] = None) -> Optional[int]:
+    """Return the 0-based row past the last one to read, ``None`` for the sheet end."""
+    _, start, end = span
+    if limit is None:
+        return end
+    return start + limit if end is None else min(end, start + limit)
 
-    lowered = path.lower()
-    if lowered.endswith(".xlsx"):
-        return "openpyxl"
-    if lowered.endswith(".xls"):
-        return "xlrd"
-    raise ValueError(f"Unsupported file extension in '{path}'.")
+
+def _declared(span: Span, n_sheet_rows: int) -> int:
+    """Return how many of the ``n_sheet_rows`` rows of a sheet fall into ``span``."""
+    _, start, end = span
+    return max(min(n_sheet_rows, n_sheet_rows if end is None else end) - start, 0)
+
+
+def detection_rows(detection: Detection) -> Dict[str, int]:
+    """Return the row range of ``detection`` as loader keyword arguments.
+
+    Rows are 0-based sheet rows: ``header_row`` holds the column names and
+    data runs from ``start_row`` up to, not including, ``end_row``, so
+    preamble and footer rows are never parsed.
+    """
+    return {"header_row": detection.header_row, "start_row": detection.start_row, "end_row": detection.end_row}
 
 
-def read_excel(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
-    """Read an Excel file and capture sheet metadata.
+def footer_columns(detection: Detection) -> List[int]:
+    """Return the sheet columns searched for the label of a total row.
 
-    The function loads the first sheet into a ``pandas.DataFrame`` and
+    Statements label their total and turnover rows ("Итого", "Оборот за
+    период") left of the amounts, so every column before the first amount
+    column is searched. Pass them to :func:`read_excel` or
+    :func:`iter_chunks` to end the data at the first such row, which the
+    head sample used for detection cannot show.
+    """
+    return list(range(min(detection.debit_column, detection.credit_column)))
+
+
+def _with_footer(columns: Optional[Sequence[int]], footer: Optional[Sequence[int]]) -> Optional[List[int]]:
+    """Return the columns to read so that the ``footer`` columns are searched too."""
+    if columns is None:
+        return None
+    return sorted(set(columns) | set(footer or ()))
+
+
+def _footer_start(frame: pd.DataFrame, coords: Sequence[int], footer: Sequence[int]) -> Optional[int]:
+    """Return the position of the first row of ``frame`` labelled as a total."""
+    searched = {c + 1 for c in footer}
+    first = None
+    for i, coord in enumerate(coords):
+        if coord not in searched or frame.dtypes.iloc[i] != object:
+            continue
+        for r, value in enumerate(frame.iloc[:first, i].tolist()):
+            if isinstance(value, str) and _FOOTER.match(value):
+                first = r
+                break
+    return first
+
+
+def _cut_footer(
+    frame: pd.DataFrame, coords: Sequence[int], columns: Optional[Sequence[int]], footer: Sequence[int]
+) -> Tuple[pd.DataFrame, List[int], bool]:
+    """Drop the rows from the first total row on and the columns only searched for it.
+
+    Returns the frame, the 1-based sheet columns of its columns and whether
+    a total row was found.
+    """
+    stop = _footer_start(frame, coords, footer)
+    if stop is not None:
+        frame = frame.iloc[:stop]
+    coords = list(coords)
+    if columns is not None:
+        keep = [i for i, coord in enumerate(coords) if coord - 1 in set(columns)]
+        frame, coords = frame.iloc[:, keep], [coords[i] for i in keep]
+    return frame, coords, stop is not None
+
+
+def sheet_rows(detection: Detection) -> range:
+    """Return the 1-based sheet row of every data row loaded for ``detection``.
+
+    Data row ``r`` of a frame read with :func:`detection_rows` lies on sheet
+    row ``sheet_rows(detection)[r]``. The range is open ended when the
+    detection does not bound its rows.
+    """
+    _, start, end = _span(**detection_rows(detection))
+    return range(start + 1, sys.maxsize if end is None else end + 1)
+
+
+def read_excel(
+    path: Source,
+    columns: Optional[Sequence[int]] = None,
+    streaming: bool = False,
+    engine: Optional[Engine] = None,
+    sheet: Sheet = 0,
+    header_row: int = 0,
+    start_row: Optional[int] = None,
+    end_row: Optional[int] = None,
+    footer_columns: Optional[Sequence[int]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Read an Excel, CSV or Parquet file and capture sheet metadata.
+
+    The function loads one sheet into a ``pandas.DataFrame`` and
     returns a mapping containing the sheet name and original cell
-    coordinates (row and column indices starting from 1).
+    coordinates (row and column indices starting from 1). CSV and Parquet
+    files hold a single sheet named after the file; see :func:`_read_table`.
 
     Parameters
     ----------
-    path: str
-        Path to the Excel file.
+    path: str, pathlib.Path or binary file object
+        File to read. File objects require ``engine``.
+    columns: sequence of int, optional
+        Zero-based positions of the columns to load. All columns are loaded
+        when omitted. ``col_coords`` in the metadata maps the returned
+        columns back to their sheet positions.
+    streaming: bool, default ``False``
+        Stream rows in read-only mode instead of materialising every cell of
+        the sheet. Only the requested columns are kept and each one is
+        converted to a typed NumPy array.
+    engine: {"openpyxl", "xlrd", "csv", "parquet"}, optional
+        Engine to use, inferred from the file extension by default.
+    sheet: int or str, default ``0``
+        Position or name of the sheet to read. Ignored for CSV and Parquet.
+    header_row, start_row, end_row: int, optional
+        0-based sheet rows of the column names, of the first data row and
+        past the last data row, see :func:`detection_rows`. By default the
+        first row is the header and data runs to the end of the sheet.
+        ``row_coords`` in the metadata maps the returned rows back to their
+        1-based sheet rows.
+    footer_columns: sequence of int, optional
+        Zero-based columns searched for the label of a total or turnover
+        row, see :func:`footer_columns`. The data ends before the first such
+        row. Columns only searched are not returned.
 
     Returns
     -------
@@ -49,38 +221,670 @@ def read_excel(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         The dataframe of the sheet contents and a metadata dictionary.
     """
 
-    engine = infer_engine(path)
+    if engine is None:
+        engine = infer_engine(str(path))
+    span = _span(header_row, start_row, end_row)
+    loaded = _with_footer(columns, footer_columns)
     try:
-        df = pd.read_excel(path, engine=engine)
+        if engine in TABLE_ENGINES:
+            df, sheet_name, col_coords = _read_table(path, engine, loaded, span=span)
+        elif streaming:
+            df, sheet_name, col_coords = _stream_excel(path, engine, loaded, sheet=sheet, span=span)
+        else:
+            usecols = None if loaded is None else list(loaded)
+            header, start, end = span
+            df = pd.read_excel(
+                path,
+                engine=engine,
+                usecols=usecols,
+                sheet_name=sheet,
+                skiprows=[*range(header), *range(header + 1, start)] or None,
+                nrows=None if end is None else end - start,
+            )
+            sheet_name = df.attrs.get("sheet_name", getattr(df, "sheet_name", None))
+            if isinstance(sheet, str):
+                sheet_name = sheet
+            col_coords = [c + 1 for c in sorted(loaded)] if loaded is not None else None
     except Exception as exc:  # pragma: no cover - tested via unit tests
-        raise RuntimeError(f"Failed to read Excel file '{path}': {exc}") from exc
+        raise RuntimeError(f"Failed to read file '{path}': {exc}") from exc
+    if footer_columns:
+        coords = col_coords or list(range(1, len(df.columns) + 1))
+        df, col_coords, _ = _cut_footer(df, coords, columns, footer_columns)
 
     # Build coordinates mapping
     coordinates: Dict[str, Any] = {
-        "sheet_name": df.attrs.get("sheet_name", getattr(df, "sheet_name", None)),
-        "row_coords": list(range(1, len(df) + 1)),
-        "col_coords": list(range(1, len(df.columns) + 1)),
+        "sheet_name": sheet_name,
+        "row_coords": list(range(span[1] + 1, span[1] + 1 + len(df))),
+        "col_coords": col_coords or list(range(1, len(df.columns) + 1)),
     }
 
     return df, coordinates
 
 
-def _parse_numeric(value: Any) -> Optional[float]:
-    """Parse a numeric value from arbitrary cell contents."""
+def read_sample(
+    path: Source,
+    rows: int = 7,
+    engine: Optional[Engine] = None,
+    sheet: Sheet = 0,
+    header_row: int = 0,
+    start_row: Optional[int] = None,
+    end_row: Optional[int] = None,
+) -> pd.DataFrame:
+    """Read the header and the first ``rows`` data rows of ``sheet``.
+
+    This is the first phase of a two-phase load: the sample is enough for
+    column detection and reading stops right after it, so detection does not
+    wait for the whole sheet. ``attrs["n_rows"]`` holds the number of data
+    rows declared by the sheet; CSV files count their line breaks. The row
+    range is given as in :func:`read_excel`.
+    """
+
+    if engine is None:
+        engine = infer_engine(str(path))
+    span = _span(header_row, start_row, end_row)
+    try:
+        if engine in TABLE_ENGINES:
+            df, _, _ = _read_table(path, engine, None, limit=rows, span=span)
+        else:
+            df, _, _ = _stream_excel(path, engine, None, limit=rows, sheet=sheet, span=span)
+    except Exception as exc:  # pragma: no cover - tested via unit tests
+        raise RuntimeError(f"Failed to read file '{path}': {exc}") from exc
+    return df
+
+
+def iter_chunks(
+    path: Source,
+    columns: Optional[Sequence[int]] = None,
+    chunk_rows: int = 100_000,
+    engine: Optional[Engine] = None,
+    sheet: Sheet = 0,
+    header_row: int = 0,
+    start_row: Optional[int] = None,
+    end_row: Optional[int] = None,
+    footer_columns: Optional[Sequence[int]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Stream ``sheet`` as frames of at most ``chunk_rows`` data rows.
+
+    Chunks hold the columns ``read_excel(..., streaming=True)`` returns for
+    the same row range and ``footer_columns`` and are indexed by data row
+    position, so concatenating them gives the same rows. With
+    ``footer_columns`` streaming stops at the first total row. Each chunk
+    types its columns on its own. Trailing rows without any value are
+    dropped.
+    """
+
+    if engine is None:
+        engine = infer_engine(str(path))
+    span = _span(header_row, start_row, end_row)
+    if not footer_columns:
+        yield from _chunks(path, columns, chunk_rows, engine, sheet, span)
+        return
+    loaded = _with_footer(columns, footer_columns)
+    for chunk in _chunks(path, loaded, chunk_rows, engine, sheet, span):
+        coords = [c + 1 for c in loaded] if loaded is not None else list(range(1, len(chunk.columns) + 1))
+        chunk, _, found = _cut_footer(chunk, coords, columns, footer_columns)
+        yield chunk
+        if found:
+            return
+
+
+def _chunks(
+    path: Source, columns: Optional[Sequence[int]], chunk_rows: int, engine: Engine, sheet: Sheet, span: Span
+) -> Iterator[pd.DataFrame]:
+    """Yield the chunks of :func:`iter_chunks` without looking for a total row."""
+    if engine in TABLE_ENGINES:
+        yield from _table_chunks(path, engine, columns, chunk_rows, span)
+        return
+    reader = _xls_rows if engine == "xlrd" else _xlsx_rows
+    rows = reader(path, columns, sheet, span)
+    header, width = next(rows)
+    picked = sorted(columns) if columns is not None else list(range(width))
+    names = _header_names(list(header) + [None] * (width - len(header)))
+    blank = (None,) * len(picked)
 
-    if isinstance(value, (int, float)):
-        return float(value)
+    def _chunk(block: List[Tuple[Any, ...]], start: int) -> pd.DataFrame:
+        data = list(zip(*block)) if block else [()] * len(picked)
+        return pd.DataFrame(
+            {names[c]: _typed_column(list(values)) for c, values in zip(picked, data)},
+            columns=[names[c] for c in picked],
+            index=pd.RangeIndex(start, start + len(block)),
+        )
+
+    buffer: List[Tuple[Any, ...]] = []
+    start = pending = 0
+    for row in rows:
+        if row == blank:
+            pending += 1
+            continue
+        buffer.extend([blank] * pending)
+        pending = 0
+        buffer.append(row)
+        while len(buffer) >= chunk_rows:
+            yield _chunk(buffer[:chunk_rows], start)
+            start += chunk_rows
+            del buffer[:chunk_rows]
+    if buffer or not start:
+        yield _chunk(buffer, start)
+
+
+def _xlsx_rows(path: Source, columns: Optional[Sequence[int]], sheet: Sheet, span: Span) -> Iterator[Any]:
+    """Yield ``(header, width)`` and then the picked values of every data row."""
+    from openpyxl import load_workbook
+
+    header_row, start, end = span
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+        header = next(ws.iter_rows(min_row=header_row + 1, max_row=header_row + 1, values_only=True), ())
+        width = max(len(header), ws.max_column or 0)
+        yield header, width
+        picked = sorted(columns) if columns is not None else list(range(width))
+        if not picked:
+            return
+        first, last = picked[0], picked[-1]
+        rows = ws.iter_rows(min_row=start + 1, max_row=end, min_col=first + 1, max_col=last + 1, values_only=True)
+        for row in rows:
+            yield tuple(row[c - first] if c - first < len(row) else None for c in picked)
+    finally:
+        wb.close()
+
+
+def _xls_rows(path: Source, columns: Optional[Sequence[int]], sheet: Sheet, span: Span) -> Iterator[Any]:
+    """Yield ``(header, width)`` and then the picked values of every data row."""
+    import xlrd
+
+    if isinstance(path, (str, Path)):
+        book = xlrd.open_workbook(str(path), on_demand=True)
+    else:
+        book = xlrd.open_workbook(file_contents=path.read(), on_demand=True)
     try:
-        num = pd.to_numeric(value, errors="coerce")
+        sheet = book.sheet_by_name(sheet) if isinstance(sheet, str) else book.sheet_by_index(sheet)
+        header_row, start, end = span
+        if header_row >= sheet.nrows:
+            yield (), sheet.ncols
+            return
+        yield sheet.row_values(header_row), sheet.ncols
+        picked = sorted(columns) if columns is not None else list(range(sheet.ncols))
+        for r in range(start, sheet.nrows if end is None else min(end, sheet.nrows)):
+            values, kinds = sheet.row_values(r), sheet.row_types(r)
+            yield tuple(
+                None if c >= len(values) or kinds[c] in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+                else xlrd.xldate_as_datetime(values[c], book.datemode) if kinds[c] == xlrd.XL_CELL_DATE
+                else values[c]
+                for c in picked
+            )
+    finally:
+        book.release_resources()
+
+
+def sheet_names(path: Source, engine: Optional[Engine] = None) -> List[str]:
+    """Return the names of all worksheets in workbook order."""
+
+    if engine is None:
+        engine = infer_engine(str(path))
+    if engine in TABLE_ENGINES:
+        return [_table_name(path)]
+    if engine == "xlrd":
+        import xlrd
+
+        if isinstance(path, (str, Path)):
+            book = xlrd.open_workbook(str(path), on_demand=True)
+        else:
+            book = xlrd.open_workbook(file_contents=path.read(), on_demand=True)
+        try:
+            return book.sheet_names()
+        finally:
+            book.release_resources()
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def resolve_sheet(path: Source, sheet: Sheet) -> Sheet:
+    """Return ``sheet`` as a position or name of the workbook at ``path``.
+
+    A digit string such as ``"2024"`` names a sheet when the workbook has a
+    sheet of that name and is a position otherwise, also when the workbook
+    cannot be read yet.
+    """
+
+    if not isinstance(sheet, str) or not sheet.strip().isdigit():
+        return sheet
+    try:
+        names = sheet_names(path)
     except Exception:
-        num = pd.NA
-    if pd.isna(num):
+        names = []
+    return sheet if sheet in names else int(sheet)
+
+
+def detection_columns(detection: Detection, header: Sequence[str]) -> List[int]:
+    """Return sheet positions of every column ``detection`` refers to."""
+
+    names = list(header)
+    wanted = {detection.debit_column, detection.credit_column}
+    if detection.date_column is not None:
+        wanted.add(detection.date_column)
+    wanted.update(names.index(key) for key in detection.group_keys if key in names)
+    return sorted(wanted)
+
+
+def project_detection(detection: Detection, col_coords: Sequence[int]) -> Detection:
+    """Re-index ``detection`` onto a frame loaded with ``col_coords`` columns.
+
+    Highlights must still use the original detection, which refers to sheet
+    columns.
+    """
+
+    positions = {c - 1: i for i, c in enumerate(col_coords)}
+    return detection.model_copy(
+        update={
+            "debit_column": positions[detection.debit_column],
+            "credit_column": positions[detection.credit_column],
+            "date_column": positions.get(detection.date_column),
+        }
+    )
+
+
+def _header_names(values: Sequence[Any]) -> List[str]:
+    """Name header cells the way ``pandas.read_excel`` does."""
+
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or value == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _typed_column(values: List[Any]) -> np.ndarray:
+    """Convert raw cell values into the narrowest fitting NumPy array."""
+
+    kinds = {type(v) for v in values if v is not None}
+    if kinds <= {int, float}:
+        if None in values:
+            return np.array([np.nan if v is None else v for v in values], dtype=float)
+        column = np.array(values, dtype=float)
+        # Integral numbers load as integers, matching pandas' cell conversion.
+        if np.isfinite(column).all() and (column == np.trunc(column)).all():
+            return column.astype(np.int64)
+        return column
+    if all(issubclass(k, datetime) for k in kinds):
+        return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy()
+    column = np.empty(len(values), dtype=object)
+    column[:] = [np.nan if v is None else v for v in values]
+    return column
+
+
+def _stream_excel(
+    path: Source,
+    engine: str,
+    columns: Optional[Sequence[int]],
+    limit: Optional[int] = None,
+    sheet: Sheet = 0,
+    span: Span = (0, 1, None),
+) -> Tuple[pd.DataFrame, Optional[str], List[int]]:
+    """Stream the data rows of ``sheet`` in ``span`` and return the projected columns.
+
+    At most ``limit`` data rows are read when given. The number of data rows
+    declared by the sheet is stored in ``attrs["n_rows"]`` of the frame.
+    """
+
+    stream = _stream_xls if engine == "xlrd" else _stream_xlsx
+    header, data, sheet_name, width, n_rows = stream(path, columns, limit, sheet, span)
+
+    picked = sorted(columns) if columns is not None else list(range(width))
+    names = _header_names(list(header) + [None] * (width - len(header)))
+    frame = pd.DataFrame(
+        {names[c]: _typed_column(values) for c, values in zip(picked, data)},
+        columns=[names[c] for c in picked],
+    )
+    frame.attrs["n_rows"] = len(frame) if limit is None else n_rows
+    return frame, sheet_name, [c + 1 for c in picked]
+
+
+def _stream_xlsx(
+    path: Source, columns: Optional[Sequence[int]], limit: Optional[int], sheet: Sheet, span: Span
+) -> Tuple[Sequence[Any], List[List[Any]], str, int, int]:
+    from openpyxl import load_workbook
+
+    header_row, start, _ = span
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+        header = next(ws.iter_rows(min_row=header_row + 1, max_row=header_row + 1, values_only=True), ())
+        width = max(len(header), ws.max_column or 0)
+        picked = sorted(columns) if columns is not None else list(range(width))
+        data: List[List[Any]] = [[] for _ in picked]
+        if picked:
+            first, last = picked[0], picked[-1]
+            used = 0
+            rows = ws.iter_rows(
+                min_row=start + 1, max_row=_stop(span, limit), min_col=first + 1, max_col=last + 1, values_only=True
+            )
+            for row in rows:
+                empty = True
+                for values, c in zip(data, picked):
+                    value = row[c - first] if c - first < len(row) else None
+                    if value is not None:
+                        empty = False
+                    values.append(value)
+                if not empty:
+                    used = len(data[0])
+            # Drop trailing rows without any value, as pandas does.
+            for values in data:
+                del values[used:]
+        return header, data, ws.title, width, _declared(span, ws.max_row or 1)
+    finally:
+        wb.close()
+
+
+def _stream_xls(
+    path: Source, columns: Optional[Sequence[int]], limit: Optional[int], sheet: Sheet, span: Span
+) -> Tuple[Sequence[Any], List[List[Any]], str, int, int]:
+    import xlrd
+
+    if isinstance(path, (str, Path)):
+        book = xlrd.open_workbook(str(path), on_demand=True)
+    else:
+        book = xlrd.open_workbook(file_contents=path.read(), on_demand=True)
+    try:
+        sheet = book.sheet_by_name(sheet) if isinstance(sheet, str) else book.sheet_by_index(sheet)
+        header_row, start, _ = span
+        if header_row >= sheet.nrows:
+            # Like openpyxl, a header below the sheet gives the projected
+            # columns without rows.
+            width = max([sheet.ncols, *(c + 1 for c in columns or ())])
+            picked = sorted(columns) if columns is not None else list(range(width))
+            return (), [[] for _ in picked], sheet.name, width, 0
+        header = sheet.row_values(header_row)
+        width = sheet.ncols
+        picked = sorted(columns) if columns is not None else list(range(width))
+        stop = _stop(span, limit)
+        end = sheet.nrows if stop is None else min(stop, sheet.nrows)
+        data: List[List[Any]] = []
+        for c in picked:
+            values = sheet.col_values(c, start_rowx=min(start, end), end_rowx=end)
+            kinds = sheet.col_types(c, start_rowx=min(start, end), end_rowx=end)
+            data.append([
+                None if kind in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+                else xlrd.xldate_as_datetime(value, book.datemode) if kind == xlrd.XL_CELL_DATE
+                else value
+                for value, kind in zip(values, kinds)
+            ])
+        return header, data, sheet.name, width, _declared(span, sheet.nrows)
+    finally:
+        book.release_resources()
+
+
+@dataclass(frozen=True)
+class _CsvFormat:
+    """Sniffed layout of a CSV file."""
+
+    encoding: str
+    delimiter: str
+    decimal: str
+    names: List[str]
+
+
+_SNIFF_BYTES = 1 << 16
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?")
+_COMMA_DECIMAL = re.compile(r"[-+]?\d[\d \u00a0.]*,\d+")
+_POINT_DECIMAL = re.compile(r"[-+]?\d[\d \u00a0,]*\.\d+")
+
+
+def _table_name(path: Source) -> str:
+    """Name the single sheet of a table file after the file."""
+    name = path if isinstance(path, (str, Path)) else getattr(path, "name", None)
+    return Path(str(name or "table")).stem
+
+
+def _head(path: Source, size: int) -> bytes:
+    if isinstance(path, (str, Path)):
+        with open(path, "rb") as f:
+            return f.read(size)
+    start = path.tell()
+    try:
+        return path.read(size)
+    finally:
+        path.seek(start)
+
+
+def _sniff_csv(head: bytes, complete: bool, header_row: int = 0) -> _CsvFormat:
+    """Guess encoding, delimiter, decimal mark and header of a CSV file.
+
+    ``head`` is the start of the file, all of it when ``complete``. The
+    header is read from line ``header_row`` and lines above it are left out
+    of the guess. Exports that are not UTF-8 are read as Windows-1251.
+    """
+
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = "utf-16"
+    else:
         try:
-            cleaned = str(value).replace("\xa0", "").replace(" ", "").replace(",", ".")
-            num = pd.to_numeric(cleaned, errors="coerce")
-        except Exception:
-            return None
-    return None if pd.isna(num) else float(num)
+            codecs.getincrementaldecoder("utf-8")().decode(head, final=complete)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "cp1251"
+    text = head.decode(encoding, errors="ignore").lstrip("\ufeff")
+    if not complete and "\n" in text:
+        text = text[: text.rindex("\n") + 1]
+    text = "".join(text.splitlines(keepends=True)[header_row:])
+    try:
+        delimiter = csv.Sniffer().sniff(text[:8192], delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    rows = list(csv.reader(io.StringIO(text), delimiter=delimiter))
+    header = rows[0] if rows else []
+    cells = [cell.strip() for row in rows[1:] for cell in row]
+    commas = sum(1 for cell in cells if _COMMA_DECIMAL.fullmatch(cell))
+    points = sum(1 for cell in cells if _POINT_DECIMAL.fullmatch(cell))
+    decimal = "," if delimiter != "," and commas > points else "."
+    width = max((len(row) for row in rows), default=0)
+    names = _header_names(list(header) + [None] * (width - len(header)))
+    return _CsvFormat(encoding, delimiter, decimal, names)
+
+
+def _typed_frame(df: pd.DataFrame, start: int = 0) -> pd.DataFrame:
+    """Give a parsed table the column types :func:`_typed_column` produces."""
+
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if values.dtype == object and values.isna().all():
+            values = values.astype(float)
+        elif values.dtype.kind == "f":
+            finite = values.to_numpy()
+            if np.isfinite(finite).all() and (finite == np.trunc(finite)).all():
+                values = values.astype(np.int64)
+        elif values.dtype.kind == "M":
+            values = values.astype("datetime64[ns]")
+        elif values.dtype.kind not in "iub":
+            values = values.astype(object).where(values.notna(), np.nan)
+            texts = values.dropna()
+            # Like Arrow, the pandas parser path types ISO dates only.
+            if len(texts) and all(isinstance(v, str) and _ISO_DATE.fullmatch(v) for v in texts.iloc[:100]):
+                try:
+                    values = pd.to_datetime(values, format="ISO8601")
+                except (TypeError, ValueError):
+                    pass
+        columns[name] = values.to_numpy()
+    return pd.DataFrame(columns, columns=list(df.columns), index=pd.RangeIndex(start, start + len(df)))
+
+
+def _csv_arrow(path: Source, fmt: _CsvFormat, names: List[str], span: Span) -> pd.DataFrame:
+    """Read the data rows in ``span`` of a CSV file with the multi-threaded Arrow parser."""
+    import pyarrow.csv as pacsv
+
+    header_row, start, end = span
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(
+            encoding=fmt.encoding,
+            column_names=fmt.names,
+            skip_rows=header_row + 1,
+            skip_rows_after_names=start - header_row - 1,
+        ),
+        # Blank lines keep their place so rows map back to sheet rows.
+        parse_options=pacsv.ParseOptions(delimiter=fmt.delimiter, ignore_empty_lines=False),
+        convert_options=pacsv.ConvertOptions(
+            decimal_point=fmt.decimal, strings_can_be_null=True, include_columns=names
+        ),
+    )
+    if end is not None:
+        table = table.slice(0, end - start)
+    return table.to_pandas(date_as_object=False)
+
+
+def _csv_pandas(path: Source, fmt: _CsvFormat, picked: List[int], span: Span, **kwargs: Any) -> Any:
+    header_row, start, _ = span
+    return pd.read_csv(
+        path,
+        sep=fmt.delimiter,
+        decimal=fmt.decimal,
+        encoding=fmt.encoding,
+        skiprows=[*range(header_row), *range(header_row + 1, start)],
+        header=0,
+        names=fmt.names,
+        usecols=picked,
+        skip_blank_lines=False,
+        low_memory=False,
+        **kwargs,
+    )
+
+
+def _count_lines(path: Source) -> int:
+    if isinstance(path, (str, Path)):
+        with open(path, "rb") as f:
+            return sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+    start = path.tell()
+    try:
+        return path.read().count(b"\n")
+    finally:
+        path.seek(start)
+
+
+def _parquet_columns(parquet: Any, columns: Optional[Sequence[int]]) -> Tuple[List[str], List[int], List[str]]:
+    """Return header names, picked positions and stored names of the picked columns."""
+    stored = parquet.schema_arrow.names
+    picked = sorted(columns) if columns is not None else list(range(len(stored)))
+    return _header_names(stored), picked, [stored[c] for c in picked]
+
+
+def _parquet_batches(
+    parquet: Any, stored: List[str], span: Span, batch_size: int, limit: Optional[int] = None
+) -> Iterator[Any]:
+    """Yield record batches of the data rows of ``parquet`` that fall into ``span``.
+
+    A Parquet file has no header row, so its first record is sheet row 1.
+    """
+    skip, stop = span[1] - 1, _stop(span, limit)
+    stop = None if stop is None else stop - 1
+    seen = 0
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=stored):
+        lo = max(skip - seen, 0)
+        hi = len(batch) if stop is None else min(stop - seen, len(batch))
+        seen += len(batch)
+        if hi > lo:
+            yield batch.slice(lo, hi - lo)
+        if stop is not None and seen >= stop:
+            return
+
+
+def _read_table(
+    path: Source,
+    engine: str,
+    columns: Optional[Sequence[int]],
+    limit: Optional[int] = None,
+    span: Span = (0, 1, None),
+) -> Tuple[pd.DataFrame, str, List[int]]:
+    """Read the projected columns of a CSV or Parquet file.
+
+    CSV files are read with Arrow's multi-threaded parser, falling back to
+    the pandas C parser when Arrow is missing or cannot type a column.
+    Encoding, delimiter and decimal comma are sniffed from the first 64 KiB.
+    Parquet files are read with Arrow, which only decodes the requested
+    columns. Only the data rows in ``span`` are kept, at most ``limit`` of
+    them when given, and ``attrs["n_rows"]`` holds the number of data rows
+    of the file.
+    """
+
+    header_row, start, _ = span
+    if engine == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        names, picked, stored = _parquet_columns(parquet, columns)
+        if limit is None and start == 1 and span[2] is None:
+            table = parquet.read(columns=stored)
+        else:
+            batches = list(_parquet_batches(parquet, stored, span, max(limit or 0, 1 << 16), limit))
+            schema = parquet.schema_arrow.empty_table().select(stored).schema
+            table = pa.Table.from_batches(batches, schema=schema)
+        raw = table.to_pandas(date_as_object=False)
+        raw.columns = [names[c] for c in picked]
+        n_rows = _declared(span, parquet.metadata.num_rows + 1)
+    else:
+        head = _head(path, _SNIFF_BYTES)
+        fmt = _sniff_csv(head, complete=len(head) < _SNIFF_BYTES, header_row=header_row)
+        names = fmt.names
+        picked = sorted(columns) if columns is not None else list(range(len(names)))
+        raw = None
+        if limit is None:
+            try:
+                raw = _csv_arrow(path, fmt, [names[c] for c in picked], span)
+            except (ImportError, ValueError):
+                # Arrow types a column by its first block and rejects later
+                # cells that do not fit; pandas types whole columns.
+                if not isinstance(path, (str, Path)):
+                    path.seek(0)
+        if raw is None:
+            stop = _stop(span, limit)
+            raw = _csv_pandas(path, fmt, picked, span, nrows=None if stop is None else stop - start)
+        n_rows = len(raw) if limit is None else max(_declared(span, _count_lines(path)), len(raw))
+    frame = _typed_frame(raw[[names[c] for c in picked]])
+    frame.attrs["n_rows"] = n_rows if limit is not None else len(frame)
+    return frame, _table_name(path), [c + 1 for c in picked]
+
+
+def _table_chunks(
+    path: Source, engine: str, columns: Optional[Sequence[int]], chunk_rows: int, span: Span
+) -> Iterator[pd.DataFrame]:
+    """Yield the projected columns of the data rows of a CSV or Parquet file in chunks."""
+
+    start = 0
+    if engine == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        names, picked, stored = _parquet_columns(parquet, columns)
+        for batch in _parquet_batches(parquet, stored, span, chunk_rows):
+            raw = batch.to_pandas(date_as_object=False)
+            raw.columns = [names[c] for c in picked]
+            yield _typed_frame(raw, start)
+            start += len(raw)
+    else:
+        head = _head(path, _SNIFF_BYTES)
+        fmt = _sniff_csv(head, complete=len(head) < _SNIFF_BYTES, header_row=span[0])
+        names = fmt.names
+        picked = sorted(columns) if columns is not None else list(range(len(names)))
+        stop = _stop(span)
+        nrows = None if stop is None else stop - span[1]
+        with _csv_pandas(path, fmt, picked, span, chunksize=chunk_rows, nrows=nrows) as reader:
+            for raw in reader:
+                yield _typed_frame(raw[[names[c] for c in picked]], start)
+                start += len(raw)
+    if not start:
+        yield _typed_frame(pd.DataFrame(columns=[names[c] for c in picked]))
 
 
 _DEFAULT_PATTERNS: List[Pattern[str]] = [
@@ -89,6 +893,53 @@ _DEFAULT_PATTERNS: List[Pattern[str]] = [
 ]
 
 
+def _combined_patterns(patterns: List[Pattern[str]]) -> List[Pattern[str]]:
+    """Merge patterns sharing the same flags into one alternation each."""
+
+    by_flags: Dict[int, List[str]] = {}
+    for p in patterns:
+        by_flags.setdefault(p.flags, []).append(f"(?:{p.pattern})")
+    return [re.compile("|".join(parts), flags) for flags, parts in by_flags.items()]
+
+
+def find_turnover_values(
+    df: pd.DataFrame, patterns: Optional[List[Pattern[str]]] = None, offset: int = 1
+) -> List[Tuple[int, int, float]]:
+    """Return every turnover label in ``df`` with the numeric value next to it.
+
+    Only text cells are searched. Each is matched once against the combined
+    patterns, and the values ``offset`` columns to the right of all hits are
+    parsed together.
+
+    Returns
+    -------
+    list of tuple[int, int, float]
+        ``(row, column, value)`` positions of the labels in row-major order.
+        Labels whose value cell does not hold a number are skipped.
+    """
+
+    combined = _combined_patterns(patterns or _DEFAULT_PATTERNS)
+    n_cols = df.shape[1]
+    hits: List[Tuple[int, int, float]] = []
+    for c in range(n_cols - offset):
+        column = df.iloc[:, c]
+        if not (pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column)):
+            continue
+        # Object columns may hold no strings at all (bools, times), so only
+        # text cells are matched.
+        text = [(r, v) for r, v in enumerate(column.tolist()) if isinstance(v, str)]
+        rows = np.array([r for r, v in text if any(pattern.search(v) for pattern in combined)], dtype=np.int64)
+        if not len(rows):
+            continue
+        raw = df.iloc[rows, c + offset]
+        cents, failed = parse_cents(raw)
+        present = raw.notna() & raw.astype(str).str.strip().ne("")
+        ok = ~failed & present.to_numpy(dtype=bool)
+        hits.extend(zip(rows[ok].tolist(), [c] * int(ok.sum()), (cents[ok] / 100).tolist()))
+    hits.sort()
+    return hits
+
+
 def detect_turnover_value(
     df: pd.DataFrame, patterns: Optional[List[Pattern[str]]] = None, offset: int = 1
 ) -> Optional[float]:
@@ -111,17 +962,5 @@ def detect_turnover_value(
         Parsed turnover value if a label is found and numeric parsing succeeds.
     """
 
-    pats = patterns or _DEFAULT_PATTERNS
-    n_rows, n_cols = df.shape
-    for r in range(n_rows):
-        for c in range(n_cols):
-            cell = str(df.iat[r, c])
-            if any(p.search(cell) for p in pats):
-                val_col = c + offset
-                if val_col >= n_cols:
-                    continue
-                value = _parse_numeric(df.iat[r, val_col])
-                if value is not None:
-                    return value
-    return None
-
+    hits = find_turnover_values(df, patterns, offset)
+    return hits[0][2] if hits else None
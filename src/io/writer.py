@@ -2,20 +2,26 @@
 
 from __future__ import annotations
 
+import re
+import sys
 from pathlib import Path
-from typing import Set, Tuple
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Set, Tuple
+from xml.etree import ElementTree
+from zipfile import ZipFile, is_zipfile
 
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
 
-from openpyxl.reader import drawings, excel
 from warnings import warn
 from shutil import copy2
 
+from .loader import Sheet, is_table, read_excel
+
 
 def _load_workbook_safe(path: Path):
     """Load workbook ignoring invalid drawing relationships."""
+    from openpyxl import load_workbook
+    from openpyxl.reader import drawings, excel
+
     orig_find_images = drawings.find_images
     orig_find_images_excel = excel.find_images
 
@@ -35,25 +41,288 @@ def _load_workbook_safe(path: Path):
         excel.find_images = orig_find_images_excel
 
 
-def write_coloured(df: pd.DataFrame, highlights: Set[Tuple[int, int]], target_path: str) -> str:
-    """Clone the workbook at ``target_path`` and apply highlights."""
+class _PatchError(ValueError):
+    """Raised when a workbook cannot be highlighted by patching its XML."""
 
-    src = Path(target_path)
-    if not src.exists():
-        raise FileNotFoundError(target_path)
 
-    dst = src.with_name(f"{src.stem}_checked.xlsx")
-    copy2(src, dst)
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_FILL_RGB = "FFFF6666"
+
+_ROW_ANY = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*?(/?)>')
+_CELL = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)(\d+)"[^>]*?(?:/>|>.*?</c>)', re.DOTALL)
+_STYLE_ATTR = re.compile(rb'\bs="(\d+)"')
+
+
+def _sheet_part(archive: ZipFile, sheet: Optional[Sheet] = None) -> str:
+    """Return the zip member holding ``sheet``, the active sheet by default."""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    sheets = workbook.findall(f"{_MAIN_NS}sheets/{_MAIN_NS}sheet")
+    if sheet is None:
+        view = workbook.find(f"{_MAIN_NS}bookViews/{_MAIN_NS}workbookView")
+        active = int(view.get("activeTab", 0)) if view is not None else 0
+        element = sheets[min(active, len(sheets) - 1)]
+    elif isinstance(sheet, str):
+        element = next((e for e in sheets if e.get("name") == sheet), None)
+        if element is None:
+            raise _PatchError(f"Sheet {sheet!r} not found")
+    else:
+        element = sheets[sheet]
+    rel_id = element.get(f"{_REL_NS}id")
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels:
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target", "")
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise _PatchError(f"Sheet relationship {rel_id} not found")
+
+
+class _Styles:
+    """Append a highlight fill and highlighted copies of cell formats to styles.xml."""
+
+    def __init__(self, xml: str) -> None:
+        self.xml = xml
+        fills = re.search(r'<fills count="(\d+)"[^>]*>(.*?)</fills>', xml, re.DOTALL)
+        xfs = re.search(r'<cellXfs count="(\d+)"[^>]*>(.*?)</cellXfs>', xml, re.DOTALL)
+        if not fills or not xfs:
+            raise _PatchError("styles.xml has no fills or cellXfs")
+        self.fill_id = int(fills.group(1))
+        self.xfs = re.findall(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", xfs.group(2), re.DOTALL)
+        self.added: Dict[int, int] = {}
+        self.new_xfs: List[str] = []
+
+    def highlighted(self, style: int) -> int:
+        """Return the index of ``style`` with the highlight fill applied."""
+        if style not in self.added:
+            if style >= len(self.xfs):
+                raise _PatchError(f"Unknown cell style {style}")
+            xf = re.sub(r'\s(fillId|applyFill)="[^"]*"', "", self.xfs[style])
+            xf = re.sub(r"^<xf\b", f'<xf fillId="{self.fill_id}" applyFill="1"', xf)
+            self.added[style] = len(self.xfs) + len(self.new_xfs)
+            self.new_xfs.append(xf)
+        return self.added[style]
+
+    def render(self) -> bytes:
+        fill = (
+            f'<fill><patternFill patternType="solid"><fgColor rgb="{_FILL_RGB}"/>'
+            f'<bgColor rgb="{_FILL_RGB}"/></patternFill></fill>'
+        )
+        xml = re.sub(
+            r'<fills count="\d+"([^>]*)>(.*?)</fills>',
+            lambda m: f'<fills count="{self.fill_id + 1}"{m.group(1)}>{m.group(2)}{fill}</fills>',
+            self.xml,
+            count=1,
+            flags=re.DOTALL,
+        )
+        xml = re.sub(
+            r'<cellXfs count="\d+"([^>]*)>(.*?)</cellXfs>',
+            lambda m: (
+                f'<cellXfs count="{len(self.xfs) + len(self.new_xfs)}"{m.group(1)}>'
+                f'{m.group(2)}{"".join(self.new_xfs)}</cellXfs>'
+            ),
+            xml,
+            count=1,
+            flags=re.DOTALL,
+        )
+        return xml.encode("utf-8")
+
+
+def _column_letter(index: int) -> str:
+    """Return the sheet letters of 1-based column ``index``."""
+    letters = ""
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _column_index(letters: str) -> int:
+    """Return the 1-based column index of sheet ``letters``."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def _patch_row(row: bytes, number: int, columns: Iterable[int], styles: _Styles) -> bytes:
+    """Apply the highlight style to ``columns`` of one ``<row>`` element."""
+    head_end = row.index(b">") + 1
+    if row[head_end - 2:head_end] == b"/>":
+        head, body, tail = row[: head_end - 2] + b">", b"", b"</row>"
+    else:
+        head, body, tail = row[:head_end], row[head_end:-6], row[-6:]
+    row_style = _STYLE_ATTR.search(head) if b'customFormat="1"' in head else None
+    base = int(row_style.group(1)) if row_style else 0
+
+    wanted = {_column_letter(c): c for c in columns}
+    pieces: List[Tuple[int, bytes]] = []
+    last = 0
+    for m in _CELL.finditer(body):
+        col = m.group(1).decode()
+        index = _column_index(col)
+        cell = m.group(0)
+        if col in wanted:
+            del wanted[col]
+            style = _STYLE_ATTR.search(cell[: cell.index(b">")])
+            new = styles.highlighted(int(style.group(1)) if style else base)
+            if style:
+                cell = cell[: style.start()] + b's="%d"' % new + cell[style.end():]
+            else:
+                cell = cell[:2] + b' s="%d"' % new + cell[2:]
+        pieces.append((index, body[last:m.start()] + cell))
+        last = m.end()
+    for col, index in wanted.items():
+        pieces.append((index, b'<c r="%s%d" s="%d"/>' % (col.encode(), number, styles.highlighted(base))))
+    pieces.sort(key=lambda piece: piece[0])
+    return head + b"".join(p for _, p in pieces) + body[last:] + tail
+
+
+def _patch_sheet(xml: bytes, highlights: Set[Tuple[int, int]], styles: _Styles) -> bytes:
+    """Rewrite only the ``<row>`` elements that contain highlighted cells."""
+    by_row: Dict[int, List[int]] = {}
+    for r, c in highlights:
+        by_row.setdefault(r, []).append(c)
+
+    data_start = xml.find(b"<sheetData")
+    if data_start < 0:
+        raise _PatchError("Sheet has no sheetData")
+    if xml.startswith(b"/>", xml.index(b">", data_start) - 1):
+        close = xml.index(b">", data_start) + 1
+        xml = xml[: close - 2] + b"></sheetData>" + xml[close:]
+    cursor = xml.index(b">", data_start) + 1
+    end = xml.index(b"</sheetData>", cursor)
+
+    out: List[bytes] = [xml[:cursor]]
+    for number in sorted(by_row):
+        exact = re.compile(rb'<row\b[^>]*?\br="%d"[^>]*?(/?)>' % number)
+        m = exact.search(xml, cursor, end)
+        if m is None:
+            # The row does not exist: insert it before the first later row.
+            later = next((n for n in _ROW_ANY.finditer(xml, cursor, end) if int(n.group(1)) > number), None)
+            at = later.start() if later else end
+            out.append(xml[cursor:at])
+            out.append(_patch_row(b'<row r="%d"/>' % number, number, by_row[number], styles))
+            cursor = at
+            continue
+        stop = m.end() if m.group(1) else xml.index(b"</row>", m.end()) + 6
+        out.append(xml[cursor:m.start()])
+        out.append(_patch_row(xml[m.start():stop], number, by_row[number], styles))
+        cursor = stop
+    out.append(xml[cursor:])
+    return b"".join(out)
+
+
+def _write_xml(src: Path, dst: Path, cells: Set[Tuple[int, int]], sheet: Optional[Sheet] = None) -> None:
+    """Copy ``src`` to ``dst`` patching only the sheet and style parts."""
+    with ZipFile(src) as archive:
+        sheet_part = _sheet_part(archive, sheet)
+        styles = _Styles(archive.read("xl/styles.xml").decode("utf-8"))
+        sheet = _patch_sheet(archive.read(sheet_part), cells, styles)
+        patched = {sheet_part: sheet, "xl/styles.xml": styles.render()}
+        with ZipFile(dst, "w") as out:
+            for info in archive.infolist():
+                data = patched.get(info.filename)
+                if data is None:
+                    data = archive.read(info)
+                out.writestr(info, data, compress_type=info.compress_type, compresslevel=1)
+
+
+def _write_openpyxl(dst: Path, cells: Set[Tuple[int, int]], sheet: Optional[Sheet] = None) -> None:
+    from openpyxl.styles import PatternFill
 
     wb = _load_workbook_safe(dst)
-    ws = wb.active
+    if sheet is None:
+        ws = wb.active
+    else:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
 
     fill = PatternFill(start_color="FF6666", end_color="FF6666", fill_type="solid")
+    for r, c in cells:
+        ws.cell(row=r, column=c).fill = fill
+
+    wb.save(dst)
 
-    row_offset = 1  # account for header row written by pandas when reading
-    for r, c in highlights:
-        cell = ws.cell(row=r + 1 + row_offset, column=c + 1)
-        cell.fill = fill
 
+def _write_table(src: Path, dst: Path, cells: Set[Tuple[int, int]]) -> None:
+    """Write the CSV or Parquet table at ``src`` as an xlsx workbook with ``cells`` filled."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import PatternFill
+
+    df, _ = read_excel(src)
+    fill = PatternFill(start_color="FF6666", end_color="FF6666", fill_type="solid")
+    by_row: Dict[int, Set[int]] = {}
+    for r, c in cells:
+        by_row.setdefault(r, set()).add(c)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(re.sub(r"[\[\]:*?/\\]", "_", src.stem)[:31] or "Sheet1")
+    rows = [list(df.columns)] + df.astype(object).where(df.notna(), None).values.tolist()
+    for r, values in enumerate(rows, start=1):
+        for c in by_row.get(r, ()):
+            if c <= len(values):
+                cell = WriteOnlyCell(ws, value=values[c - 1])
+                cell.fill = fill
+                values[c - 1] = cell
+        ws.append(values)
     wb.save(dst)
+
+
+def write_coloured(
+    df: pd.DataFrame,
+    highlights: Set[Tuple[int, int]],
+    target_path: str,
+    engine: Literal["xml", "openpyxl"] = "xml",
+    sheet: Optional[Sheet] = None,
+    output_path: Optional[str] = None,
+    row_coords: Optional[Sequence[int]] = None,
+) -> str:
+    """Clone the workbook at ``target_path`` and apply highlights.
+
+    With the default ``"xml"`` engine only the sheet XML and ``styles.xml``
+    are rewritten inside the xlsx archive and every other part is copied
+    as is, so the cost follows the number of highlighted rows rather than the
+    size of the workbook. Workbooks the patcher does not understand fall
+    back to a full ``openpyxl`` load and save. CSV and Parquet sources are
+    written out as a new workbook holding their single table. Without
+    highlights the file is copied unchanged.
+
+    Highlights go to ``sheet`` (position or name), the active sheet by
+    default. The copy is written to ``output_path`` when given, otherwise
+    next to the source as ``<stem>_checked``. Highlighted copies are always
+    xlsx files.
+
+    Highlights are ``(data row, column)`` positions. ``row_coords`` holds
+    the 1-based sheet row of every data row, see
+    :func:`src.io.loader.sheet_rows`; by default data starts right below a
+    header in the first row.
+    """
+
+    src = Path(target_path)
+    if not src.exists():
+        raise FileNotFoundError(target_path)
+
+    if not highlights:
+        dst = Path(output_path) if output_path else src.with_name(f"{src.stem}_checked{src.suffix}")
+        copy2(src, dst)
+        return str(dst)
+
+    dst = Path(output_path).with_suffix(".xlsx") if output_path else src.with_name(f"{src.stem}_checked.xlsx")
+    if row_coords is None:
+        row_coords = range(2, sys.maxsize)
+    cells = {(row_coords[r], c + 1) for r, c in highlights}
+
+    if is_table(str(src)):
+        _write_table(src, dst, cells)
+        return str(dst)
+
+    if engine == "xml" and is_zipfile(src):
+        try:
+            _write_xml(src, dst, cells, sheet)
+            return str(dst)
+        except (_PatchError, KeyError, ValueError, IndexError, ElementTree.ParseError) as exc:
+            warn(f"Falling back to openpyxl for '{src.name}': {exc}")
+
+    copy2(src, dst)
+    _write_openpyxl(dst, cells, sheet)
     return str(dst)
@@ -0,0 +1,46 @@
+"""Persistent cache of column detections keyed by a table fingerprint."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from .schema import Detection
+
+
+def default_detection_dir() -> Path:
+    """Return the folder used for cached detections."""
+    env = os.environ.get("BALANCE_CHECK_CACHE")
+    base = Path(env) if env else Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "balance_check"
+    return base / "detections"
+
+
+def fingerprint(model: str, prompt: str) -> str:
+    """Return a stable key for a detection request.
+
+    The prompt embeds the header and the sampled rows, so two workbooks
+    with the same layout and sample produce the same fingerprint.
+    """
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class DetectionCache:
+    """Store one JSON file per detection fingerprint."""
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = Path(directory) if directory is not None else default_detection_dir()
+
+    def get(self, key: str) -> Optional[Detection]:
+        try:
+            return Detection.model_validate_json((self.directory / f"{key}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, detection: Detection) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f".{key}.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(detection.model_dump()))
+        os.replace(tmp, self.directory / f"{key}.json")
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import random
 import re
-import time
-from typing import Optional
+from typing import Any, List, Optional, Sequence
 
-import openai
 import pandas as pd
 
 from . import prompts, schema
+from .cache import DetectionCache, fingerprint
+from .registry import LayoutRegistry
+from src.utils.metrics import count
 
+logger = logging.getLogger(__name__)
 
 _DEBIT_RE = re.compile(
     r"(дебет|дт|debit|debet|расход|withdraw|charge|expense)",
@@ -50,30 +55,133 @@ def _heuristic_detection(df: pd.DataFrame) -> schema.Detection:
         credit_column=credit_idx,
         header_row=0,
         start_row=1,
-        end_row=len(df),
+        # Open ended: loading stops at the first total row or the sheet end.
+        end_row=0,
         group_keys=[],
     )
 
 
-def detect_columns(df: pd.DataFrame, api_key: str, model: str = "gpt-4o-mini") -> schema.Detection:
-    """Detect debit and credit columns using OpenAI with heuristic fallback."""
-    if not api_key:
-        return _heuristic_detection(df)
-
-    openai.api_key = api_key
-    prompt = prompts.build_prompt(df)
+def _checked(df: pd.DataFrame, detection: schema.Detection) -> schema.Detection:
+    """Keep a model ``end_row`` from cutting rows the model never saw.
+
+    ``df`` is sampled below header row 0, so the sheet ends before row
+    ``n_rows + 1``. When the sample does not reach the sheet end, an
+    ``end_row`` before it is a guess. The range is then left open and
+    loading ends at the first total row instead, see
+    :func:`src.io.loader.footer_columns`.
+    """
+    n_rows = df.attrs.get("n_rows", len(df))
+    end = n_rows + 1
+    if detection.start_row < detection.end_row < end:
+        if n_rows > len(df):
+            logger.warning(
+                "Ignoring end_row %d: the model saw %d of %d data rows, reading up to the first total row",
+                detection.end_row,
+                len(df),
+                n_rows,
+            )
+            return detection.model_copy(update={"end_row": 0})
+        logger.info("Detection leaves out %d rows before the sheet end", end - detection.end_row)
+    return detection
+
+
+async def _request(
+    client: Any,
+    model: str,
+    prompt: str,
+    timeout: float,
+    retries: int,
+    backoff: float,
+) -> Optional[schema.Detection]:
     messages = [
         {"role": "user", "content": prompt},
     ]
-
-    for attempt in range(3):
+    for attempt in range(retries):
         try:
-            resp = openai.ChatCompletion.create(model=model, messages=messages)
-            content = resp.choices[0].message["content"]
-            data = json.loads(content)
+            resp = await asyncio.wait_for(
+                client.chat.completions.create(model=model, messages=messages),
+                timeout,
+            )
+            data = json.loads(resp.choices[0].message.content)
             return schema.Detection(**data)
         except Exception:
-            time.sleep(2 ** attempt)
+            if attempt + 1 < retries:
+                await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+    return None
+
+
+async def detect_batch_async(
+    frames: Sequence[pd.DataFrame],
+    api_key: str,
+    model: str = "gpt-4o-mini",
+    *,
+    concurrency: int = 4,
+    timeout: float = 30.0,
+    retries: int = 3,
+    backoff: float = 1.0,
+    cache: Optional[DetectionCache] = None,
+    registry: Optional[LayoutRegistry] = None,
+    base_url: Optional[str] = None,
+) -> List[schema.Detection]:
+    """Detect debit and credit columns of several tables concurrently.
+
+    Tables whose header matches a layout in ``registry`` are answered
+    directly. The others go to the model, and every model answer is learned
+    as a new layout.
+
+    At most ``concurrency`` requests are in flight. Each request is limited
+    to ``timeout`` seconds and retried with jittered exponential backoff;
+    tables whose requests all fail use the heuristic fallback. Successful
+    detections are stored in ``cache`` under a fingerprint of the prompt,
+    so a repeated layout and sample costs no API call.
+    """
+    registry = registry if registry is not None else LayoutRegistry()
+    results: List[Optional[schema.Detection]] = [registry.lookup(df) for df in frames]
+    count("detect.registry_hits", sum(found is not None for found in results))
+    if not api_key:
+        count("detect.heuristic", sum(found is None for found in results))
+        return [found or _heuristic_detection(df) for found, df in zip(results, frames)]
+
+    cache = cache if cache is not None else DetectionCache()
+    unknown = [i for i, found in enumerate(results) if found is None]
+    prompts_ = {i: prompts.build_prompt(frames[i]) for i in unknown}
+    keys = {i: fingerprint(model, prompt) for i, prompt in prompts_.items()}
+    for i in unknown:
+        results[i] = cache.get(keys[i])
+
+    pending = [i for i in unknown if results[i] is None]
+    count("detect.cache_hits", len(unknown) - len(pending))
+    count("detect.api_calls", len(pending))
+    if pending:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def run(i: int) -> None:
+            async with limit:
+                results[i] = await _request(client, model, prompts_[i], timeout, retries, backoff)
+            if results[i] is not None:
+                cache.put(keys[i], results[i])
+                registry.learn(frames[i], results[i])
+
+        try:
+            await asyncio.gather(*(run(i) for i in pending))
+        finally:
+            await client.close()
+        count("detect.heuristic", sum(results[i] is None for i in pending))
+
+    for i in unknown:
+        if results[i] is not None:
+            results[i] = _checked(frames[i], results[i])
+    return [found or _heuristic_detection(df) for found, df in zip(results, frames)]
+
 
-    # fallback
-    return _heuristic_detection(df)
+def detect_batch(frames: Sequence[pd.DataFrame], api_key: str, model: str = "gpt-4o-mini", **kwargs: Any) -> List[schema.Detection]:
+    """Blocking wrapper around :func:`detect_batch_async`."""
+    return asyncio.run(detect_batch_async(frames, api_key, model, **kwargs))
+
+
+def detect_columns(df: pd.DataFrame, api_key: str, model: str = "gpt-4o-mini", **kwargs: Any) -> schema.Detection:
+    """Detect debit and credit columns using OpenAI with heuristic fallback."""
+    return detect_batch([df], api_key, model, **kwargs)[0]
@@ -7,7 +7,7 @@ import pandas as pd
 FEW_SHOT = dedent(
     """
     You are given CSV data from an accounting workbook. Identify which columns
-    hold debit and credit amounts.
+    hold debit and credit amounts and which one, if any, holds the posting date.
 
     Example CSV:
     date,debit,credit
@@ -15,17 +15,28 @@ FEW_SHOT = dedent(
     2024-01-02,0,50
 
     Example answer:
-    {"debit_column":1,"credit_column":2,"header_row":0,"start_row":1,"end_row":3,"group_keys":["date"]}
+    {"debit_column":1,"credit_column":2,"header_row":0,"start_row":1,"end_row":3,"group_keys":["date"],"date_column":0}
+
+    Rows are 0-based CSV lines and end_row is one past the last data row,
+    or 0 when the end of the table is not shown.
+    Title rows above the header and total rows below the data, such as
+    "Итого" or "Оборот за период", are not data rows.
     """
 )
 
 
 def build_prompt(df: pd.DataFrame) -> str:
-    """Create a prompt showing head and tail rows as CSV."""
-    head = df.head(7)
-    tail = df.tail(7)
-    sample = pd.concat([head, tail]).to_csv(index=False)
+    """Create a prompt showing head and tail rows as CSV.
+
+    ``df`` may be a sample produced by :func:`src.io.loader.read_sample`, in
+    which case the full row count is taken from ``df.attrs["n_rows"]``.
+    """
+    n = len(df)
+    rows = list(dict.fromkeys([*range(min(n, 7)), *range(max(n - 7, 0), n)]))
+    sample = df.iloc[rows].to_csv(index=False)
+    total = df.attrs.get("n_rows", n)
 
     return dedent(
-        f"{FEW_SHOT}\nAnalyse the following table and respond with JSON in the same schema.\nCSV:\n{sample}"
+        f"{FEW_SHOT}\nAnalyse the following table and respond with JSON in the same schema.\n"
+        f"The table has {total} data rows.\nCSV:\n{sample}"
     )
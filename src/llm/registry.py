@@ -0,0 +1,102 @@
+"""Registry of known table layouts keyed by a normalised header signature."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+from src.utils.numeric import parse_cents
+from .cache import default_detection_dir
+from .schema import Detection
+
+logger = logging.getLogger(__name__)
+
+_UNNAMED = re.compile(r"^unnamed: \d+$")
+# pandas renames the second "Debit" of a header to "Debit.1".
+_DUPLICATE = re.compile(r"^(.*)\.([1-9]\d*)$")
+_SPACES = re.compile(r"\s+")
+
+
+def header_signature(columns: Sequence[object]) -> str:
+    """Return a signature that is equal for tables sharing the same header.
+
+    Names are lower-cased with whitespace collapsed, and the placeholders
+    pandas invents for empty or duplicate header cells are dropped, so
+    cosmetic differences between exports of the same template do not matter.
+    A ``.N`` suffix is only taken for such a placeholder when its base name
+    occurs earlier in the header, so names like "Счёт 60.01" are kept.
+    """
+    parts = []
+    seen = set()
+    for column in columns:
+        name = _SPACES.sub(" ", str(column)).strip().lower()
+        seen.add(name)
+        duplicate = _DUPLICATE.match(name)
+        if _UNNAMED.match(name):
+            name = ""
+        elif duplicate is not None and duplicate.group(1) in seen:
+            name = duplicate.group(1)
+        parts.append(name)
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _plausible(df: pd.DataFrame, detection: Detection) -> bool:
+    """Return whether debit and credit are distinct columns of amounts in ``df``."""
+    if detection.debit_column == detection.credit_column:
+        return False
+    columns = [detection.debit_column, detection.credit_column]
+    if not all(0 <= column < df.shape[1] for column in columns):
+        return False
+    amounts = df.iloc[:, columns]
+    # One side may be blank throughout a short sample, but not both.
+    return not any(parse_cents(amounts[name])[1].any() for name in amounts) and amounts.notna().any(axis=None)
+
+
+class LayoutRegistry:
+    """Map header signatures to stored detections, persisted as one JSON file."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path) if path is not None else default_detection_dir().parent / "layouts.json"
+        self._layouts: Optional[Dict[str, dict]] = None
+
+    @property
+    def layouts(self) -> Dict[str, dict]:
+        if self._layouts is None:
+            try:
+                self._layouts = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self._layouts = {}
+        return self._layouts
+
+    def lookup(self, df: pd.DataFrame) -> Optional[Detection]:
+        """Return the stored detection for the layout of ``df`` if known.
+
+        ``end_row`` depends on the file, not on the layout, and is left
+        open: loading stops at the first total row or the sheet end.
+        """
+        stored = self.layouts.get(header_signature(df.columns))
+        if stored is None:
+            return None
+        return Detection(**stored, end_row=0)
+
+    def learn(self, df: pd.DataFrame, detection: Detection) -> None:
+        """Remember ``detection`` as the layout of ``df``'s header.
+
+        Detections that do not hold for ``df`` are not learned, so a wrong
+        answer is not replayed for every later file with the same header.
+        """
+        if not _plausible(df, detection):
+            logger.info("Not learning a detection whose amount columns do not fit the sample")
+            return
+        self.layouts[header_signature(df.columns)] = detection.model_dump(exclude={"end_row"})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.layouts, ensure_ascii=False))
+        os.replace(tmp, self.path)
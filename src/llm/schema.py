@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 class Detection(BaseModel):
@@ -12,3 +12,4 @@ class Detection(BaseModel):
     start_row: int
     end_row: int
     group_keys: List[str]
+    date_column: Optional[int] = None
@@ -0,0 +1,582 @@
+"""Batch reconciliation of many workbook pairs.
+
+A batch is a list of :class:`PairJob` entries, usually read from a CSV
+manifest. Column detection runs in the main process in chunks, one
+concurrent LLM batch per chunk, and every detected pair is handed to a
+process pool that loads, reconciles and writes it while the next chunk is
+being detected. Parsed workbooks and detections are cached on disk, so
+workbooks shared by several pairs are parsed once.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.core.highlight import cells_to_highlight
+from src.core.incremental import ReconcileState, reconcile_incremental
+from src.core.outofcore import reconcile_out_of_core
+from src.core.reconcile import ReconcileOptions, ReconcileResult, reconcile
+from src.io.audit import AuditColumn, write_audit
+from src.io.cache import ParsedCache
+from src.io.loader import (
+    Sheet,
+    detection_columns,
+    detection_rows,
+    footer_columns,
+    project_detection,
+    resolve_sheet,
+    sheet_names,
+    sheet_rows,
+)
+from src.io.writer import write_coloured
+from src.llm import detector
+from src.llm.schema import Detection
+from src.utils.metrics import Profile, RunMetrics, StageClock, collect, count, current, stage
+from src.utils.numeric import parse_cents
+
+logger = logging.getLogger(__name__)
+
+ALL_SHEETS = "*"
+
+
+@dataclass
+class PairJob:
+    """One left/right pair to reconcile.
+
+    ``right_sheet`` defaults to ``sheet``. A ``sheet`` of ``"*"`` stands for
+    every sheet name present in both workbooks.
+    """
+
+    left: Path
+    right: Path
+    sheet: Sheet = 0
+    right_sheet: Optional[Sheet] = None
+    name: str = ""
+
+    def __post_init__(self) -> None:
+        self.left = Path(self.left)
+        self.right = Path(self.right)
+        if self.right_sheet is None:
+            self.right_sheet = self.sheet
+        if not self.name:
+            self.name = f"{self.left.stem}~{self.right.stem}[{self.sheet}]"
+
+
+@dataclass
+class PairReport:
+    """Outcome of one pair with the metrics collected while producing it."""
+
+    name: str
+    success: bool = False
+    report: str = ""
+    matches: int = 0
+    partials: int = 0
+    unmatched: int = 0
+    out_left: Optional[str] = None
+    out_right: Optional[str] = None
+    metrics: RunMetrics = field(default_factory=RunMetrics)
+    error: Optional[str] = None
+    audit: Optional[str] = None
+    state: Optional[ReconcileState] = field(default=None, repr=False)
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Seconds spent per stage."""
+        return self.metrics.stages
+
+
+def _sheet(value: str, path: Path) -> Sheet:
+    value = value.strip()
+    return value if value == ALL_SHEETS else resolve_sheet(path, value)
+
+
+def read_manifest(path: Union[str, Path]) -> List[PairJob]:
+    """Read jobs from a CSV file with ``left`` and ``right`` columns.
+
+    Optional ``sheet``, ``right_sheet`` and ``name`` columns are honoured.
+    Sheets are names, or positions when numeric and no sheet of the
+    workbook has that name, see :func:`src.io.loader.resolve_sheet`. Relative paths
+    are resolved against the folder of the manifest.
+    """
+
+    path = Path(path)
+    jobs = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            left = path.parent / row["left"].strip()
+            right = path.parent / row["right"].strip()
+            sheet = row.get("sheet") or "0"
+            right_sheet = (row.get("right_sheet") or "").strip() or sheet
+            jobs.append(
+                PairJob(left, right, _sheet(sheet, left), _sheet(right_sheet, right), (row.get("name") or "").strip())
+            )
+    return jobs
+
+
+def expand_sheets(jobs: Sequence[PairJob]) -> List[PairJob]:
+    """Replace ``"*"`` jobs by one job per sheet name found in both workbooks."""
+
+    expanded = []
+    for job in jobs:
+        if job.sheet != ALL_SHEETS:
+            expanded.append(job)
+            continue
+        right = set(sheet_names(job.right))
+        for sheet in sheet_names(job.left):
+            if sheet in right:
+                name = f"{job.name.rsplit('[', 1)[0]}[{sheet}]"
+                expanded.append(PairJob(job.left, job.right, sheet, sheet, name))
+    return expanded
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """Return the md5 hex digest of a file's content."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_table(
+    path: Union[str, Path], detection: Detection, content_hash: str, cache: ParsedCache, sheet: Sheet = 0
+) -> Tuple[pd.DataFrame, Detection]:
+    """Read the columns and rows used by ``detection`` from ``sheet``.
+
+    Preamble rows above ``start_row`` and footer rows from ``end_row`` or
+    the first total row on are not loaded, see
+    :func:`src.io.loader.footer_columns`. Returns the projected DataFrame and the detection re-indexed
+    onto it.
+    """
+
+    hits, misses = cache.hits, cache.misses
+    with stage("load"):
+        rows = detection_rows(detection)
+        header = cache.sample(content_hash, path, rows=0, sheet=sheet, header_row=rows["header_row"]).columns
+        columns = detection_columns(detection, header)
+        df, coords = cache.load(
+            content_hash, path, columns=columns, sheet=sheet, footer_columns=footer_columns(detection), **rows
+        )
+    count("cache_hits", cache.hits - hits)
+    count("cache_misses", cache.misses - misses)
+    return df, project_detection(detection, coords["col_coords"])
+
+
+def reconcile_tables(
+    df_left: pd.DataFrame,
+    df_right: pd.DataFrame,
+    local_left: Detection,
+    local_right: Detection,
+    det_left: Detection,
+    det_right: Detection,
+    path_left: Union[str, Path],
+    path_right: Union[str, Path],
+    options: Optional[ReconcileOptions] = None,
+    *,
+    cents: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None,
+    sheet_left: Optional[Sheet] = None,
+    sheet_right: Optional[Sheet] = None,
+    out_left: Optional[str] = None,
+    out_right: Optional[str] = None,
+    audit_path: Optional[Union[str, Path]] = None,
+    incremental: Union[bool, ReconcileState] = False,
+) -> PairReport:
+    """Reconcile two loaded tables and write highlighted copies of both.
+
+    ``local_*`` detections index the loaded frames while ``det_*`` refer to
+    sheet columns and drive the highlights. ``cents`` holds the already
+    parsed left debit, left credit, right debit and right credit columns.
+    When the cross totals agree the detailed matching is skipped.
+    ``audit_path`` receives the amount columns and the result, see
+    :mod:`src.io.audit`. With ``incremental`` the report carries a
+    :class:`ReconcileState`; passing that state back re-reconciles only the
+    groups whose rows changed since.
+    """
+
+    clock = StageClock()
+    if cents is None:
+        cents = (
+            parse_cents(df_left.iloc[:, local_left.debit_column])[0],
+            parse_cents(df_left.iloc[:, local_left.credit_column])[0],
+            parse_cents(df_right.iloc[:, local_right.debit_column])[0],
+            parse_cents(df_right.iloc[:, local_right.credit_column])[0],
+        )
+        clock.lap("parse")
+    left_debit, left_credit, right_debit, right_credit = cents
+    totals = [int(c.sum()) for c in cents]
+    left_debit_total, left_credit_total, right_debit_total, right_credit_total = (t / 100 for t in totals)
+    logger.info(
+        "Early check totals - debit left vs credit right: %.2f vs %.2f, credit left vs debit right: %.2f vs %.2f",
+        left_debit_total,
+        right_credit_total,
+        left_credit_total,
+        right_debit_total,
+    )
+    clock.lap("early_check")
+
+    state = incremental if isinstance(incremental, ReconcileState) else None
+    if totals[0] == totals[3] and totals[1] == totals[2]:
+        logger.info("Cross totals match - skipping detailed reconciliation")
+        with stage("write"):
+            written_left = write_coloured(df_left, set(), str(path_left), sheet=sheet_left, output_path=out_left)
+            written_right = write_coloured(df_right, set(), str(path_right), sheet=sheet_right, output_path=out_right)
+        return PairReport(
+            "",
+            True,
+            f"Debit total left {left_debit_total:.2f} matches credit total right {right_credit_total:.2f}\n"
+            f"Credit total left {left_credit_total:.2f} matches debit total right {right_debit_total:.2f}",
+            out_left=written_left,
+            out_right=written_right,
+            audit=_audit(audit_path, cents, det_left, det_right, path_left, path_right),
+            state=state,
+        )
+
+    with stage("reconcile"):
+        if incremental is False:
+            result = reconcile(
+                df_left,
+                df_right,
+                local_left,
+                local_right,
+                options,
+                amounts_left=left_debit - left_credit,
+                amounts_right=right_debit - right_credit,
+            )
+        else:
+            result, state = reconcile_incremental(
+                df_left,
+                df_right,
+                local_left,
+                local_right,
+                options,
+                state,
+                amounts_left=left_debit - left_credit,
+                amounts_right=right_debit - right_credit,
+            )
+    return _write_result(
+        result,
+        det_left,
+        det_right,
+        path_left,
+        path_right,
+        sheet_left,
+        sheet_right,
+        out_left,
+        out_right,
+        audit=_audit(audit_path, cents, det_left, det_right, path_left, path_right, result),
+        state=state,
+    )
+
+
+def reconcile_large(
+    path_left: Union[str, Path],
+    path_right: Union[str, Path],
+    det_left: Detection,
+    det_right: Detection,
+    options: Optional[ReconcileOptions] = None,
+    *,
+    memory_budget: int,
+    sheet_left: Sheet = 0,
+    sheet_right: Sheet = 0,
+    out_left: Optional[str] = None,
+    out_right: Optional[str] = None,
+    spill_dir: Optional[Union[str, Path]] = None,
+) -> PairReport:
+    """Reconcile two workbooks within ``memory_budget`` bytes and write highlighted copies.
+
+    The sheets are streamed into on-disk partitions instead of being loaded,
+    see :func:`src.core.outofcore.reconcile_out_of_core`. The cross totals
+    are not checked up front and no audit trail is written.
+    """
+
+    with stage("reconcile"):
+        result = reconcile_out_of_core(
+            path_left,
+            path_right,
+            det_left,
+            det_right,
+            options,
+            sheet_left=sheet_left,
+            sheet_right=sheet_right,
+            memory_budget=memory_budget,
+            spill_dir=spill_dir,
+        )
+    return _write_result(
+        result, det_left, det_right, path_left, path_right, sheet_left, sheet_right, out_left, out_right
+    )
+
+
+def _write_result(
+    result: ReconcileResult,
+    det_left: Detection,
+    det_right: Detection,
+    path_left: Union[str, Path],
+    path_right: Union[str, Path],
+    sheet_left: Optional[Sheet],
+    sheet_right: Optional[Sheet],
+    out_left: Optional[str],
+    out_right: Optional[str],
+    audit: Optional[str] = None,
+    state: Optional[ReconcileState] = None,
+) -> PairReport:
+    """Highlight ``result`` in copies of both workbooks and report on it."""
+    with stage("highlight"):
+        matches, partials, unmatched = result
+        left_cells = cells_to_highlight(matches, partials, unmatched, det_left, "left")
+        right_cells = cells_to_highlight(matches, partials, unmatched, det_right, "right")
+    count("highlighted_cells", len(left_cells) + len(right_cells))
+
+    # The writer only needs the workbook paths, not the loaded frames.
+    with stage("write"):
+        empty = pd.DataFrame()
+        written_left = write_coloured(
+            empty,
+            left_cells,
+            str(path_left),
+            sheet=sheet_left,
+            output_path=out_left,
+            row_coords=sheet_rows(det_left),
+        )
+        written_right = write_coloured(
+            empty,
+            right_cells,
+            str(path_right),
+            sheet=sheet_right,
+            output_path=out_right,
+            row_coords=sheet_rows(det_right),
+        )
+
+    success = not partials and not unmatched and not result.match_diff.any()
+    report = f"Matches: {len(matches)}\nPartials: {len(partials)}\nUnmatched: {len(unmatched)}"
+    logger.info("Reconciliation result: %s", report.replace("\n", "; "))
+    return PairReport(
+        "",
+        success,
+        report,
+        len(matches),
+        len(partials),
+        len(unmatched),
+        written_left,
+        written_right,
+        audit=audit,
+        state=state,
+    )
+
+
+def _audit(
+    path: Optional[Union[str, Path]],
+    cents: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    det_left: Detection,
+    det_right: Detection,
+    path_left: Union[str, Path],
+    path_right: Union[str, Path],
+    result: Optional[ReconcileResult] = None,
+) -> Optional[str]:
+    """Write the audit trail of one pair to ``path`` when it is given."""
+    if path is None:
+        return None
+    left_debit, left_credit, right_debit, right_credit = cents
+    first_left, first_right = sheet_rows(det_left)[0], sheet_rows(det_right)[0]
+    with stage("audit"):
+        write_audit(
+            path,
+            {
+                "left.debit": AuditColumn(str(path_left), det_left.debit_column, left_debit, first_row=first_left),
+                "left.credit": AuditColumn(str(path_left), det_left.credit_column, left_credit, first_row=first_left),
+                "right.debit": AuditColumn(str(path_right), det_right.debit_column, right_debit, first_row=first_right),
+                "right.credit": AuditColumn(
+                    str(path_right), det_right.credit_column, right_credit, first_row=first_right
+                ),
+            },
+            result,
+        )
+    return str(path)
+
+
+def _output_path(path: Path, sheet: Sheet, counterpart: Path, output_dir: Optional[Path]) -> str:
+    folder = output_dir or path.parent
+    return str(folder / f"{path.stem}_{sheet}_vs_{counterpart.stem}_checked{path.suffix}")
+
+
+def run_pair(
+    job: PairJob,
+    det_left: Detection,
+    det_right: Detection,
+    options: Optional[ReconcileOptions] = None,
+    cache_dir: Optional[Path] = None,
+    output_dir: Optional[Path] = None,
+    profile: Optional[Profile] = None,
+    audit: bool = False,
+) -> PairReport:
+    """Load, reconcile and write one detected pair.
+
+    Outputs are named ``<stem>_<sheet>_vs_<counterpart stem>_checked`` so
+    neither several sheets of one workbook nor several pairs sharing a
+    workbook overwrite each other; with ``audit`` the audit trail is
+    written next to the left output as ``.audit.npz``. Errors are reported,
+    not raised.
+    """
+
+    cache = ParsedCache(cache_dir)
+    out_left = _output_path(job.left, job.sheet, job.right, output_dir)
+    with collect(profile) as metrics:
+        try:
+            df_left, local_left = load_table(job.left, det_left, file_hash(job.left), cache, job.sheet)
+            df_right, local_right = load_table(job.right, det_right, file_hash(job.right), cache, job.right_sheet)
+            report = reconcile_tables(
+                df_left,
+                df_right,
+                local_left,
+                local_right,
+                det_left,
+                det_right,
+                job.left,
+                job.right,
+                options,
+                sheet_left=job.sheet,
+                sheet_right=job.right_sheet,
+                out_left=out_left,
+                out_right=_output_path(job.right, job.right_sheet, job.left, output_dir),
+                audit_path=str(Path(out_left).with_suffix(".audit.npz")) if audit else None,
+            )
+        except Exception as exc:
+            logger.exception("Pair %s failed", job.name)
+            report = PairReport("", error=f"{type(exc).__name__}: {exc}")
+    report.name = job.name
+    report.metrics = metrics
+    return report
+
+
+def _detect(
+    jobs: Sequence[PairJob], api_key: str, cache: ParsedCache, **kwargs
+) -> List[Tuple[Detection, Detection]]:
+    samples = []
+    for job in jobs:
+        for path, sheet in ((job.left, job.sheet), (job.right, job.right_sheet)):
+            samples.append(cache.sample(file_hash(path), path, sheet=sheet))
+    found = detector.detect_batch(samples, api_key=api_key, **kwargs)
+    return list(zip(found[::2], found[1::2]))
+
+
+def run_batch(
+    jobs: Sequence[PairJob],
+    api_key: str,
+    options: Optional[ReconcileOptions] = None,
+    *,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    output_dir: Optional[Path] = None,
+    profile: Optional[Profile] = None,
+    audit: bool = False,
+    **detect_kwargs,
+) -> List[PairReport]:
+    """Reconcile every pair of ``jobs`` and return their reports in job order.
+
+    Parameters
+    ----------
+    jobs:
+        Pairs to process; ``"*"`` sheets are expanded first.
+    api_key:
+        OpenAI key used for column detection.
+    options:
+        Reconciliation settings shared by all pairs.
+    workers:
+        Size of the process pool, one process per CPU by default. With
+        ``1`` every pair runs in the calling process.
+    chunk_size:
+        Pairs detected per LLM batch, twice the number of workers by
+        default. Pairs of a chunk start processing while the next chunk is
+        being detected.
+    cache_dir:
+        Folder of the parsed workbook cache shared by all workers.
+    output_dir:
+        Folder receiving highlighted copies, next to the sources by default.
+    profile:
+        Profile mode of every pair, see :func:`src.utils.metrics.collect`.
+    audit:
+        Write an audit trail of every pair, see :func:`run_pair`.
+    detect_kwargs:
+        Passed to :func:`src.llm.detector.detect_batch`.
+
+    Detection runs for whole chunks of pairs, so its counters (registry and
+    cache hits, API calls, heuristic fallbacks) and its time are reported
+    to the metrics the caller collects, see :func:`src.utils.metrics.collect`;
+    every pair report only carries its share of the detection time.
+    """
+
+    jobs = expand_sheets(jobs)
+    if output_dir is not None:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    cache = ParsedCache(cache_dir)
+    pool_size = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or 2 * pool_size
+    reports: List[Optional[PairReport]] = [None] * len(jobs)
+    pool = ProcessPoolExecutor(max_workers=pool_size) if pool_size > 1 else None
+    futures: Dict[int, Future] = {}
+    detect_times: Dict[int, float] = {}
+    batch = current()
+    try:
+        for first in range(0, len(jobs), chunk_size):
+            chunk = jobs[first : first + chunk_size]
+            try:
+                with collect() as found, stage("detect"):
+                    detections = _detect(chunk, api_key, cache, **detect_kwargs)
+            except Exception as exc:
+                logger.exception("Detection failed for pairs %d-%d", first, first + len(chunk) - 1)
+                for i, job in enumerate(chunk, start=first):
+                    reports[i] = PairReport(job.name, error=f"{type(exc).__name__}: {exc}")
+                continue
+            finally:
+                # The caller's collection measures its own total.
+                found.stages.pop("total", None)
+                if batch is not None:
+                    batch.merge(found)
+            detect = found.stages["detect"] / len(chunk)
+            for i, (job, (det_left, det_right)) in enumerate(zip(chunk, detections), start=first):
+                args = (job, det_left, det_right, options, cache_dir, output_dir, profile, audit)
+                detect_times[i] = detect
+                if pool is None:
+                    reports[i] = run_pair(*args)
+                else:
+                    futures[i] = pool.submit(run_pair, *args)
+        for i, future in futures.items():
+            reports[i] = future.result()
+        for i, seconds in detect_times.items():
+            reports[i].timings["detect"] = seconds
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return reports
+
+
+def summarize(reports: Sequence[PairReport]) -> pd.DataFrame:
+    """Return one row per pair with counts, outputs, stage timings and counters."""
+
+    rows = []
+    for r in reports:
+        row = {
+            "name": r.name,
+            "success": r.success,
+            "matches": r.matches,
+            "partials": r.partials,
+            "unmatched": r.unmatched,
+            "error": r.error,
+            "out_left": r.out_left,
+            "out_right": r.out_right,
+            "audit": r.audit,
+        }
+        row.update({f"{name}_s": seconds for name, seconds in r.timings.items()})
+        row.update({name: n for name, n in r.metrics.counters.items() if name not in row})
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -2,10 +2,9 @@ from __future__ import annotations
 
 import hashlib
 from io import BytesIO
-from openpyxl.utils import get_column_letter
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from typing import Tuple
+from tempfile import TemporaryDirectory
+from typing import List, Optional, Tuple
 import sys
 import logging
 
@@ -19,134 +18,104 @@ import streamlit as st
 
 logger = logging.getLogger(__name__)
 
-from src.core.highlight import cells_to_highlight
-from src.core.reconcile import reconcile
+from src.core.incremental import ReconcileState
+from src.core.reconcile import ReconcileOptions
+from src.io.cache import ParsedCache
 from src.io.loader import infer_engine
-from src.io.writer import write_coloured
 from src.llm import detector
 from src.llm.schema import Detection
-
-
-@st.cache_data
-def _detect_cached(file_hash: str, content: bytes, name: str, key: str) -> Detection:
-    """Run column detection with caching by file hash."""
-    engine = infer_engine(name)
-    df = pd.read_excel(BytesIO(content), engine=engine)
-    return detector.detect_columns(df, api_key=key)
-
-
-def _load_file(upload: st.runtime.uploaded_file_manager.UploadedFile) -> Tuple[pd.DataFrame, str, bytes]:
-    """Save uploaded file to disk and read it into a DataFrame."""
+from src.pipeline import PairReport, load_table, reconcile_tables
+from src.utils.metrics import StageClock, collect, stage
+from src.utils.numeric import parse_cents
+
+_CACHE = ParsedCache()
+# Uploads are saved here by content hash and removed when the server exits.
+_WORKDIR = TemporaryDirectory(prefix="balance_check-")
+
+
+def _detect(uploads: List[Tuple[str, bytes, str]], key: str) -> List[Detection]:
+    """Detect columns of all uploads concurrently from cached header samples.
+
+    ``uploads`` holds ``(file_hash, content, name)`` triples. Repeated
+    layouts are answered from the detection cache without an API call.
+    """
+    with stage("detect"):
+        samples = [
+            _CACHE.sample(file_hash, BytesIO(content), engine=infer_engine(name))
+            for file_hash, content, name in uploads
+        ]
+        return detector.detect_batch(samples, api_key=key)
+
+
+def _load_file(
+    upload: st.runtime.uploaded_file_manager.UploadedFile, detection: Detection, file_hash: str
+) -> Tuple[pd.DataFrame, Detection, str]:
+    """Save uploaded file to disk and read the columns used by ``detection``.
+
+    Parsed columns come from the on-disk cache when the same content was
+    loaded before. Returns the projected DataFrame, the detection re-indexed
+    onto it and the path of the saved copy.
+    """
     logger.info("Loading file %s", upload.name)
     data = upload.getvalue()
-    suffix = Path(upload.name).suffix
-    with NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(data)
-        path = tmp.name
-    engine = infer_engine(upload.name)
-    df = pd.read_excel(BytesIO(data), engine=engine)
-    return df, path, data
-
+    folder = Path(_WORKDIR.name) / file_hash
+    folder.mkdir(exist_ok=True)
+    path = str(folder / Path(upload.name).name)
+    Path(path).write_bytes(data)
+    df, local = load_table(path, detection, file_hash, _CACHE)
+    return df, local, path
 
 def _run_reconcile(
     left_file: st.runtime.uploaded_file_manager.UploadedFile,
     right_file: st.runtime.uploaded_file_manager.UploadedFile,
     api_key: str,
-) -> Tuple[bool, str, str, str]:
-    """Process two uploads and perform reconciliation."""
+    options: Optional[ReconcileOptions] = None,
+    state: Optional[ReconcileState] = None,
+) -> PairReport:
+    """Process two uploads and perform reconciliation.
+
+    The report names both highlighted copies and the audit trail holding
+    every parsed amount with its cell address. Its ``state`` lets the next
+    run of the same pair recompute only the groups that were edited.
+    """
     logger.info("Running reconciliation")
-    detail_logger = logging.getLogger("balance_check.sum")
-    if not detail_logger.handlers:
-        handler = logging.FileHandler("sum.log")
-        handler.setFormatter(
-            logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-        )
-        detail_logger.addHandler(handler)
-        detail_logger.setLevel(logging.DEBUG)
-
-    df_left, path_left, bytes_left = _load_file(left_file)
-    df_right, path_right, bytes_right = _load_file(right_file)
-
-    det_left = _detect_cached(hashlib.md5(bytes_left).hexdigest(), bytes_left, left_file.name, api_key)
-    det_right = _detect_cached(hashlib.md5(bytes_right).hexdigest(), bytes_right, right_file.name, api_key)
-
+    bytes_left = left_file.getvalue()
+    bytes_right = right_file.getvalue()
+    hash_left = hashlib.md5(bytes_left).hexdigest()
+    hash_right = hashlib.md5(bytes_right).hexdigest()
+    det_left, det_right = _detect(
+        [(hash_left, bytes_left, left_file.name), (hash_right, bytes_right, right_file.name)],
+        api_key,
+    )
 
     logger.info("Detected columns - left: %s", det_left.model_dump())
     logger.info("Detected columns - right: %s", det_right.model_dump())
 
-    left_debit = pd.to_numeric(
-        df_left.iloc[:, det_left.debit_column], errors="coerce"
-    ).fillna(0)
-    left_credit = pd.to_numeric(
-        df_left.iloc[:, det_left.credit_column], errors="coerce"
-    ).fillna(0)
-    right_debit = pd.to_numeric(
-        df_right.iloc[:, det_right.debit_column], errors="coerce"
-    ).fillna(0)
-    right_credit = pd.to_numeric(
-        df_right.iloc[:, det_right.credit_column], errors="coerce"
-    ).fillna(0)
-
-    left_debit_letter = get_column_letter(det_left.debit_column + 1)
-    for idx, val in enumerate(left_debit, start=2):
-        cell = f"{left_debit_letter}{idx}"
-        detail_logger.debug("Left %s: %s=%.2f", left_file.name, cell, val)
-    left_debit_total = left_debit.sum()
-    detail_logger.debug("Left debit total=%.2f", left_debit_total)
-
-    left_credit_letter = get_column_letter(det_left.credit_column + 1)
-    for idx, val in enumerate(left_credit, start=2):
-        cell = f"{left_credit_letter}{idx}"
-        detail_logger.debug("Left %s: %s=%.2f", left_file.name, cell, val)
-    left_credit_total = left_credit.sum()
-    detail_logger.debug("Left credit total=%.2f", left_credit_total)
-
-    right_debit_letter = get_column_letter(det_right.debit_column + 1)
-    for idx, val in enumerate(right_debit, start=2):
-        cell = f"{right_debit_letter}{idx}"
-        detail_logger.debug("Right %s: %s=%.2f", right_file.name, cell, val)
-    right_debit_total = right_debit.sum()
-    detail_logger.debug("Right debit total=%.2f", right_debit_total)
-
-    right_credit_letter = get_column_letter(det_right.credit_column + 1)
-    for idx, val in enumerate(right_credit, start=2):
-        cell = f"{right_credit_letter}{idx}"
-        detail_logger.debug("Right %s: %s=%.2f", right_file.name, cell, val)
-    right_credit_total = right_credit.sum()
-    detail_logger.debug("Right credit total=%.2f", right_credit_total)
-
-    logger.info(
-        "Early check totals - debit left vs credit right: %.2f vs %.2f, credit left vs debit right: %.2f vs %.2f",
-        left_debit_total,
-        right_credit_total,
-        left_credit_total,
-        right_debit_total,
+    df_left, local_left, path_left = _load_file(left_file, det_left, hash_left)
+    df_right, local_right, path_right = _load_file(right_file, det_right, hash_right)
+
+    clock = StageClock()
+    left_debit, _ = parse_cents(df_left.iloc[:, local_left.debit_column])
+    left_credit, _ = parse_cents(df_left.iloc[:, local_left.credit_column])
+    right_debit, _ = parse_cents(df_right.iloc[:, local_right.debit_column])
+    right_credit, _ = parse_cents(df_right.iloc[:, local_right.credit_column])
+    clock.lap("parse")
+
+    return reconcile_tables(
+        df_left,
+        df_right,
+        local_left,
+        local_right,
+        det_left,
+        det_right,
+        path_left,
+        path_right,
+        options,
+        cents=(left_debit, left_credit, right_debit, right_credit),
+        audit_path=Path(_WORKDIR.name) / f"{hash_left}_{hash_right}.audit.npz",
+        incremental=state or True,
     )
 
-    if round(left_debit_total, 2) == round(right_credit_total, 2) and round(left_credit_total, 2) == round(right_debit_total, 2):
-        out_left = write_coloured(df_left, set(), path_left)
-        out_right = write_coloured(df_right, set(), path_right)
-        report = (
-            f"Debit total left {left_debit_total:.2f} matches credit total right {right_credit_total:.2f}\n"
-            f"Credit total left {left_credit_total:.2f} matches debit total right {right_debit_total:.2f}"
-        )
-        logger.info("Cross totals match - skipping detailed reconciliation")
-        return True, report, out_left, out_right
-
-    matches, partials, unmatched = reconcile(df_left, df_right, det_left, det_right)
-
-    left_cells = cells_to_highlight(matches, partials, unmatched, det_left, "left")
-    right_cells = cells_to_highlight(matches, partials, unmatched, det_right, "right")
-
-    out_left = write_coloured(df_left, left_cells, path_left)
-    out_right = write_coloured(df_right, right_cells, path_right)
-
-    success = not partials and not unmatched and all(m.diff == 0 for m in matches)
-    report = f"Matches: {len(matches)}\nPartials: {len(partials)}\nUnmatched: {len(unmatched)}"
-
-    logger.info("Reconciliation result: %s", report.replace("\n", "; "))
-    return success, report, out_left, out_right
-
 
 def main() -> None:
     """Streamlit entrypoint."""
@@ -156,24 +125,41 @@ def main() -> None:
     key = st.sidebar.text_input("OpenAI API Key", type="password")
     if key:
         st.session_state["openai_key"] = key
+    tolerance = st.sidebar.number_input("Amount tolerance (cents)", min_value=0, value=0, step=1)
+    window = st.sidebar.number_input("Date window (days, 0 = off)", min_value=0, value=0, step=1)
+    net_groups = st.sidebar.checkbox("Net balanced groups", help="Resolve groups whose totals and row counts agree as a whole")
+    options = ReconcileOptions(tolerance=int(tolerance), date_window=int(window) or None, net_groups=net_groups)
+    profile = st.sidebar.selectbox("Profile", ["off", "cprofile", "tracemalloc"])
 
-    left = st.file_uploader("Left workbook", type=["xls", "xlsx"], key="left")
-    right = st.file_uploader("Right workbook", type=["xls", "xlsx"], key="right")
+    types = ["xls", "xlsx", "csv", "parquet"]
+    left = st.file_uploader("Left workbook", type=types, key="left")
+    right = st.file_uploader("Right workbook", type=types, key="right")
 
     if st.button("Reconcile", disabled=not (left and right)) and left and right:
-        with st.spinner("Reconciling..."):
-            success, report, out_left, out_right = _run_reconcile(
-                left, right, st.session_state.get("openai_key", "")
+        with st.spinner("Reconciling..."), collect(None if profile == "off" else profile) as metrics:
+            # Re-running a pair after editing one workbook reuses untouched groups.
+            state_key = f"reconcile_state:{left.name}:{right.name}"
+            outcome = _run_reconcile(
+                left, right, st.session_state.get("openai_key", ""), options, st.session_state.get(state_key)
             )
-        if success:
+            st.session_state[state_key] = outcome.state
+        if outcome.success:
             st.success("All rows matched across workbooks.")
         else:
-            st.error(f"Differences found:\n{report}")
-        with open(out_left, "rb") as f:
-            st.download_button("Download left result", f, file_name=Path(out_left).name)
-        with open(out_right, "rb") as f:
-            st.download_button("Download right result", f, file_name=Path(out_right).name)
-        st.text_area("Report", report, height=120)
+            st.error(f"Differences found:\n{outcome.report}")
+        with open(outcome.out_left, "rb") as f:
+            st.download_button("Download left result", f, file_name=Path(outcome.out_left).name)
+        with open(outcome.out_right, "rb") as f:
+            st.download_button("Download right result", f, file_name=Path(outcome.out_right).name)
+        if outcome.audit:
+            with open(outcome.audit, "rb") as f:
+                st.download_button("Download audit trail", f, file_name=Path(outcome.audit).name)
+        st.text_area("Report", outcome.report, height=120)
+        with st.expander("Run metrics"):
+            st.json(metrics.to_dict())
+            if metrics.profile:
+                st.code(metrics.profile)
+            st.download_button("Download metrics", metrics.to_json(indent=1), file_name="metrics.json")
 
 
 if __name__ == "__main__":
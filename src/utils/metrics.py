@@ -0,0 +1,171 @@
+"""Stage timings and counters collected during one reconciliation run.
+
+Code reports into the run that is currently being collected::
+
+    with collect() as metrics:
+        with stage("load"):
+            ...
+        count("rows_left", len(df))
+    print(metrics.to_json())
+
+:func:`stage` and :func:`count` do nothing outside :func:`collect`, so
+library functions can be instrumented unconditionally.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Literal, Optional
+
+_CURRENT: ContextVar[Optional["RunMetrics"]] = ContextVar("balance_check_metrics", default=None)
+
+Profile = Literal["cprofile", "tracemalloc"]
+
+
+@dataclass
+class RunMetrics:
+    """Timings in seconds and counters of one run.
+
+    ``stages`` accumulates the time of every named stage, ``groups`` the
+    subset search time of every group key. ``profile`` holds the cProfile
+    report and ``memory`` the tracemalloc peak and top allocations when the
+    run was collected with a profile mode.
+    """
+
+    stages: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    groups: Dict[str, float] = field(default_factory=dict)
+    profile: Optional[str] = None
+    memory: Optional[Dict[str, Any]] = None
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def merge(self, other: "RunMetrics") -> None:
+        """Add the stage times, counters and group times of ``other``."""
+        for name, seconds in other.stages.items():
+            self.add_time(name, seconds)
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for name, seconds in other.groups.items():
+            self.groups[name] = self.groups.get(name, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, **kwargs)
+
+
+def current() -> Optional[RunMetrics]:
+    """Return the metrics being collected, if any."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block to stage ``name``."""
+    metrics = _CURRENT.get()
+    if metrics is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, perf_counter() - start)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add ``n`` to counter ``name``."""
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+class StageClock:
+    """Split a linear piece of code into stages without nesting blocks.
+
+    Every :meth:`lap` adds the time since the previous lap, or since the
+    clock was created, to the named stage.
+    """
+
+    def __init__(self) -> None:
+        self.last = perf_counter()
+
+    def lap(self, name: str) -> None:
+        now = perf_counter()
+        metrics = _CURRENT.get()
+        if metrics is not None:
+            metrics.add_time(name, now - self.last)
+        self.last = now
+
+
+def group_time(key: Any, seconds: float) -> None:
+    """Record the subset search time of group ``key``."""
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        name = "/".join(map(str, key)) if isinstance(key, tuple) else str(key)
+        name = name or "(all rows)"
+        metrics.groups[name] = metrics.groups.get(name, 0.0) + seconds
+
+
+def _top_allocations(snapshot: Any, limit: int) -> List[str]:
+    return [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+
+
+@contextmanager
+def collect(profile: Optional[Profile] = None, top: int = 25) -> Iterator[RunMetrics]:
+    """Collect metrics of the code run inside the block.
+
+    Parameters
+    ----------
+    profile:
+        ``"cprofile"`` stores the ``top`` functions by cumulative time in
+        ``profile``; ``"tracemalloc"`` stores the peak traced memory and the
+        ``top`` allocation sites in ``memory``. Both slow the run down and
+        only see the calling process.
+    top:
+        Number of entries kept in the profile reports.
+    """
+
+    metrics = RunMetrics()
+    token = _CURRENT.set(metrics)
+    profiler = None
+    if profile == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == "tracemalloc":
+        import tracemalloc
+
+        tracemalloc.start()
+    start = perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.add_time("total", perf_counter() - start)
+        if profiler is not None:
+            import pstats
+
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            metrics.profile = out.getvalue()
+        elif profile == "tracemalloc":
+            _, peak = tracemalloc.get_traced_memory()
+            metrics.memory = {
+                "peak_mb": peak / 2**20,
+                "top": _top_allocations(tracemalloc.take_snapshot(), top),
+            }
+            tracemalloc.stop()
+        _CURRENT.reset(token)
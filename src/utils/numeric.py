@@ -0,0 +1,99 @@
+"""Shared parsing of money columns into integer cents."""
+
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+_SPACES = r"[\s\u00a0\u202f']"
+_PREFIX = r"^[^\d+\-(.,]+"
+_SUFFIX = r"(?<=[\d)])[^\d)]+$"
+_PARENS = r"^\((.*)\)$"
+# A single comma followed by exactly three digits groups thousands: "1,234".
+_THOUSANDS_COMMA = r"^[^.,]*\d,\d{3}$"
+# Largest magnitude whose cents still fit into int64.
+_MAX_AMOUNT = np.iinfo(np.int64).max // 100
+
+
+def _strip_parens(text: pd.Series, negative: np.ndarray) -> pd.Series:
+    paren = text.str.match(_PARENS).to_numpy(dtype=bool)
+    negative |= paren
+    return text.str.replace(_PARENS, r"\1", regex=True)
+
+
+def _clean(text: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """Normalise money strings to plain ``digits[.digits]`` text.
+
+    Handles space, NBSP and apostrophe thousands separators, currency
+    prefixes and suffixes, leading, trailing-minus and parenthesised
+    negatives and comma decimals. Signs and parentheses are resolved before
+    currency is stripped, so ``"(1 000,00 руб.)"`` and ``"-$5"`` keep their
+    sign. Returns the cleaned text and a mask of negated values.
+    """
+
+    text = text.str.replace(_SPACES, "", regex=True)
+    negative = text.str.endswith("-").to_numpy(dtype=bool)
+    text = text.str.rstrip("-")
+    text = _strip_parens(text, negative)
+    text = text.str.replace(_PREFIX, "", regex=True).str.replace(_SUFFIX, "", regex=True)
+    text = _strip_parens(text, negative)
+    negative |= text.str.startswith("-").to_numpy(dtype=bool)
+    text = text.str.lstrip("+-").str.replace(_PREFIX, "", regex=True)
+
+    # The right-most of "," and "." is the decimal mark when both occur; a
+    # separator repeated several times only groups thousands, as does a lone
+    # comma followed by exactly three digits.
+    comma = text.str.rfind(",")
+    dot = text.str.rfind(".")
+    n_comma = text.str.count(",")
+    n_dot = text.str.count(r"\.")
+    grouped = text.str.match(_THOUSANDS_COMMA).to_numpy(dtype=bool)
+    comma_decimal = ((comma > dot) & (n_comma == 1)).to_numpy(dtype=bool) & ~grouped
+    dot_thousands = (n_dot > 1).to_numpy(dtype=bool) | comma_decimal
+    text = text.where(~dot_thousands, text.str.replace(".", "", regex=False))
+    text = text.where(comma_decimal, text.str.replace(",", "", regex=False))
+    text = text.str.replace(",", ".", regex=False)
+    return text, negative
+
+
+def parse_cents(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse a column of money values into ``int64`` cents in one pass.
+
+    Parameters
+    ----------
+    values:
+        Raw column as loaded from the workbook: numbers, strings or blanks.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Amounts in cents, with ``0`` for blank and unparsable cells, and a
+        boolean mask of non-blank cells that could not be parsed or whose
+        cents do not fit into ``int64``.
+    """
+
+    values = pd.Series(values, copy=False)
+    if pd.api.types.is_bool_dtype(values):
+        values = values.astype(object)
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        failed = np.zeros(len(numbers), dtype=bool)
+    else:
+        numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+        blank = values.isna().to_numpy(dtype=bool)
+        is_text = np.isnan(numbers) & ~blank
+        if is_text.any():
+            raw = values[is_text].astype(str)
+            text, negative = _clean(raw)
+            parsed = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+            numbers[is_text] = np.where(negative, -parsed, parsed)
+            blank[is_text] = raw.str.strip().eq("").to_numpy(dtype=bool)
+        failed = np.isnan(numbers) & ~blank
+    # Amounts whose cents overflow int64 are failures, not wrapped values.
+    with np.errstate(invalid="ignore"):
+        failed |= np.abs(numbers) > _MAX_AMOUNT
+    numbers = np.where(failed, 0.0, numbers)
+    cents = np.round(np.nan_to_num(numbers, nan=0.0) * 100)
+    return cents.astype(np.int64), failed
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path, monkeypatch):
+    """Keep parse and detection caches of the test-suite out of the user's cache."""
+    monkeypatch.setenv("BALANCE_CHECK_CACHE", str(tmp_path / "cache"))
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from src.core.reconcile import reconcile
+from src.io.audit import AuditColumn, AuditTrail, write_audit
+from src.llm.schema import Detection
+
+
+def test_audit_trail_round_trip(tmp_path):
+    det = Detection(debit_column=1, credit_column=2, header_row=0, start_row=1, end_row=0, group_keys=[])
+    left = pd.DataFrame({"d": ["x", "y"], "debit": [10, 30], "credit": [0, 0]})
+    right = pd.DataFrame({"d": ["x"], "debit": [10], "credit": [0]})
+    result = reconcile(left, right, det, det)
+
+    path = write_audit(
+        tmp_path / "run.audit.npz",
+        {
+            "left.debit": AuditColumn("l.xlsx", 1, np.array([1000, 3000])),
+            "right.debit": AuditColumn("r.xlsx", 27, np.array([1000]), rows=np.array([4])),
+        },
+        result,
+        tolerance=0,
+    )
+
+    with AuditTrail(path) as audit:
+        assert audit.columns == ["left.debit", "right.debit"]
+        assert audit.totals() == {"left.debit": 40.0, "right.debit": 10.0}
+        assert audit.meta["tolerance"] == 0
+        cells = audit.cells("left.debit")
+        assert cells["address"].tolist() == ["B2", "B3"]
+        assert cells["amount"].tolist() == [10.0, 30.0]
+        assert audit.cell("right.debit", "AB6") == 10.0
+        assert audit.cell("right.debit", "AB2") is None
+        assert audit.cell("left.debit", "C2") is None
+        assert audit.result() == result
+
+
+def test_audit_without_result(tmp_path):
+    path = write_audit(tmp_path / "a.npz", {"left.debit": AuditColumn("l.xlsx", 0, np.array([5]))})
+
+    with AuditTrail(path) as audit:
+        assert audit.result() is None
@@ -0,0 +1,50 @@
+import benchmarks.run
+from benchmarks.ledger import make_ledgers
+from benchmarks.run import compare, main, run
+from src.utils.numeric import parse_cents
+
+
+def test_make_ledgers_is_seeded_and_balanced():
+    left, right = make_ledgers(200, groups=3, duplicate_skew=0.5, split_ratio=0.2, dirty=0.5, seed=7)
+    again, _ = make_ledgers(200, groups=3, duplicate_skew=0.5, split_ratio=0.2, dirty=0.5, seed=7)
+
+    assert left.equals(again)
+    assert len(right) > len(left)
+    left_cents, failed = parse_cents(left["debit"])
+    assert not failed.any()
+    assert left["debit"].map(type).eq(str).any()
+    for who, rows in left.groupby("who").groups.items():
+        right_rows = right.index[right["who"] == who]
+        assert left_cents[rows].sum() == parse_cents(right.loc[right_rows, "debit"])[0].sum()
+
+
+def test_compare_flags_regressions_only():
+    base = [{"stage": "parse", "rows": 10, "seconds": 1.0, "peak_mb": 1.0}]
+    same = [{"stage": "parse", "rows": 10, "seconds": 1.1, "peak_mb": 1.0}]
+    slow = [{"stage": "parse", "rows": 10, "seconds": 1.5, "peak_mb": 1.0}]
+
+    assert compare(same, base, 0.25) == []
+    assert len(compare(slow, base, 0.25)) == 1
+    assert compare([{**slow[0], "rows": 20}], base, 0.25) == []
+
+
+def test_missing_baseline_fails(tmp_path, capsys):
+    assert main(["--sizes", "10", "--baseline", str(tmp_path / "none.json")]) == 2
+    assert "not found" in capsys.readouterr().err
+
+
+def test_subset_case_completes_and_write_case_colours_cells(monkeypatch):
+    seen = {}
+    search = benchmarks.run.match_subsets
+
+    def match_subsets(left, right):
+        seen["subset"] = search(left, right)
+        return seen["subset"]
+
+    monkeypatch.setattr(benchmarks.run, "match_subsets", match_subsets)
+    monkeypatch.setattr(benchmarks.run, "write_coloured", lambda df, cells, path: seen.setdefault("cells", cells))
+
+    assert len(run([300], repeat=1, stages=["subset", "write"])) == 2
+    matches, complete = seen["subset"]
+    assert complete and len(matches) == benchmarks.run._SPLITS
+    assert len(seen["cells"]) > 0
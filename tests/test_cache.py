@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from src.io.cache import ParsedCache
+
+
+def _workbook(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Who", "Debit", "Credit"])
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+def test_load_parses_once_and_memory_maps(tmp_path):
+    path = _workbook(tmp_path / "a.xlsx", [["x", 10, 0], ["y", 2.5, 1]])
+    cache = ParsedCache(tmp_path / "cache")
+
+    cold, coords = cache.load("hash-a", str(path), columns=[0, 1])
+    path.unlink()
+    warm, warm_coords = cache.load("hash-a", str(path), columns=[0, 1])
+
+    pd.testing.assert_frame_equal(warm, cold)
+    assert warm_coords == coords
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(np.load(next((tmp_path / "cache").glob("*/1.npy")), mmap_mode="r"), np.memmap)
+
+
+def test_options_are_part_of_the_key(tmp_path):
+    path = _workbook(tmp_path / "a.xlsx", [["x", 10, 0]])
+    cache = ParsedCache(tmp_path / "cache")
+
+    assert list(cache.load("h", str(path), columns=[1])[0].columns) == ["Debit"]
+    assert list(cache.load("h", str(path), columns=[2])[0].columns) == ["Credit"]
+    assert list(cache.sample("h", str(path), rows=0).columns) == ["Who", "Debit", "Credit"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ParsedCache(tmp_path / "cache", max_bytes=1500)
+    frame = pd.DataFrame({"v": np.arange(100, dtype=float)})
+
+    cache.put("old", frame, {})
+    cache.put("new", frame, {})
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+
+
+def test_concurrent_puts_and_evictions_keep_entries_whole(tmp_path):
+    cache = ParsedCache(tmp_path / "cache", max_bytes=3000)
+    frame = pd.DataFrame({"v": np.arange(100, dtype=float)})
+    keys = [key for i in range(16) for key in ("same", f"other-{i}")]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda key: cache.put(key, frame, {}), keys))
+
+    stored = [entry.name for entry in (tmp_path / "cache").iterdir()]
+    assert stored and all(not name.startswith(".tmp-") for name in stored)
+    for name in stored:
+        pd.testing.assert_frame_equal(cache.get(name)[0], frame)
+
+
+def test_damaged_entry_is_stored_again(tmp_path):
+    cache = ParsedCache(tmp_path / "cache")
+    frame = pd.DataFrame({"v": [1.0, 2.0]})
+    cache.put("k", frame, {})
+    (tmp_path / "cache" / "k" / "0.npy").write_bytes(b"broken")
+
+    assert cache.get("k") is None
+    cache.put("k", frame, {})
+    pd.testing.assert_frame_equal(cache.get("k")[0], frame)
@@ -0,0 +1,70 @@
+import io
+import subprocess
+import sys
+
+from openpyxl import Workbook
+
+from balance_check.__main__ import main
+from balance_check.api import reconcile_workbooks
+from src.io.audit import AuditTrail
+
+
+def _book(rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Date", "Debit", "Credit"])
+    for row in rows:
+        ws.append(row)
+    return wb
+
+
+def test_reconcile_workbooks_accepts_bytes(tmp_path):
+    contents = []
+    for rows in ([["a", 100, 0], ["b", 30, 0]], [["a", 100, 0]]):
+        buffer = io.BytesIO()
+        _book(rows).save(buffer)
+        contents.append(buffer.getvalue())
+
+    report = reconcile_workbooks(*contents, api_key="", output_dir=tmp_path, audit=True)
+
+    assert not report.success
+    assert (report.matches, report.unmatched) == (1, 1)
+    assert report.out_left == str(tmp_path / "left_vs_right_checked.xlsx")
+    with AuditTrail(report.audit) as audit:
+        assert audit.totals()["left.debit"] == 130.0
+        assert audit.result().n_matched == 2
+
+
+def test_cli_exit_status(tmp_path, capsys):
+    _book([["a", 100, 0]]).save(tmp_path / "l.xlsx")
+    _book([["a", 0, 100]]).save(tmp_path / "r.xlsx")
+
+    assert main([str(tmp_path / "l.xlsx"), str(tmp_path / "r.xlsx"), "--api-key", ""]) == 0
+    assert "matches credit total right 100.00" in capsys.readouterr().out
+    assert (tmp_path / "l_vs_r_checked.xlsx").exists()
+
+
+def test_cli_sheet_named_like_a_number(tmp_path, capsys):
+    for name, row in (("l.xlsx", ["a", 100, 0]), ("r.xlsx", ["a", 0, 100])):
+        wb = _book([])
+        wb.create_sheet("2024").append(["Date", "Debit", "Credit"])
+        wb["2024"].append(row)
+        wb.save(tmp_path / name)
+
+    assert main([str(tmp_path / "l.xlsx"), str(tmp_path / "r.xlsx"), "--api-key", "", "--sheet", "2024"]) == 0
+    assert "matches credit total right 100.00" in capsys.readouterr().out
+
+
+def test_reconcile_workbooks_leaves_out_the_total_row(tmp_path):
+    _book([["a", 100, 0], ["b", 30, 0], ["Оборот за период", 130, 0]]).save(tmp_path / "l.xlsx")
+    _book([["a", 0, 100], ["b", 0, 30]]).save(tmp_path / "r.xlsx")
+
+    report = reconcile_workbooks(tmp_path / "l.xlsx", tmp_path / "r.xlsx", api_key="", output_dir=tmp_path)
+
+    assert report.success
+
+
+def test_package_import_is_lazy():
+    code = "import sys, balance_check; print(any(m.split('.')[0] in ('pandas', 'openpyxl', 'streamlit', 'openai') for m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "False"
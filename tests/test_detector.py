@@ -1,5 +1,15 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pandas as pd
-from src.llm.detector import detect_columns
+import pytest
+
+from src.llm.cache import DetectionCache
+from src.llm.detector import detect_batch, detect_columns
+from src.llm.registry import LayoutRegistry, header_signature
+from src.llm.schema import Detection
 
 
 def test_detect_columns_heuristic():
@@ -12,4 +22,137 @@ def test_detect_columns_heuristic():
     assert detection.debit_column == 0
     assert detection.credit_column == 1
     assert detection.start_row == 1
-    assert detection.end_row == len(df)
+    assert detection.end_row == 0
+
+
+ANSWER = {"debit_column": 1, "credit_column": 2, "header_row": 0, "start_row": 1, "end_row": 2, "group_keys": [], "date_column": None}
+
+
+@pytest.fixture
+def fake_openai():
+    state = {"requests": 0, "active": 0, "peak": 0, "fail": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                state["requests"] += 1
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                failing = state["fail"] > 0
+                state["fail"] -= failing
+            time.sleep(0.05)
+            if failing:
+                body, status = b"{}", 500
+            else:
+                body = json.dumps({
+                    "id": "x",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": "fake",
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": json.dumps(ANSWER)},
+                    }],
+                }).encode()
+                status = 200
+            with lock:
+                state["active"] -= 1
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    yield state
+    server.shutdown()
+
+
+def _frames(n):
+    return [pd.DataFrame({"date": ["d"], f"debit {i}": [i], "credit": [0]}) for i in range(n)]
+
+
+def test_detect_batch_concurrent_and_cached(fake_openai, tmp_path):
+    cache = DetectionCache(tmp_path)
+    kwargs = {"base_url": fake_openai["url"], "cache": cache, "concurrency": 2}
+
+    first = detect_batch(_frames(4), "key", **kwargs)
+    assert [d.model_dump() for d in first] == [ANSWER] * 4
+    assert fake_openai["requests"] == 4
+    assert fake_openai["peak"] == 2
+
+    kwargs["registry"] = LayoutRegistry(tmp_path / "empty.json")
+    again = detect_batch(_frames(4), "key", **kwargs)
+    assert again == first
+    assert fake_openai["requests"] == 4
+
+
+def test_detect_batch_retries_then_falls_back(fake_openai, tmp_path):
+    fake_openai["fail"] = 2
+    kwargs = {"base_url": fake_openai["url"], "cache": DetectionCache(tmp_path), "backoff": 0.01}
+
+    retried = detect_columns(_frames(1)[0], "key", retries=3, **kwargs)
+    assert retried.model_dump() == ANSWER
+    assert fake_openai["requests"] == 3
+
+    fake_openai["fail"] = 2
+    fallback = detect_columns(_frames(2)[1], "key", retries=2, **kwargs)
+    assert (fallback.debit_column, fallback.credit_column) == (1, 2)
+    assert fallback.group_keys == []
+    assert fake_openai["requests"] == 5
+
+
+def test_model_end_row_cannot_cut_unseen_rows(fake_openai, tmp_path, caplog):
+    kwargs = {"base_url": fake_openai["url"], "cache": DetectionCache(tmp_path)}
+    seen, sampled = _frames(2)
+    seen.attrs["n_rows"] = 1
+    sampled.attrs["n_rows"] = 2
+
+    # The model answers end_row 2, i.e. n_rows of the sampled frame.
+    detections = detect_batch([seen, sampled], "key", registry=LayoutRegistry(tmp_path / "l.json"), **kwargs)
+    assert [d.end_row for d in detections] == [2, 0]
+    assert "Ignoring end_row 2" in caplog.text
+
+
+def test_known_layout_skips_the_model(fake_openai, tmp_path):
+    registry = LayoutRegistry(tmp_path / "layouts.json")
+    kwargs = {"base_url": fake_openai["url"], "cache": DetectionCache(tmp_path), "registry": registry}
+
+    detect_columns(_frames(1)[0], "key", **kwargs)
+    assert fake_openai["requests"] == 1
+
+    other = pd.DataFrame({" Date ": ["x", "y", "z"], "DEBIT 0": [5, 6, 7], "credit": [0, 0, 0]})
+    known = detect_columns(other, "key", **kwargs)
+    assert fake_openai["requests"] == 1
+    assert (known.debit_column, known.credit_column, known.end_row) == (1, 2, 0)
+    assert LayoutRegistry(tmp_path / "layouts.json").lookup(other) == known
+
+
+def test_header_signature_ignores_cosmetic_differences():
+    assert header_signature(["Дата", "Дебет", "Unnamed: 2"]) == header_signature([" дата", "ДЕБЕТ ", "Unnamed: 5"])
+    assert header_signature(["Debit", "Debit.1"]) == header_signature(["debit", "debit"])
+    assert header_signature(["Debit", "Credit"]) != header_signature(["Credit", "Debit"])
+    assert header_signature(["Счёт 60.01", "Дебет"]) != header_signature(["Счёт 62.02", "Дебет"])
+    assert header_signature(["Счёт", "Счёт 60.1"]) != header_signature(["Счёт", "Счёт 60"])
+
+
+def test_registry_learns_only_plausible_detections(tmp_path):
+    registry = LayoutRegistry(tmp_path / "layouts.json")
+    df = pd.DataFrame({"date": ["d", "e"], "debit": ["1 000,50", None], "credit": [None, None]})
+    answer = {"header_row": 0, "start_row": 1, "end_row": 3, "group_keys": []}
+
+    registry.learn(df, Detection(debit_column=1, credit_column=1, **answer))
+    registry.learn(df, Detection(debit_column=0, credit_column=1, **answer))
+    assert registry.lookup(df) is None
+
+    registry.learn(df, Detection(debit_column=1, credit_column=2, **answer))
+    assert registry.lookup(df).debit_column == 1
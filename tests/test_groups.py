@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from src.core.groups import build_group_index
+
+
+def test_keys_are_factorized_jointly_in_sorted_order():
+    left = pd.DataFrame({"who": ["b", "a", None, "b"], "doc": [1, 2, 3, 1]})
+    right = pd.DataFrame({"who": ["c", "b"], "doc": [1, 1]})
+
+    index = build_group_index(left, ["who", "doc"], right, ["who", "doc"])
+
+    assert index.keys == [("a", 2), ("b", 1), ("c", 1)]
+    assert index.left.codes.tolist() == [1, 0, -1, 1]
+    assert index.right.codes.tolist() == [2, 1]
+    assert index.left[1].tolist() == [0, 3]
+    assert index.left.sizes.tolist() == [1, 2, 0]
+    assert index.right[0].tolist() == []
+
+
+def test_select_keeps_group_offsets():
+    left = pd.DataFrame({"who": ["x", "y", "x", "y"]})
+    index = build_group_index(left, ["who"], left.iloc[:0], ["who"])
+
+    rest = index.left.select(np.array([True, False, False, True]))
+
+    assert rest[0].tolist() == [0]
+    assert rest[1].tolist() == [3]
+
+
+def test_without_group_keys_every_row_is_one_group():
+    index = build_group_index(pd.DataFrame({"a": [1, 2]}), [], pd.DataFrame({"a": [3]}), [])
+
+    assert index.keys == [()]
+    assert index.left[0].tolist() == [0, 1]
+    assert index.right[0].tolist() == [0]
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from benchmarks.ledger import make_ledgers
+from src.core.incremental import reconcile_incremental
+from src.core.reconcile import ReconcileOptions, reconcile
+from src.llm.schema import Detection
+from src.utils.metrics import collect
+
+DET = Detection(debit_column=2, credit_column=3, header_row=0, start_row=1, end_row=0, group_keys=["who"])
+
+
+def _edited(df):
+    df = df.copy()
+    df["debit"] = df["debit"].astype(float)
+    df.loc[[3, 40], "debit"] += 1
+    # Dropping a row shifts the labels of every later row.
+    return pd.concat([df.iloc[:10], df.iloc[11:]]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("net_groups", [False, True])
+def test_incremental_matches_full_reconcile_after_edit(net_groups):
+    left, right = make_ledgers(300, groups=20, duplicate_skew=0.3, split_ratio=0.05, seed=3)
+    options = ReconcileOptions(tolerance=2, net_groups=net_groups)
+    first, state = reconcile_incremental(left, right, DET, DET, options)
+    assert first == reconcile(left, right, DET, DET, options)
+
+    edited = _edited(left)
+    with collect() as metrics:
+        result, state = reconcile_incremental(edited, right, DET, DET, options, state)
+
+    assert result == reconcile(edited, right, DET, DET, options)
+    assert 0 < metrics.counters["incremental.dirty_groups"] <= 3
+    assert metrics.counters["incremental.reused_groups"] >= 17
+
+    again, _ = reconcile_incremental(edited, right, DET, DET, options, state)
+    assert again == result
+
+
+def test_changed_options_reconcile_everything():
+    left, right = make_ledgers(50, groups=5, seed=1)
+    _, state = reconcile_incremental(left, right, DET, DET)
+
+    with collect() as metrics:
+        result, _ = reconcile_incremental(left, right, DET, DET, ReconcileOptions(tolerance=5), state)
+
+    assert metrics.counters["incremental.reused_groups"] == 0
+    assert result == reconcile(left, right, DET, DET, ReconcileOptions(tolerance=5))
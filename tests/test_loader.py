@@ -0,0 +1,197 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from src.io.loader import (
+    detection_columns,
+    detection_rows,
+    footer_columns,
+    iter_chunks,
+    project_detection,
+    read_excel,
+    read_sample,
+    sheet_rows,
+)
+from src.llm.schema import Detection
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Ledger"
+    ws.append(["Date", "Debit", "Credit", None, "Debit"])
+    ws.append(["2024-01-01", 100, 0, "x", 1.5])
+    ws.append([None, None, None, None, None])
+    ws.append(["2024-01-03", 12.5, "1 000,50", None, 2])
+    ws.append([None, None, None, None, None])
+    path = tmp_path / "ledger.xlsx"
+    wb.save(path)
+    return path
+
+
+def test_streaming_matches_pandas(workbook):
+    expected, _ = read_excel(str(workbook))
+    df, coords = read_excel(str(workbook), streaming=True)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert coords["sheet_name"] == "Ledger"
+    assert coords["col_coords"] == [1, 2, 3, 4, 5]
+
+
+def test_streaming_projects_columns(workbook):
+    df, coords = read_excel(str(workbook), columns=[2, 1], streaming=True)
+
+    assert list(df.columns) == ["Debit", "Credit"]
+    assert df["Debit"].dtype == float
+    assert df["Credit"].tolist()[::2] == [0, "1 000,50"]
+    assert coords["col_coords"] == [2, 3]
+
+
+def test_streaming_xls(tmp_path):
+    xlwt = pytest.importorskip("xlwt")
+    book = xlwt.Workbook()
+    sheet = book.add_sheet("Sheet1")
+    for c, value in enumerate(["Debit", "Credit"]):
+        sheet.write(0, c, value)
+    sheet.write(1, 0, 10)
+    sheet.write(1, 1, 2.5)
+    sheet.write(2, 0, 7)
+    path = tmp_path / "ledger.xls"
+    book.save(str(path))
+
+    df, coords = read_excel(str(path), columns=[0, 1], streaming=True)
+    assert df["Debit"].tolist() == [10, 7]
+    assert df["Credit"].tolist()[0] == 2.5
+    assert pd.isna(df["Credit"].tolist()[1])
+    assert coords["sheet_name"] == "Sheet1"
+
+
+def test_streaming_xls_header_below_the_sheet(tmp_path):
+    xlwt = pytest.importorskip("xlwt")
+    book = xlwt.Workbook()
+    sheet = book.add_sheet("Sheet1")
+    for c, value in enumerate(["Who", "Debit", "Credit"]):
+        sheet.write(0, c, value)
+    path = tmp_path / "ledger.xls"
+    book.save(str(path))
+
+    df, _ = read_excel(str(path), columns=[1, 2], streaming=True, header_row=5)
+    assert df.empty
+    assert list(df.columns) == ["Unnamed: 1", "Unnamed: 2"]
+
+
+def test_read_sample_stops_after_rows(workbook):
+    sample = read_sample(str(workbook), rows=1)
+
+    assert list(sample.columns) == ["Date", "Debit", "Credit", "Unnamed: 3", "Debit.1"]
+    assert len(sample) == 1
+    assert sample.attrs["n_rows"] == 4
+
+
+def test_project_detection_onto_loaded_columns(workbook):
+    det = Detection(
+        debit_column=1,
+        credit_column=4,
+        header_row=0,
+        start_row=1,
+        end_row=4,
+        group_keys=["Date"],
+    )
+    columns = detection_columns(det, read_sample(str(workbook), rows=0).columns)
+    df, coords = read_excel(str(workbook), columns=columns, streaming=True)
+    local = project_detection(det, coords["col_coords"])
+
+    assert columns == [0, 1, 4]
+    assert list(df.columns) == ["Date", "Debit", "Debit.1"]
+    assert (local.debit_column, local.credit_column) == (1, 2)
+
+
+def test_csv_sniffs_semicolons_decimal_comma_and_cp1251(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_bytes("Дата;Контрагент;Дебет;Кредит\n2024-01-01;ООО Ромашка;100,50;0\n2024-01-03;;1 000,25;\n".encode("cp1251"))
+
+    df, coords = read_excel(str(path), columns=[3, 0, 2])
+
+    assert list(df.columns) == ["Дата", "Дебет", "Кредит"]
+    assert df["Дата"].dtype == "datetime64[ns]"
+    assert df["Дебет"].tolist() == ["100,50", "1 000,25"]
+    assert df["Кредит"].tolist()[0] == 0
+    assert coords == {"sheet_name": "export", "row_coords": [2, 3], "col_coords": [1, 3, 4]}
+    assert read_excel(str(path), columns=[2])[0].equals(read_sample(str(path), rows=5).iloc[:, [2]])
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_tables_load_like_workbooks(workbook, tmp_path, suffix):
+    expected, _ = read_excel(str(workbook), columns=[1, 2], streaming=True)
+    # Text files cannot tell 0 from "0", so the mixed column is stored as text.
+    expected = expected.dropna(how="all").reset_index(drop=True).astype({"Credit": str}).astype({"Credit": object})
+    path = tmp_path / f"ledger{suffix}"
+    if suffix == ".csv":
+        expected.to_csv(path, index=False)
+    else:
+        expected.to_parquet(path)
+
+    df, coords = read_excel(str(path))
+    chunks = list(iter_chunks(str(path), [0], chunk_rows=1))
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert coords["sheet_name"] == "ledger"
+    assert read_sample(str(path), rows=1).attrs["n_rows"] == 2
+    pd.testing.assert_frame_equal(pd.concat(chunks), df[["Debit"]], check_dtype=False)
+
+
+@pytest.fixture
+def statement(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Оборотно-сальдовая ведомость"])
+    ws.append([None])
+    ws.append(["Date", "Debit", "Credit"])
+    ws.append(["2024-01-01", 10, 0])
+    ws.append([None, None, None])
+    ws.append(["2024-01-02", 0, 5])
+    ws.append(["Оборот за период", 10, 5])
+    path = tmp_path / "statement.xlsx"
+    wb.save(path)
+    return path
+
+
+DET_RANGE = Detection(debit_column=1, credit_column=2, header_row=2, start_row=3, end_row=6, group_keys=[])
+
+
+@pytest.mark.parametrize("suffix", [".xlsx", ".csv"])
+@pytest.mark.parametrize("streaming", [True, False])
+def test_detected_range_skips_preamble_and_footer(statement, tmp_path, suffix, streaming):
+    path = statement
+    if suffix == ".csv":
+        path = tmp_path / "statement.csv"
+        path.write_text("Оборотно-сальдовая ведомость\n\nDate,Debit,Credit\n2024-01-01,10,0\n\n"
+                        "2024-01-02,0,5\nОборот за период,10,5\n")
+    rows = detection_rows(DET_RANGE)
+
+    df, coords = read_excel(str(path), streaming=streaming, **rows)
+    chunks = list(iter_chunks(str(path), [1, 2], chunk_rows=2, **rows))
+
+    assert list(df.columns) == ["Date", "Debit", "Credit"]
+    assert df["Debit"].tolist()[::2] == [10, 0]
+    assert len(df) == 3
+    assert coords["row_coords"] == [4, 5, 6]
+    assert list(sheet_rows(DET_RANGE)) == coords["row_coords"]
+    pd.testing.assert_frame_equal(pd.concat(chunks), df[["Debit", "Credit"]], check_dtype=False)
+    assert read_sample(str(path), rows=1, **rows).attrs["n_rows"] == 3
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_open_range_ends_at_the_first_total_row(statement, streaming):
+    det = DET_RANGE.model_copy(update={"end_row": 0})
+    options = {"footer_columns": footer_columns(det), **detection_rows(det)}
+
+    df, coords = read_excel(str(statement), [1, 2], streaming=streaming, **options)
+    chunks = list(iter_chunks(str(statement), [1, 2], chunk_rows=1, **options))
+
+    assert list(df.columns) == ["Debit", "Credit"]
+    assert coords["col_coords"] == [2, 3]
+    assert coords["row_coords"] == [4, 5, 6]
+    assert df["Debit"].tolist()[::2] == [10, 0]
+    pd.testing.assert_frame_equal(pd.concat(chunks), df, check_dtype=False)
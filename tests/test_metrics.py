@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.core.reconcile import reconcile
+from src.llm.schema import Detection
+from src.utils.metrics import collect, count, stage
+
+
+def test_stage_and_count_outside_collect_are_ignored():
+    with stage("load"):
+        count("rows", 3)
+
+
+def test_collect_accumulates_stages_and_counters():
+    with collect() as metrics:
+        with stage("load"):
+            count("rows", 2)
+        with stage("load"):
+            count("rows")
+
+    assert metrics.counters == {"rows": 3}
+    assert set(metrics.stages) == {"load", "total"}
+    assert metrics.stages["load"] <= metrics.stages["total"]
+
+
+def test_reconcile_reports_stages_and_group_times():
+    det = Detection(debit_column=1, credit_column=2, header_row=0, start_row=1, end_row=0, group_keys=["who"])
+    left = pd.DataFrame({"who": ["a", "b"], "debit": [10, 30], "credit": [0, 0]})
+    right = pd.DataFrame({"who": ["a", "b", "b"], "debit": [10, 10, 20], "credit": [0, 0, 0]})
+
+    with collect() as metrics:
+        reconcile(left, right, det, det)
+
+    assert {"reconcile.one_to_one", "reconcile.subset"} <= set(metrics.stages)
+    assert metrics.counters["exact_pairs"] == 1
+    assert list(metrics.groups) == ["b"]
+
+
+def test_collect_tracemalloc_records_peak():
+    with collect("tracemalloc") as metrics:
+        data = [0] * 100_000
+    del data
+
+    assert metrics.memory["peak_mb"] > 0
+    assert metrics.memory["top"]
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.numeric import parse_cents
+
+
+@pytest.mark.parametrize(
+    "raw,cents",
+    [
+        ("1 000,50", 100050),
+        ("1\xa0234.5", 123450),
+        ("(12,30)", -1230),
+        ("100 руб.", 10000),
+        ("$1,234.56", 123456),
+        ("1.234.567,89", 123456789),
+        ("50-", -5000),
+        ("-3,1", -310),
+        ("(1 000,00 руб.)", -100000),
+        ("-$5", -500),
+        ("$-5", -500),
+        ("1,234", 123400),
+        ("1,23", 123),
+        (7, 700),
+        (2.5, 250),
+    ],
+)
+def test_parse_cents_formats(raw, cents):
+    parsed, failed = parse_cents(pd.Series([raw], dtype=object))
+    assert parsed.tolist() == [cents]
+    assert not failed.any()
+
+
+def test_parse_cents_blank_and_failed_cells():
+    parsed, failed = parse_cents(pd.Series(["abc", "", None, np.nan, "  "], dtype=object))
+    assert parsed.tolist() == [0, 0, 0, 0, 0]
+    assert failed.tolist() == [True, False, False, False, False]
+
+
+def test_parse_cents_numeric_column_is_exact():
+    parsed, failed = parse_cents(pd.Series([0.1] * 10 + [np.nan]))
+    assert parsed.sum() == 100
+    assert parsed.dtype == np.int64
+    assert not failed.any()
+
+
+@pytest.mark.parametrize("raw", ["1e17", 1e17, -1e18, np.inf])
+def test_parse_cents_out_of_range_fails(raw):
+    parsed, failed = parse_cents(pd.Series([raw, 5], dtype=object))
+    assert parsed.tolist() == [0, 500]
+    assert failed.tolist() == [True, False]
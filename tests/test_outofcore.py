@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.ledger import make_ledgers, write_ledger
+from src.core.outofcore import reconcile_out_of_core
+from src.core.reconcile import ReconcileOptions, reconcile
+from src.io.loader import iter_chunks, read_excel
+from src.llm.schema import Detection
+from src.utils.metrics import collect
+
+DET = Detection(debit_column=2, credit_column=3, header_row=0, start_row=1, end_row=0, group_keys=["who"])
+
+
+@pytest.fixture
+def ledgers(tmp_path):
+    left, right = make_ledgers(400, groups=30, duplicate_skew=0.3, split_ratio=0.05, seed=5)
+    # Leave some rows unmatched so the result has leftovers and differences.
+    left.loc[[7, 120, 333], "debit"] += 50
+    right = right.drop(index=[4, 90])
+    return write_ledger(left, tmp_path / "left.xlsx"), write_ledger(right, tmp_path / "right.xlsx")
+
+
+def test_iter_chunks_concatenate_to_sheet(ledgers):
+    path = ledgers[0]
+    chunks = list(iter_chunks(path, [1, 2], chunk_rows=64))
+
+    assert [len(c) for c in chunks] == [64] * 6 + [16]
+    pd.testing.assert_frame_equal(pd.concat(chunks), read_excel(path, [1, 2], streaming=True)[0], check_dtype=False)
+
+
+@pytest.mark.parametrize("net_groups", [False, True])
+def test_out_of_core_equals_in_memory(ledgers, tmp_path, net_groups):
+    options = ReconcileOptions(tolerance=2, net_groups=net_groups)
+    with collect() as metrics:
+        result = reconcile_out_of_core(
+            *ledgers, DET, DET, options, memory_budget=20_000, chunk_rows=50, spill_dir=tmp_path
+        )
+
+    df_left, _ = read_excel(ledgers[0], streaming=True)
+    df_right, _ = read_excel(ledgers[1], streaming=True)
+    assert metrics.counters["outofcore.partitions"] > 1
+    assert result == reconcile(df_left, df_right, DET, DET, options)
+    assert len(result.unmatched) > 0
+    assert list(tmp_path.glob("balance_check-spill-*")) == []
+
+
+def test_out_of_core_without_group_keys_uses_one_partition(ledgers):
+    det = DET.model_copy(update={"group_keys": []})
+    with collect() as metrics:
+        result = reconcile_out_of_core(*ledgers, det, det, memory_budget=20_000, chunk_rows=50)
+
+    df_left, _ = read_excel(ledgers[0], streaming=True)
+    df_right, _ = read_excel(ledgers[1], streaming=True)
+    assert metrics.counters["outofcore.partitions"] == 1
+    assert result == reconcile(df_left, df_right, det, det)
+    assert np.array_equal(result.keys, [()])
+
+
+def test_out_of_core_merges_keys_of_different_width(ledgers):
+    wide = DET.model_copy(update={"group_keys": ["date", "who"]})
+    result = reconcile_out_of_core(*ledgers, wide, DET, memory_budget=20_000, chunk_rows=50)
+
+    df_left, _ = read_excel(ledgers[0], streaming=True)
+    df_right, _ = read_excel(ledgers[1], streaming=True)
+    assert result == reconcile(df_left, df_right, wide, DET)
+    assert {len(key) for key in result.keys} == {1, 2}
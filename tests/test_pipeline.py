@@ -0,0 +1,86 @@
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from src.pipeline import PairJob, read_manifest, run_batch, summarize
+from src.utils.metrics import collect
+
+
+def _book(path, sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        ws.append(["Date", "Debit", "Credit"])
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def books(tmp_path):
+    left = _book(tmp_path / "left.xlsx", {
+        "Jan": [["a", 100, 0], ["b", 0, 50]],
+        "Feb": [["a", 30, 0], ["b", 20, 0]],
+    })
+    right = _book(tmp_path / "right.xlsx", {
+        "Feb": [["a", 30, 0], ["b", 25, 0]],
+        "Jan": [["a", 0, 100], ["b", 50, 0]],
+    })
+    return left, right
+
+
+def test_read_manifest_resolves_paths_and_sheets(tmp_path):
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text("left,right,sheet,right_sheet\nl.xlsx,r.xlsx,1,\nl.xlsx,r.xlsx,Feb,March\n")
+
+    jobs = read_manifest(manifest)
+
+    assert [(j.left, j.sheet, j.right_sheet) for j in jobs] == [
+        (tmp_path / "l.xlsx", 1, 1),
+        (tmp_path / "l.xlsx", "Feb", "March"),
+    ]
+
+
+def test_read_manifest_prefers_sheet_names_over_positions(books, tmp_path):
+    _book(tmp_path / "years.xlsx", {"2023": [], "2024": []})
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text("left,right,sheet,right_sheet\nyears.xlsx,left.xlsx,2024,1\nleft.xlsx,years.xlsx,1,\n")
+
+    jobs = read_manifest(manifest)
+
+    assert [(j.sheet, j.right_sheet) for j in jobs] == [("2024", 1), (1, 1)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_reconciles_every_sheet(books, tmp_path, workers):
+    left, right = books
+    out = tmp_path / "out"
+
+    with collect() as batch:
+        reports = run_batch([PairJob(left, right, "*")], "", workers=workers, output_dir=out)
+
+    assert [(r.name, r.success, r.unmatched) for r in reports] == [
+        ("left~right[Jan]", True, 0),
+        ("left~right[Feb]", False, 2),
+    ]
+    feb = load_workbook(reports[1].out_left)["Feb"]
+    assert feb["B3"].fill.fill_type == "solid"
+    assert load_workbook(reports[1].out_left)["Jan"]["B2"].fill.fill_type is None
+    assert {"detect", "load", "reconcile", "write", "total"} <= set(reports[1].timings)
+    assert list(summarize(reports)["matches"]) == [0, 1]
+    assert batch.counters["detect.heuristic"] == 4
+    assert batch.stages["detect"] > 0
+
+
+def test_run_batch_keeps_outputs_of_pairs_sharing_a_workbook(tmp_path):
+    own = _book(tmp_path / "own.xlsx", {"Jan": [["a", 100, 0], ["b", 40, 0]]})
+    first = _book(tmp_path / "first.xlsx", {"Jan": [["a", 100, 0]]})
+    second = _book(tmp_path / "second.xlsx", {"Jan": [["b", 40, 0]]})
+    out = tmp_path / "out"
+
+    reports = run_batch([PairJob(own, first), PairJob(own, second)], "", workers=2, output_dir=out)
+
+    assert len({r.out_left for r in reports}) == 2
+    for report, kept in zip(reports, ("B3", "B2")):
+        assert load_workbook(report.out_left)["Jan"][kept].fill.fill_type == "solid"
@@ -1,7 +1,8 @@
 import pandas as pd
 import pytest
 
-from src.core.reconcile import reconcile
+from src.core.highlight import cells_to_highlight
+from src.core.reconcile import ReconcileOptions, reconcile
 from src.llm.schema import Detection
 
 
@@ -55,3 +56,100 @@ def test_reconcile_parametric(left: pd.DataFrame, right: pd.DataFrame, expect: d
 
     if expect["partials"]:
         assert partials[0].diff == -20
+
+
+def test_reconcile_repeated_amounts_pair_in_row_order():
+    left = pd.DataFrame({"debit": [10, 10, 10, 5], "credit": [0, 0, 0, 0]})
+    right = pd.DataFrame({"debit": [5, 10, 10], "credit": [0, 0, 0]})
+    matches, partials, unmatched = reconcile(left, right, _det(left), _det(right))
+
+    pairs = sorted((m.left_rows[0], m.right_rows[0]) for m in matches)
+    assert pairs == [(0, 1), (1, 2), (3, 0)]
+    assert [(u.side, u.row) for u in unmatched] == [("left", 2)]
+
+
+def test_reconcile_matches_within_groups_only():
+    left = pd.DataFrame({"debit": [10, 20], "credit": [0, 0], "who": ["a", "b"]})
+    right = pd.DataFrame({"debit": [20, 10], "credit": [0, 0], "who": ["a", "b"]})
+    det = _det(left).model_copy(update={"group_keys": ["who"]})
+    matches, partials, unmatched = reconcile(left, right, det, det)
+
+    assert matches == []
+    assert len(partials) == 2
+    assert len(unmatched) == 4
+
+
+def test_reconcile_amounts_are_exact_cents():
+    left = pd.DataFrame({"debit": [0.1] * 10 + [0.3], "credit": [0] * 11})
+    right = pd.DataFrame({"debit": [1.0, 0.2], "credit": [0, 0]})
+    matches, partials, unmatched = reconcile(left, right, _det(left), _det(right))
+
+    assert len(partials) == 1
+    assert partials[0].diff_cents == 10
+    assert isinstance(partials[0].left_cents, int)
+    assert sum(m.left_cents for m in matches) == sum(m.right_cents for m in matches)
+
+
+def test_reconcile_result_views_match_columns():
+    left = pd.DataFrame({"debit": [10, 30, 70, 5], "credit": 0}, index=[10, 11, 12, 13])
+    right = pd.DataFrame({"debit": [10, 100, 7], "credit": 0})
+    result = reconcile(left, right, _det(left), _det(right))
+
+    assert len(result.matches) == 2
+    assert result.matches[-1].left_rows == [11, 12]
+    assert result.matches[-1].right_rows == [1]
+    assert [(u.side, u.row) for u in result.unmatched] == [("left", 13), ("right", 2)]
+    assert result.partials[0].diff_cents == -200
+    assert sorted(result.rows_to_highlight("left").tolist()) == [13]
+
+
+def test_reconcile_tolerance_records_diff():
+    left = pd.DataFrame({"debit": [100.00, 50.00, 7.00], "credit": 0})
+    right = pd.DataFrame({"debit": [49.98, 100.01, 9.00], "credit": 0})
+    opts = ReconcileOptions(tolerance=2, max_subset_size=0)
+    matches, partials, unmatched = reconcile(left, right, _det(left), _det(right), opts)
+
+    pairs = sorted((m.left_rows[0], m.right_rows[0], m.diff_cents) for m in matches)
+    assert pairs == [(0, 1, -1), (1, 0, 2)]
+    assert [(u.side, u.row) for u in unmatched] == [("left", 2), ("right", 2)]
+    assert cells_to_highlight(matches, partials, unmatched, _det(left), "left") == {
+        (r, c) for r in (0, 1, 2) for c in (0, 1)
+    }
+
+
+def test_reconcile_date_window():
+    left = pd.DataFrame({"debit": [10, 10], "credit": 0, "date": ["2024-01-01", "2024-03-01"]})
+    right = pd.DataFrame({"debit": [10, 10], "credit": 0, "date": ["2024-03-02", "2024-01-05"]})
+    det = _det(left).model_copy(update={"date_column": 2})
+    opts = ReconcileOptions(date_window=3, max_subset_size=0)
+    matches, partials, unmatched = reconcile(left, right, det, det, opts)
+
+    assert sorted((m.left_rows[0], m.right_rows[0]) for m in matches) == [(1, 0)]
+    assert [(u.side, u.row) for u in unmatched] == [("left", 0), ("right", 1)]
+
+
+def test_reconcile_date_window_pairs_nearest_dates():
+    dates = ["2024-01-01", "2024-01-10", "2024-02-01"]
+    left = pd.DataFrame({"debit": [10, 10, 10], "credit": 0, "date": dates})
+    right = pd.DataFrame({"debit": [10, 10, 10], "credit": 0, "date": ["2024-01-09", "2024-02-01", "2024-01-02"]})
+    det = _det(left).model_copy(update={"date_column": 2})
+    opts = ReconcileOptions(date_window=3, max_subset_size=0)
+    matches, partials, unmatched = reconcile(left, right, det, det, opts)
+
+    assert sorted((m.left_rows[0], m.right_rows[0]) for m in matches) == [(0, 2), (1, 0), (2, 1)]
+    assert unmatched == []
+
+
+def test_reconcile_nets_balanced_groups():
+    left = pd.DataFrame({"debit": [10, 25, 40, 3, 50], "credit": 0, "who": ["a", "a", "b", "b", "c"]})
+    right = pd.DataFrame({"debit": [30, 5, 40, 20, 30], "credit": 0, "who": ["a", "a", "b", "c", "c"]})
+    det = _det(left).model_copy(update={"group_keys": ["who"]})
+    result = reconcile(left, right, det, det, ReconcileOptions(net_groups=True))
+
+    # Group c balances too, but its split payment is matched row by row.
+    assert result.netted.tolist() == [True, False, False]
+    assert result.pairs == 1
+    assert (result.matches[0].left_rows, result.matches[0].right_rows) == ([2], [2])
+    assert (result.matches[1].left_rows, result.matches[1].right_rows) == ([4], [3, 4])
+    assert (result.matches[2].left_rows, result.matches[2].right_rows) == ([0, 1], [0, 1])
+    assert [(u.side, u.row) for u in result.unmatched] == [("left", 3)]
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from src.core.reconcile import ReconcileOptions, reconcile
+from src.core.subset import match_subsets
+from src.llm.schema import Detection
+
+
+def _det(df: pd.DataFrame) -> Detection:
+    return Detection(
+        debit_column=0,
+        credit_column=1,
+        header_row=0,
+        start_row=1,
+        end_row=len(df),
+        group_keys=[],
+    )
+
+
+def test_match_subsets_finds_disjoint_splits():
+    found, complete = match_subsets([300, 500], [100, 200, 250, 250])
+    assert complete
+    assert sorted(found) == [([0], [0, 1]), ([1], [2, 3])]
+
+
+def test_match_subsets_respects_max_size():
+    found, complete = match_subsets([400], [100, 100, 100, 100], max_size=3)
+    assert found == []
+    assert complete
+
+
+def test_match_subsets_reports_exhausted_budget():
+    found, complete = match_subsets(list(range(1, 40)), [10_000_000], budget=50)
+    assert found == []
+    assert not complete
+
+
+def test_reconcile_subset_beyond_first_rows():
+    left = pd.DataFrame({"debit": [7 + i / 100 for i in range(60)] + [1000], "credit": 0})
+    right = pd.DataFrame({"debit": [600, 400], "credit": 0})
+    matches, partials, unmatched = reconcile(left, right, _det(left), _det(right))
+
+    split = [m for m in matches if len(m.right_rows) == 2]
+    assert split and split[0].left_rows == [60]
+    assert not any(p.truncated for p in partials)
+
+
+def test_reconcile_flags_truncated_group():
+    left = pd.DataFrame({"debit": [1 + i for i in range(30)], "credit": 0})
+    right = pd.DataFrame({"debit": [10_000], "credit": 0})
+    options = ReconcileOptions(subset_budget=10)
+    matches, partials, unmatched = reconcile(left, right, _det(left), _det(right), options)
+
+    assert len(partials) == 1
+    assert partials[0].truncated
+    assert partials[0].group == ()
+
+
+def test_reconcile_workers_match_serial_output():
+    left = pd.DataFrame({
+        "debit": [100, 30, 70, 55, 5, 12, 8, 40],
+        "credit": 0,
+        "who": ["a", "a", "b", "b", "c", "c", "d", "d"],
+    })
+    right = pd.DataFrame({
+        "debit": [60, 40, 30, 70, 60, 20, 41, 1],
+        "credit": 0,
+        "who": ["a", "a", "a", "b", "b", "c", "d", "d"],
+    })
+    det = _det(left).model_copy(update={"group_keys": ["who"]})
+
+    serial = reconcile(left, right, det, det)
+    parallel = reconcile(left, right, det, det, ReconcileOptions(workers=2))
+    assert parallel == serial
+
+
+def test_match_subsets_keeps_subsets_sharing_a_sum():
+    # {100, 300} and {400} both sum to 400; only the first extends to 800.
+    found, complete = match_subsets([100, 200, 300, 400], [800])
+    assert complete
+    assert found == [([0, 2, 3], [0])]
@@ -1,6 +1,8 @@
+import datetime
+
 import pandas as pd
 
-from src.io.loader import detect_turnover_value
+from src.io.loader import detect_turnover_value, find_turnover_values
 
 
 def test_detect_turnover_english():
@@ -11,3 +13,24 @@ def test_detect_turnover_english():
 def test_detect_turnover_russian():
     df = pd.DataFrame([["Оборот за период", "1 000"]])
     assert detect_turnover_value(df) == 1000.0
+
+
+def test_find_turnover_values_returns_all_hits():
+    df = pd.DataFrame([
+        ["Оборот за период", "n/a", None],
+        [1, "Turnover for period", "2\xa0500,75"],
+        ["оборот за период", "(x)", 3],
+        [None, "Оборот за период", 7],
+    ])
+    assert find_turnover_values(df) == [(1, 1, 2500.75), (3, 1, 7.0)]
+    assert detect_turnover_value(df) == 2500.75
+
+
+def test_find_turnover_values_skips_columns_without_text():
+    df = pd.DataFrame({
+        "flag": pd.Series([True, None, False], dtype=object),
+        "time": [datetime.time(9), datetime.time(10), None],
+        "label": ["x", "Оборот за период", None],
+        "value": [1, 5, 2],
+    })
+    assert find_turnover_values(df) == [(1, 2, 5.0)]
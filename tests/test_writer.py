@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from src.io.writer import write_coloured
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Debit", "Credit"])
+    ws.append([10, 0])
+    ws.append([20, 5])
+    ws["A3"].font = Font(bold=True)
+    wb.create_sheet("Other")
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize("engine", ["xml", "openpyxl"])
+def test_write_coloured_fills_cells(workbook, engine):
+    out = write_coloured(pd.DataFrame(), {(1, 0), (1, 1), (3, 0)}, str(workbook), engine=engine)
+
+    ws = load_workbook(out).active
+    filled = {
+        (cell.row, cell.column)
+        for row in ws.iter_rows()
+        for cell in row
+        if cell.fill.fill_type == "solid"
+    }
+    assert filled == {(3, 1), (3, 2), (5, 1)}
+    assert ws["A3"].font.b
+    assert ws["A3"].value == 20
+    assert ws["A2"].fill.fill_type is None
+
+
+def test_write_coloured_without_highlights_copies(workbook):
+    out = write_coloured(pd.DataFrame(), set(), str(workbook))
+
+    assert out.endswith("book_checked.xlsx")
+    assert open(out, "rb").read() == workbook.read_bytes()
+
+
+def test_write_coloured_turns_csv_into_workbook(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("Debit;Credit\n10;0\n20;5\n")
+
+    out = write_coloured(pd.DataFrame(), {(1, 1)}, str(path))
+
+    ws = load_workbook(out).active
+    assert out.endswith("export_checked.xlsx")
+    assert ws.title == "export"
+    assert [[c.value for c in row] for row in ws.iter_rows()] == [["Debit", "Credit"], [10, 0], [20, 5]]
+    assert [c.coordinate for row in ws.iter_rows() for c in row if c.fill.fill_type == "solid"] == ["B3"]
+
+
+def test_write_coloured_maps_rows_to_sheet_rows(workbook):
+    out = write_coloured(pd.DataFrame(), {(0, 0), (1, 1)}, str(workbook), row_coords=range(3, 5))
+
+    ws = load_workbook(out).active
+    filled = {(cell.row, cell.column) for row in ws.iter_rows() for cell in row if cell.fill.fill_type == "solid"}
+    assert filled == {(3, 1), (4, 2)}